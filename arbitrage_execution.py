@@ -0,0 +1,186 @@
+"""
+Concurrent two-leg execution for cross-exchange arbitrage.
+
+Both legs are rounded and checked against the exchange filters and the
+fleet risk caps first, so a leg that would be rejected locally stops the
+trade before either order is sent. Both market orders are then submitted at the same time from a shared
+thread pool. If exactly one leg fills and the other definitely did not, the filled
+quantity is reversed on the same exchange (unwind) so the user is not left
+holding an unhedged position. A leg whose outcome is unknown (a lost
+response, 5xx or unreadable fill, or still running after ARB_LEG_TIMEOUT +
+ARB_LEG_GRACE) gets a final status read by client order id first; if it is
+still unknown nothing is unwound, since
+unwinding the other leg of a leg that did fill would open a position instead
+of closing one. Those executions are reported as "unknown" for manual review.
+Leg-to-leg skew (difference between the two exchange acks) is recorded in the
+arbitrage_leg_skew_seconds histogram and returned with the result.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from exchange_info import OrderValidationError, normalize_order
+from metrics import Counter, Histogram
+from risk_engine import RiskLimitError, check_order
+from trading_api import (
+    place_binance_market_order, place_luno_market_order, reconcile_binance_order, reconcile_luno_order,
+)
+
+logger = logging.getLogger(__name__)
+
+ARB_EXECUTION_WORKERS = int(os.getenv("ARB_EXECUTION_WORKERS", 8))
+ARB_LEG_TIMEOUT = float(os.getenv("ARB_LEG_TIMEOUT", 15))
+ARB_LEG_GRACE = float(os.getenv("ARB_LEG_GRACE", 30))  # extra wait for a slow leg before calling it unknown
+SKEW_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+ARBITRAGE_LEG_SKEW_SECONDS = Histogram(
+    "arbitrage_leg_skew_seconds", "Time between the two arbitrage legs being acknowledged",
+    ("buy_exchange", "sell_exchange"), buckets=SKEW_BUCKETS,
+)
+ARBITRAGE_EXECUTIONS = Counter(
+    "arbitrage_executions_total", "Two-leg arbitrage executions by outcome", ("outcome",),
+)
+
+_executor = ThreadPoolExecutor(max_workers=ARB_EXECUTION_WORKERS, thread_name_prefix="arb-leg")
+
+
+def _place(user, exchange, side, base_qty, quote_qty=None, ref_price=None):
+    """`ref_price` is the expected fill in the exchange's quote currency, for the min-notional check."""
+    if exchange == "binance":
+        return place_binance_market_order(user, side, base_qty, ref_price=ref_price)
+    # Luno market buys are sized in ZAR
+    if side == "buy":
+        return place_luno_market_order(user, side, counter_qty=quote_qty)
+    return place_luno_market_order(user, side, base_qty=base_qty, ref_price=ref_price)
+
+
+def _validate(user, exchange, side, base_qty, quote_qty=None, ref_price=None):
+    """The local checks _place's order will get; raises OrderValidationError or RiskLimitError."""
+    if exchange == "binance":
+        normalize_order("binance", "BTCUSDT", quantity=base_qty, ref_price=ref_price)
+    elif side == "buy":
+        normalize_order("luno", "XBTZAR", quote_qty=quote_qty)
+    else:
+        normalize_order("luno", "XBTZAR", quantity=base_qty, ref_price=ref_price)
+    check_order(user, "BTC", base_qty if side == "buy" else -base_qty)
+
+
+def _leg(exchange, side, error, unknown):
+    return {"exchange": exchange, "side": side, "ok": False, "unknown": unknown, "order_id": None, "filled_base": 0.0,
+            "filled_quote": 0.0, "acked_at": None, "error": error}
+
+
+def _unknown_leg(exchange, side, error):
+    return _leg(exchange, side, error, unknown=True)
+
+
+def _log_orphan(user, exchange, side):
+    """Done-callback for a leg given up on: log what it finally did."""
+    def done(future):
+        try:
+            leg = future.result()
+        except Exception as e:
+            logger.error(f"[{user['user_id']}] Orphaned {exchange} {side} leg raised: {e}")
+            return
+        logger.error(f"[{user['user_id']}] Orphaned {exchange} {side} leg finished: ok={leg['ok']} "
+                     f"unknown={leg.get('unknown')} filled {leg['filled_base']} order {leg['order_id']} "
+                     f"error {leg['error']}")
+    return done
+
+
+def _collect(user, future, exchange, side):
+    """The leg's result; a leg that outlives ARB_LEG_TIMEOUT is waited on, not treated as failed."""
+    try:
+        return future.result(timeout=ARB_LEG_TIMEOUT)
+    except FutureTimeout:
+        logger.warning(f"[{user['user_id']}] {exchange} {side} leg still running after {ARB_LEG_TIMEOUT}s, "
+                       f"waiting up to {ARB_LEG_GRACE}s more")
+    except Exception as e:
+        # _place reports order errors in the leg; an exception here may have come after the send
+        logger.error(f"[{user['user_id']}] {exchange} {side} leg raised: {e}")
+        return _unknown_leg(exchange, side, f"leg raised: {e}")
+    try:
+        return future.result(timeout=ARB_LEG_GRACE)
+    except FutureTimeout:
+        future.add_done_callback(_log_orphan(user, exchange, side))
+        return _unknown_leg(exchange, side, "leg timed out; outcome unknown")
+    except Exception as e:
+        logger.error(f"[{user['user_id']}] {exchange} {side} leg raised: {e}")
+        return _unknown_leg(exchange, side, f"leg raised: {e}")
+
+
+def _reconcile(user, leg):
+    # Legs given up on by _collect carry no client order id and stay unknown:
+    # their thread may still record the fill, so a status read here could count it twice
+    if leg.get("unknown"):
+        if leg["exchange"] == "luno":
+            reconcile_luno_order(user, leg)
+        else:
+            reconcile_binance_order(user, leg)
+    return leg
+
+
+def _unwind(user, leg):
+    """Reverse a filled leg on the exchange it filled on."""
+    side = "sell" if leg["side"] == "buy" else "buy"
+    logger.warning(f"[{user['user_id']}] Unwinding {leg['exchange']} {leg['side']} of {leg['filled_base']}")
+    fill_price = leg["filled_quote"] / leg["filled_base"] if leg["filled_base"] else None
+    return _place(user, leg["exchange"], side, leg["filled_base"], quote_qty=leg["filled_quote"], ref_price=fill_price)
+
+
+def execute_two_legs(user, buy_exchange, sell_exchange, base_qty, buy_price):
+    """
+    Buy `base_qty` BTC on buy_exchange and sell it on sell_exchange concurrently.
+    `buy_price` (in the buy exchange's quote currency) sizes Luno buys, which
+    take a counter amount.
+
+    Returns {"outcome": "filled" | "unwound" | "unwind_failed" | "unknown" | "failed" | "rejected",
+             "buy": leg, "sell": leg, "unwind": leg | None, "skew_ms": float}
+    """
+    try:
+        _validate(user, buy_exchange, "buy", base_qty, base_qty * buy_price, buy_price)
+        _validate(user, sell_exchange, "sell", base_qty)
+    except (OrderValidationError, RiskLimitError) as e:
+        # Nothing sent: a leg that can't be placed must not leave the other one to unwind
+        logger.warning(f"[{user['user_id']}] Arbitrage rejected locally: {e}")
+        ARBITRAGE_EXECUTIONS.inc("rejected")
+        return {"outcome": "rejected", "buy": _leg(buy_exchange, "buy", str(e), unknown=False),
+                "sell": _leg(sell_exchange, "sell", str(e), unknown=False), "unwind": None, "skew_ms": None}
+
+    buy_future = _executor.submit(_place, user, buy_exchange, "buy", base_qty, base_qty * buy_price, buy_price)
+    # buy_price is in the buy exchange's currency; the sell leg is checked at its cached ticker
+    sell_future = _executor.submit(_place, user, sell_exchange, "sell", base_qty)
+
+    buy = _reconcile(user, _collect(user, buy_future, buy_exchange, "buy"))
+    sell = _reconcile(user, _collect(user, sell_future, sell_exchange, "sell"))
+
+    skew = None
+    if buy["acked_at"] and sell["acked_at"]:
+        skew = abs(buy["acked_at"] - sell["acked_at"])
+        ARBITRAGE_LEG_SKEW_SECONDS.observe(skew, buy_exchange, sell_exchange)
+
+    unwind = None
+    if buy["ok"] and sell["ok"]:
+        outcome = "filled"
+    elif buy.get("unknown") or sell.get("unknown"):
+        # Can't tell whether the other leg is hedged; unwinding could open a position
+        outcome = "unknown"
+        logger.error(f"[{user['user_id']}] Arbitrage leg outcome unknown, not unwinding: "
+                     f"buy {buy['exchange']} ok={buy['ok']} order {buy['order_id']} ({buy['error']}), "
+                     f"sell {sell['exchange']} ok={sell['ok']} order {sell['order_id']} ({sell['error']})")
+    elif buy["ok"] or sell["ok"]:
+        unwind = _unwind(user, buy if buy["ok"] else sell)
+        outcome = "unwound" if unwind["ok"] else "unwind_failed"
+        if not unwind["ok"]:
+            logger.error(f"[{user['user_id']}] Unwind failed, position left open: {unwind['error']}")
+    else:
+        outcome = "failed"
+
+    ARBITRAGE_EXECUTIONS.inc(outcome)
+    return {
+        "outcome": outcome,
+        "buy": buy,
+        "sell": sell,
+        "unwind": unwind,
+        "skew_ms": round(skew * 1000, 3) if skew is not None else None,
+    }
@@ -0,0 +1,180 @@
+"""
+Multi-pair and triangular arbitrage scanner.
+
+Each tick pulls every Binance book ticker and every Luno ticker in one request
+per exchange, builds a currency graph whose edge i -> j is the best
+fee-adjusted log rate for converting currency i into j on either exchange,
+and evaluates every 2-, 3- and 4-currency cycle in one numpy pass. Because
+each hop picks its best venue, cross-exchange cycles fall out alongside
+single-exchange triangles: the plain same-pair round trip (BTC -> ETH on
+Binance, ETH -> BTC on Luno) as a 2-cycle, and longer ones such as USDT ->
+BTC on Binance, BTC -> ZAR -> USDT on Luno.
+Inventory is assumed to be pre-positioned on both exchanges, so moving a
+currency between venues is free and instant.
+
+The ranked result is cached for SCANNER_TTL seconds and shared by every
+arbitrage user.
+"""
+import logging
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from circuit_breaker import http_get
+from exchange_info import split_pair
+from metrics import cache_hit, register_gauge
+
+logger = logging.getLogger(__name__)
+
+SCANNER_TTL = float(os.getenv("SCANNER_TTL", 5))
+SCANNER_MIN_EDGE_PCT = float(os.getenv("SCANNER_MIN_EDGE_PCT", 0.0))
+SCANNER_CURRENCIES = tuple(
+    c.strip().upper() for c in os.getenv("SCANNER_CURRENCIES", "BTC,ETH,XRP,LTC,SOL,USDT,USDC,ZAR").split(",") if c.strip()
+)
+BINANCE_TAKER_FEE = float(os.getenv("BINANCE_TAKER_FEE", 0.001))
+LUNO_TAKER_FEE = float(os.getenv("LUNO_TAKER_FEE", 0.001))
+
+
+# === Batched Tickers ===
+def fetch_binance_tickers() -> list:
+    """[(base, quote, bid, ask, pair)] for every Binance book ticker between scanned currencies."""
+    r = http_get("binance", "book_ticker", "https://api.binance.com/api/v3/ticker/bookTicker")
+    rows = []
+    for t in r.json():
+        split = split_pair(t["symbol"])
+        if split and split[0] in SCANNER_CURRENCIES and split[1] in SCANNER_CURRENCIES:
+            rows.append((split[0], split[1], float(t["bidPrice"]), float(t["askPrice"]), t["symbol"]))
+    return rows
+
+
+def fetch_luno_tickers() -> list:
+    r = http_get("luno", "tickers", "https://api.luno.com/api/1/tickers")
+    rows = []
+    for t in r.json().get("tickers", []):
+        split = split_pair(t["pair"])
+        if split and split[0] in SCANNER_CURRENCIES and split[1] in SCANNER_CURRENCIES:
+            if t.get("status", "ACTIVE") == "ACTIVE":
+                rows.append((split[0], split[1], float(t["bid"]), float(t["ask"]), t["pair"]))
+    return rows
+
+
+# === Currency Graph ===
+def build_graph(tickers_by_exchange: dict, fees: dict):
+    """
+    Returns (currencies, W, venue) where W[i, j] is the best log rate for
+    converting one unit of currencies[i] into currencies[j] after fees
+    (-inf when there is no market), and venue[i][j] = (exchange, pair, side).
+    """
+    currencies = sorted({c for rows in tickers_by_exchange.values() for row in rows for c in row[:2]})
+    index = {c: i for i, c in enumerate(currencies)}
+    n = len(currencies)
+    W = np.full((n, n), -np.inf)
+    venue = [[None] * n for _ in range(n)]
+
+    def offer(i, j, rate, leg):
+        if rate > 0:
+            log_rate = math.log(rate)
+            if log_rate > W[i, j]:
+                W[i, j] = log_rate
+                venue[i][j] = leg
+
+    for exchange, rows in tickers_by_exchange.items():
+        keep = 1.0 - fees.get(exchange, 0.0)
+        for base, quote, bid, ask, pair in rows:
+            if bid <= 0 or ask <= 0:
+                continue
+            b, q = index[base], index[quote]
+            offer(b, q, bid * keep, (exchange, pair, "sell"))        # sell base for quote at bid
+            offer(q, b, keep / ask, (exchange, pair, "buy"))         # buy base with quote at ask
+    return currencies, W, venue
+
+
+# === Vectorized Cycle Evaluation ===
+def _cycles2(W):
+    # c[i, j] = W[i, j] + W[j, i]; on one venue this is bid/ask < 1 after fees,
+    # so only a cross-exchange round trip (or a crossed book) can clear it
+    c = W + W.T
+    n = W.shape[0]
+    i, j = np.ogrid[:n, :n]
+    return np.where(i < j, c, -np.inf)
+
+
+def _cycles3(W):
+    # c[i, j, k] = W[i, j] + W[j, k] + W[k, i]
+    c = W[:, :, None] + W[None, :, :] + W.T[:, None, :]
+    n = W.shape[0]
+    i, j, k = np.ogrid[:n, :n, :n]
+    # Each rotation of a cycle appears once per starting node; keep the one
+    # that starts at its smallest index
+    c = np.where((i < j) & (i < k) & (j != k), c, -np.inf)
+    return c
+
+
+def _cycles4(W):
+    # c[i, j, k, l] = W[i, j] + W[j, k] + W[k, l] + W[l, i]
+    two = W[:, :, None] + W[None, :, :]
+    c = two[:, :, :, None] + W[None, None, :, :] + W.T[:, None, None, :]
+    n = W.shape[0]
+    i, j, k, l = np.ogrid[:n, :n, :n, :n]
+    return np.where((i < j) & (i < k) & (i < l) & (j != k) & (j != l) & (k != l), c, -np.inf)
+
+
+def find_cycles(currencies, W, venue, min_edge_pct=SCANNER_MIN_EDGE_PCT) -> list:
+    if not min_edge_pct > -100:
+        # a cycle can lose at most 100%; log1p is undefined at and below that
+        raise ValueError(f"min_edge_pct must be greater than -100, got {min_edge_pct}")
+    threshold = math.log1p(min_edge_pct / 100.0)
+    found = []
+    for cycles in (_cycles2(W), _cycles3(W), _cycles4(W)):
+        for idx in np.argwhere(cycles > threshold):
+            nodes = [int(x) for x in idx] + [int(idx[0])]
+            legs = []
+            for a, b in zip(nodes, nodes[1:]):
+                exchange, pair, side = venue[a][b]
+                legs.append({"from": currencies[a], "to": currencies[b], "exchange": exchange,
+                             "pair": pair, "side": side, "rate": round(math.exp(W[a, b]), 10)})
+            exchanges = {leg["exchange"] for leg in legs}
+            found.append({
+                "path": [currencies[x] for x in nodes],
+                "edge_pct": round(math.expm1(float(cycles[tuple(idx)])) * 100, 4),
+                "kind": "cross_exchange" if len(exchanges) > 1 else "triangular" if len(legs) > 2 else "crossed_book",
+                "legs": legs,
+            })
+    found.sort(key=lambda o: o["edge_pct"], reverse=True)
+    return found
+
+
+# === Shared Scan ===
+_lock = threading.Lock()
+_last_scan = {"at": 0.0, "opportunities": [], "pairs": 0}
+
+register_gauge("arbitrage_scanner_opportunities", "Opportunities found by the last arbitrage scan",
+               lambda: len(_last_scan["opportunities"]))
+
+
+def scan() -> list:
+    tickers = {}
+    for exchange, fetch in (("binance", fetch_binance_tickers), ("luno", fetch_luno_tickers)):
+        try:
+            tickers[exchange] = fetch()
+        except Exception as e:
+            logger.error(f"Scanner failed to fetch {exchange} tickers: {e}")
+            tickers[exchange] = []
+
+    currencies, W, venue = build_graph(tickers, {"binance": BINANCE_TAKER_FEE, "luno": LUNO_TAKER_FEE})
+    opportunities = find_cycles(currencies, W, venue) if currencies else []
+    _last_scan.update(at=time.monotonic(), opportunities=opportunities,
+                      pairs=sum(len(rows) for rows in tickers.values()))
+    return opportunities
+
+
+def get_opportunities(limit: int = None, max_age: float = SCANNER_TTL) -> list:
+    """Ranked opportunities from the shared scan, rescanning at most once per max_age."""
+    with _lock:
+        hit = time.monotonic() - _last_scan["at"] < max_age
+        cache_hit("arbitrage_scan", hit)
+        opportunities = _last_scan["opportunities"] if hit else scan()
+    return opportunities[:limit] if limit else list(opportunities)
@@ -1,8 +1,13 @@
 import logging
-from importlib import import_module
 from firebase_admin import db
+from metrics import firebase_call, strategy_call, CYCLE_SECONDS
+from tracing import start_trace, span
 from notifications_manager import evaluate_and_notify_user
 from exchanges import get_user_balance  # Correct import and function
+from market_data import prefetch
+from circuit_breaker import open_circuits
+from strategies import get_strategy, data_requirements
+from user_profile import update_profiles
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -11,71 +16,79 @@ def get_users_with_api_keys():
     """Fetch all users with API keys and strategy info from Firebase."""
     try:
         users_ref = db.reference("/users")
-        users_data = users_ref.get()
+        with firebase_call("read", "users"):
+            users_data = users_ref.get()
         if not users_data:
             return []
 
-        valid_users = []
-        for user_id, data in users_data.items():
-            if "binance_api_key" in data and "luno_api_key" in data and "strategy" in data:
-                valid_users.append({
-                    "user_id": user_id,
-                    "strategy": data.get("strategy", "arbitrage"),
-                    "risk_tolerance": data.get("risk_tolerance", 0.02),
-                    "profit_target": data.get("profit_target", 0.05),
-                    "binance_api_key": data["binance_api_key"],
-                    "binance_api_secret": data["binance_api_secret"],
-                    "luno_api_key": data["luno_api_key"],
-                    "luno_api_secret": data["luno_api_secret"],
-                    "strategy_config": data.get("strategy_config", {}),
-                    "notification_preferences": data.get("notification_preferences", {}),
-                    "daily_profit": data.get("daily_profit", 0),
-                    "last_trade_result": data.get("last_trade_result", None),
-                    "strategy_score": data.get("strategy_score", 1.0),
-                    "leaderboard_rank": data.get("leaderboard_rank", None),
-                    "platform": data.get("platform", "luno"),  # assume platform is saved
-                })
-
-        return valid_users
+        # Cached UserProfiles, rebuilt only for users whose data changed
+        return [
+            profile for profile in update_profiles(users_data)
+            if profile.binance_api_key and profile.luno_api_key and "strategy" in users_data[profile.user_id]
+        ]
     except Exception as e:
         logger.error(f"Error fetching users with API keys: {e}")
         return []
 
 def run_auto_bot():
     """Run auto bot for all registered users with valid strategy and API keys."""
+    with CYCLE_SECONDS.time("auto_bot"):
+        _run_cycle()
+
+def _run_cycle():
     users = get_users_with_api_keys()
     logger.info(f"Running auto bot for {len(users)} users")
 
+    # Resolve every strategy in use once, then fetch exactly the market data they need
+    strategies = {user["strategy"]: get_strategy(user["strategy"]) for user in users}
+    try:
+        prefetch(data_requirements(strategies.values()))
+    except Exception as e:
+        logger.error(f"Market data prefetch failed: {e}")
+
     for user in users:
-        user_id = user["user_id"]
-        platform = user.get("platform", "luno")  # fallback to 'luno'
+        with start_trace("auto_bot.user_cycle", user_id=user["user_id"], strategy=user["strategy"]):
+            _run_user(user, strategies.get(user["strategy"]))
 
-        logger.info(f"[{user_id}] Checking balance before running strategy")
+    logger.info("Auto bot cycle complete.")
 
-        try:
+def _run_user(user, strategy):
+    user_id = user["user_id"]
+    platform = user.get("platform", "luno")  # fallback to 'luno'
+
+    logger.info(f"[{user_id}] Checking balance before running strategy")
+
+    try:
+        with span("balance_check", platform=platform):
             balances = get_user_balance(user_id, platform)  # ✅ fixed function call
-            total_balance = sum(balances.values())
+        total_balance = sum(balances.values())
 
-            if total_balance < 100:
-                logger.info(f"[{user_id}] Chill notice: 🧘 Your balance is R{total_balance:.2f}. You need R100 minimum to activate the trading bot.")
-                continue
-        except Exception as e:
-            logger.error(f"[{user_id}] Error fetching balance: {e}")
-            continue
+        if total_balance < 100:
+            logger.info(f"[{user_id}] Chill notice: 🧘 Your balance is R{total_balance:.2f}. You need R100 minimum to activate the trading bot.")
+            return
+    except Exception as e:
+        logger.error(f"[{user_id}] Error fetching balance: {e}")
+        return
+
+    logger.info(f"[{user_id}] Running strategy '{user['strategy']}'")
 
-        logger.info(f"[{user_id}] Running strategy '{user['strategy']}'")
+    # Fail fast while an exchange the strategy reads from is tripped
+    blocked = open_circuits({req["source"] for req in strategy.data_requirements}) if strategy else []
 
+    if strategy is None:
+        logger.error(f"[{user_id}] Strategy '{user['strategy']}' not found")
+    elif blocked:
+        logger.warning(f"[{user_id}] Skipping '{strategy.name}' this cycle: "
+                       f"{', '.join(f'{b.exchange}.{b.endpoint}' for b in blocked)} circuit open")
+    else:
         try:
-            strategy_module = import_module(f"strategies.{user['strategy']}")
-            strategy_module.execute(user)  # Strategy updates user’s profit/loss in Firebase
-        except ModuleNotFoundError:
-            logger.error(f"[{user_id}] Strategy '{user['strategy']}' not found")
+            with strategy_call(strategy.name):
+                strategy.execute(user)  # Strategy updates user’s profit/loss in Firebase
         except Exception as e:
             logger.error(f"[{user_id}] Error executing strategy: {e}")
 
-        try:
+    try:
+        with span("notifications"):
             evaluate_and_notify_user(user)
-        except Exception as e:
-            logger.error(f"[{user_id}] Notifications error: {e}")
-
-    logger.info("Auto bot cycle complete.")
+    except Exception as e:
+        logger.error(f"[{user_id}] Notifications error: {e}")
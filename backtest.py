@@ -0,0 +1,254 @@
+"""
+Vectorized backtests of the strategies/ modules on historical candles.
+
+Candles live in a .npy file of float64 rows (open_time_ms, open, high, low,
+close, volume), normally 1m Binance klines, and are opened memory-mapped so
+several processes can share one copy through the page cache:
+
+    python -m backtest fetch --symbol BTCUSDT --days 365 --out data/btcusdt_1m.npy
+    python -m backtest run dip_buyer --candles data/btcusdt_1m.npy dip_threshold=-2.5
+
+A strategy takes part by defining signals(ind, params) next to execute(): it
+gets an Indicators view of closes at the interval of its klines requirement
+and returns one int8 per bar (1 buy, -1 sell, 0 hold), decided on that bar's
+close. Per-bar series a strategy derives itself should go through
+ind.cached() so walk-forward windows reuse them. simulate() then trades
+risk_tolerance of current equity per signal at the close, paying
+BACKTEST_FEE per side.
+"""
+import argparse
+import logging
+import os
+import time
+
+import numpy as np
+
+from circuit_breaker import http_get
+from strategies import get_strategy
+
+logger = logging.getLogger(__name__)
+
+BACKTEST_FEE = float(os.getenv("BACKTEST_FEE", 0.001))
+BACKTEST_CAPITAL = float(os.getenv("BACKTEST_CAPITAL", 10000))
+KLINES_URL = "https://api.binance.com/api/v3/klines"
+
+OPEN_TIME, OPEN, HIGH, LOW, CLOSE, VOLUME = range(6)
+INTERVAL_MS = {
+    "1m": 60_000, "3m": 180_000, "5m": 300_000, "15m": 900_000, "30m": 1_800_000,
+    "1h": 3_600_000, "2h": 7_200_000, "4h": 14_400_000, "1d": 86_400_000,
+}
+
+
+# === Candles ===
+def fetch_candles(path, symbol="BTCUSDT", interval="1m", days=365, end_ms=None):
+    """Download klines page by page straight into a .npy file; returns the row count."""
+    step = INTERVAL_MS[interval]
+    end_ms = end_ms or int(time.time() * 1000) // step * step
+    start_ms = end_ms - days * 86_400_000
+    rows = np.lib.format.open_memmap(path, mode="w+", dtype=np.float64, shape=((end_ms - start_ms) // step, 6))
+    count, cursor = 0, start_ms
+    while cursor < end_ms and count < len(rows):
+        page = http_get("binance", "klines", KLINES_URL, params={
+            "symbol": symbol, "interval": interval, "startTime": cursor, "endTime": end_ms - 1, "limit": 1000,
+        }).json()
+        if not page:
+            break
+        page = np.array([k[:6] for k in page], dtype=np.float64)[: len(rows) - count]
+        rows[count:count + len(page)] = page
+        count += len(page)
+        cursor = int(page[-1, OPEN_TIME]) + step
+    rows.flush()
+    del rows
+    if count < (end_ms - start_ms) // step:
+        # Gaps in exchange history: rewrite at the real length
+        np.save(path, np.array(np.load(path, mmap_mode="r")[:count]))
+    logger.info(f"Saved {count} {symbol} {interval} candles to {path}")
+    return count
+
+
+def load_candles(path) -> np.ndarray:
+    """Read-only memory map of a candle file; pages are shared between processes."""
+    return np.load(path, mmap_mode="r")
+
+
+def resample_closes(candles, interval):
+    """(open_times, closes) at a coarser interval; the last close in each bucket wins."""
+    times, closes = candles[:, OPEN_TIME], candles[:, CLOSE]
+    base = int(times[1] - times[0]) if len(times) > 1 else INTERVAL_MS[interval]
+    if INTERVAL_MS[interval] == base:
+        return np.asarray(times), np.asarray(closes)
+    buckets = (times // INTERVAL_MS[interval]).astype(np.int64)
+    last = np.flatnonzero(np.diff(buckets, append=buckets[-1] + 1))
+    return buckets[last] * INTERVAL_MS[interval], np.asarray(closes[last])
+
+
+# === Indicators ===
+class Indicators:
+    """
+    Closes at one interval plus lazily computed, cached indicator series.
+
+    window(start, stop) gives a view over some of the bars whose indicators
+    are slices of the full-history series, so an EWM or moving average enters
+    the window already warmed up and is only ever computed once.
+    """
+
+    def __init__(self, closes, times=None, parent=None, start=0):
+        self.closes = np.asarray(closes, dtype=np.float64)
+        self.times = times
+        self._parent, self._start = parent, start
+        self._cache = {}
+
+    def __len__(self):
+        return len(self.closes)
+
+    def window(self, start, stop) -> "Indicators":
+        root = self._parent or self
+        start, stop = self._start + start, self._start + stop
+        times = root.times[start:stop] if root.times is not None else None
+        return Indicators(root.closes[start:stop], times, parent=root, start=start)
+
+    def cached(self, key, fn):
+        """fn(closes) -> one value per bar, computed once over the full history."""
+        if self._parent is not None:
+            return self._parent.cached(key, fn)[self._start:self._start + len(self.closes)]
+        value = self._cache.get(key)
+        if value is None:
+            value = self._cache[key] = fn(self.closes)
+        return value
+
+    def sma(self, n):
+        """Mean of the last n closes including the current one (NaN until n bars exist)."""
+        def compute(closes):
+            out = np.full(len(closes), np.nan)
+            if len(closes) >= n:
+                sums = np.cumsum(np.concatenate(([0.0], closes)))
+                out[n - 1:] = (sums[n:] - sums[:-n]) / n
+            return out
+        return self.cached(("sma", n), compute)
+
+    def pct_change(self, n=1):
+        def compute(closes):
+            out = np.full(len(closes), np.nan)
+            out[n:] = (closes[n:] - closes[:-n]) / closes[:-n] * 100
+            return out
+        return self.cached(("pct_change", n), compute)
+
+    def rsi(self, period):
+        """Same EWM RSI as trading_api.get_rsi (pandas ewm, adjust=True), for every bar."""
+        def compute(closes):
+            out = np.full(len(closes), np.nan)
+            delta = np.diff(closes)
+            gains, losses = np.clip(delta, 0, None), np.clip(-delta, 0, None)
+            decay = 1 - 1 / period
+            num_gain = num_loss = weight = 0.0
+            for i in range(len(delta)):
+                num_gain = gains[i] + decay * num_gain
+                num_loss = losses[i] + decay * num_loss
+                weight = 1 + decay * weight
+                if i + 1 >= period:
+                    avg_loss = num_loss / weight
+                    out[i + 1] = 100.0 if avg_loss == 0 else 100 - 100 / (1 + (num_gain / weight) / avg_loss)
+            return out
+        return self.cached(("rsi", period), compute)
+
+
+def signal_interval(spec) -> str:
+    for req in spec.data_requirements:
+        if req.get("kind") == "klines":
+            return req["interval"]
+    raise ValueError(f"Strategy '{spec.name}' has no klines requirement to backtest on")
+
+
+def indicators_for(spec, candles) -> Indicators:
+    times, closes = resample_closes(candles, signal_interval(spec))
+    return Indicators(closes, times)
+
+
+# === Simulation ===
+def simulate(closes, signals, risk_tolerance, fee=BACKTEST_FEE, capital=BACKTEST_CAPITAL, equity_curve=False):
+    """
+    Trade risk_tolerance of current equity at the close of every signal bar.
+    Returns total_return and max_drawdown as fractions, plus the trade count.
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    events = np.flatnonzero(signals)
+    cash, base = capital, 0.0
+    trades = 0
+    cash_at, base_at = [], []
+    # Plain floats: this loop runs once per signal and numpy scalars are slow here
+    for price, side in zip(closes[events].tolist(), np.asarray(signals)[events].tolist()):
+        notional = (cash + base * price) * risk_tolerance
+        if side > 0:
+            spend = min(notional, cash)
+            if spend > 0:
+                cash -= spend
+                base += spend * (1 - fee) / price
+                trades += 1
+        else:
+            qty = min(notional / price, base)
+            if qty > 0:
+                base -= qty
+                cash += qty * price * (1 - fee)
+                trades += 1
+        cash_at.append(cash)
+        base_at.append(base)
+
+    # Holdings are constant between events: forward-fill them over every bar
+    if len(events):
+        held = np.searchsorted(events, np.arange(len(closes)), side="right") - 1
+        first = np.maximum(held, 0)
+        equity = np.where(held >= 0, np.take(cash_at, first) + np.take(base_at, first) * closes, capital)
+    else:
+        equity = np.full(len(closes), capital)
+    peaks = np.maximum.accumulate(equity)
+    result = {
+        "total_return": float(equity[-1] / capital - 1) if len(equity) else 0.0,
+        "max_drawdown": float(((peaks - equity) / peaks).max()) if len(equity) else 0.0,
+        "trades": trades,
+    }
+    if equity_curve:
+        result["equity"] = equity
+    return result
+
+
+def run_backtest(strategy, params=None, candles=None, ind=None, **kwargs) -> dict:
+    """Backtest one strategy with its PARAMETERS defaults overridden by params."""
+    spec = get_strategy(strategy) if isinstance(strategy, str) else strategy
+    if spec is None or spec.signals is None:
+        raise ValueError(f"Strategy '{strategy}' does not support backtesting")
+    params = {**spec.parameters, **(params or {})}
+    ind = ind if ind is not None else indicators_for(spec, candles)
+    signals = spec.signals(ind, params)
+    return simulate(ind.closes, signals, params.get("risk_tolerance", 0.02), **kwargs)
+
+
+def _parse_value(text):
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    commands = parser.add_subparsers(dest="command", required=True)
+    fetch = commands.add_parser("fetch", help="download klines into a .npy candle file")
+    fetch.add_argument("--symbol", default="BTCUSDT")
+    fetch.add_argument("--interval", default="1m")
+    fetch.add_argument("--days", type=int, default=365)
+    fetch.add_argument("--out", required=True)
+    run = commands.add_parser("run", help="backtest one parameter set")
+    run.add_argument("strategy")
+    run.add_argument("--candles", required=True)
+    run.add_argument("params", nargs="*", help="name=value overrides")
+    args = parser.parse_args()
+
+    if args.command == "fetch":
+        fetch_candles(args.out, args.symbol, args.interval, args.days)
+    else:
+        overrides = dict(p.split("=", 1) for p in args.params)
+        result = run_backtest(args.strategy, {k: _parse_value(v) for k, v in overrides.items()},
+                              load_candles(args.candles))
+        print(f"return {result['total_return']:.2%}  max drawdown {result['max_drawdown']:.2%}  "
+              f"trades {result['trades']}")
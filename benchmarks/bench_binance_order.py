@@ -0,0 +1,81 @@
+"""
+Submit-to-ack latency of Binance market orders against the simulated exchange.
+
+    python -m benchmarks.bench_binance_order [--orders 500] [--latency-ms 1] [--skew-ms 0]
+
+Compares a per-call path (new session, fresh HMAC, local clock — what a
+freshly built client does) with binance_fastpath (pooled warm session, cached
+HMAC state and static params, server time offset). With --skew-ms beyond
+recvWindow the per-call path is rejected with -1021 while the fast path stays
+inside the window.
+"""
+import argparse
+import hashlib
+import hmac
+import statistics
+import time
+from urllib.parse import urlencode
+
+import requests
+
+import binance_fastpath
+from benchmarks.sim_exchange import SIM_API_KEY, SIM_API_SECRET, SimExchange
+
+
+def per_call_order(base_url):
+    params = {"symbol": "BTCUSDT", "side": "BUY", "type": "MARKET", "quantity": "0.001",
+              "newOrderRespType": "FULL", "recvWindow": 5000, "timestamp": int(time.time() * 1000)}
+    query = urlencode(params)
+    signature = hmac.new(SIM_API_SECRET.encode(), query.encode(), hashlib.sha256).hexdigest()
+    with requests.Session() as session:
+        r = session.post(f"{base_url}/api/v3/order", data=f"{query}&signature={signature}",
+                         headers={"X-MBX-APIKEY": SIM_API_KEY,
+                                  "Content-Type": "application/x-www-form-urlencoded"}, timeout=10)
+    return r.status_code == 200
+
+
+def fast_path_order(signer):
+    try:
+        signer.market_order("BTCUSDT", "BUY", quantity="0.001")
+        return True
+    except binance_fastpath.BinanceAPIError:
+        return False
+
+
+def _measure(fn, orders):
+    latencies, failures = [], 0
+    for _ in range(orders):
+        start = time.perf_counter()
+        ok = fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+        failures += not ok
+    return latencies, failures
+
+
+def _report(name, latencies, failures):
+    latencies = sorted(latencies)
+    pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+    print(f"{name:<12}{statistics.mean(latencies):>9.3f}{pct(0.5):>9.3f}{pct(0.9):>9.3f}"
+          f"{pct(0.99):>9.3f}{failures:>10}")
+
+
+def run(orders, latency_ms, skew_ms):
+    with SimExchange(latency_ms=latency_ms, clock_skew_ms=skew_ms) as sim:
+        binance_fastpath.BINANCE_API_URL = sim.url
+        binance_fastpath.start_fastpath()
+        signer = binance_fastpath.get_signer(SIM_API_KEY, SIM_API_SECRET)
+
+        print(f"sim exchange {sim.url}: latency {latency_ms} ms, clock skew {skew_ms} ms, "
+              f"measured offset {binance_fastpath.clock.offset_ms} ms\n")
+        print(f"{'path':<12}{'mean ms':>9}{'p50':>9}{'p90':>9}{'p99':>9}{'rejected':>10}")
+        _report("per-call", *_measure(lambda: per_call_order(sim.url), orders))
+        _report("fast path", *_measure(lambda: fast_path_order(signer), orders))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=1.0)
+    parser.add_argument("--skew-ms", type=int, default=0)
+    args = parser.parse_args()
+    run(args.orders, args.latency_ms, args.skew_ms)
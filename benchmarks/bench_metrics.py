@@ -0,0 +1,70 @@
+"""
+Overhead of the metrics instrumentation.
+
+    python -m benchmarks.bench_metrics [--iterations 200000]
+
+Reports nanoseconds per operation for a bare `with` block versus the
+instrumented exchange_call()/observe() paths, and the cost of a /metrics scrape.
+"""
+import argparse
+import time
+from contextlib import nullcontext
+
+import metrics
+
+
+def _per_op_ns(fn, iterations):
+    start = time.perf_counter_ns()
+    fn(iterations)
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def bare_with(n):
+    for _ in range(n):
+        with nullcontext():
+            pass
+
+
+def exchange_call(n):
+    for _ in range(n):
+        with metrics.exchange_call("binance", "ticker"):
+            pass
+
+
+def observe(n):
+    histogram = metrics.EXCHANGE_REQUEST_SECONDS
+    for _ in range(n):
+        histogram.observe(0.05, "binance", "ticker", "ok")
+
+
+def cache_hit(n):
+    for _ in range(n):
+        metrics.cache_hit("klines", True)
+
+
+def run(iterations):
+    baseline = _per_op_ns(bare_with, iterations)
+    results = {
+        "bare with-block": baseline,
+        "exchange_call()": _per_op_ns(exchange_call, iterations),
+        "Histogram.observe()": _per_op_ns(observe, iterations),
+        "cache_hit()": _per_op_ns(cache_hit, iterations),
+    }
+    print(f"{'operation':<24}{'ns/op':>10}{'overhead ns':>14}")
+    for name, ns in results.items():
+        print(f"{name:<24}{ns:>10.0f}{ns - baseline:>14.0f}")
+
+    # Scrape cost with a realistic number of label series
+    for exchange in ("binance", "luno"):
+        for endpoint in ("ticker", "klines", "balance", "order", "depth"):
+            for status in ("ok", "error"):
+                metrics.EXCHANGE_REQUEST_SECONDS.observe(0.1, exchange, endpoint, status)
+    start = time.perf_counter()
+    body = metrics.render()
+    print(f"\n/metrics render: {(time.perf_counter() - start) * 1000:.2f} ms, {len(body)} bytes")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200000)
+    run(parser.parse_args().iterations)
@@ -0,0 +1,93 @@
+"""
+Memory and allocation cost of per-user records in the trading loop.
+
+    python -m benchmarks.bench_user_profile [--users 10000] [--cycles 5]
+
+Compares the per-cycle dict copies the runners used to build for every user
+with the cached UserProfiles: bytes retained per user, and bytes allocated
+per cycle when no user's data has changed.
+"""
+import argparse
+import time
+import tracemalloc
+
+import user_profile
+
+
+def make_users(n) -> dict:
+    return {
+        f"user{i}": {
+            "binance_api_key": f"bk{i:08d}", "binance_api_secret": f"bs{i:08d}",
+            "luno_api_key": f"lk{i:08d}", "luno_api_secret": f"ls{i:08d}",
+            "strategy": "dip_buyer", "risk_tolerance": 0.02, "profit_target": 50,
+            "dip_threshold": -3.0, "platform": "luno", "active": True,
+            "notifications": {"telegram": True, "push": True, "email": False},
+            "autobot": {"status": True}, "daily_profit": 0.0, "strategy_score": 1.0,
+        }
+        for i in range(n)
+    }
+
+
+def dict_records(users_data) -> list:
+    """The per-cycle copy made before UserProfile, one fresh dict per user."""
+    return [{
+        "user_id": user_id,
+        "strategy": data.get("strategy", "default"),
+        "risk_tolerance": data.get("risk_tolerance", 0.02),
+        "profit_target": data.get("profit_target", 50),
+        "dip_threshold": data.get("dip_threshold", -3.0),
+        "range_lower_bound": data.get("range_lower_bound", 29500),
+        "range_upper_bound": data.get("range_upper_bound", 30500),
+        "binance_api_key": data.get("binance_api_key"),
+        "binance_api_secret": data.get("binance_api_secret"),
+        "luno_api_key": data.get("luno_api_key"),
+        "luno_api_secret": data.get("luno_api_secret"),
+        "notification_prefs": data.get("notifications", {}),
+        "autobot": data.get("autobot", {}),
+        "daily_profit": data.get("daily_profit", 0),
+        "strategy_score": data.get("strategy_score", 1.0),
+        "platform": data.get("platform", "luno"),
+    } for user_id, data in users_data.items()]
+
+
+def _measure(fn, users_data, cycles):
+    """(bytes retained by the first cycle's records, peak bytes allocated per later cycle, ms per cycle)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = fn(users_data)
+    retained = tracemalloc.get_traced_memory()[0] - before
+    allocated = 0
+    for _ in range(cycles):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        fn(users_data)
+        allocated += tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    # Timed separately: tracing slows allocation-heavy code unevenly
+    start = time.perf_counter()
+    for _ in range(cycles):
+        fn(users_data)
+    elapsed = time.perf_counter() - start
+    del kept
+    return retained, allocated / cycles, elapsed / cycles * 1000
+
+
+def run(users, cycles):
+    users_data = make_users(users)
+    results = {
+        "dict per cycle": _measure(dict_records, users_data, cycles),
+        "UserProfile cache": _measure(user_profile.update_profiles, users_data, cycles),
+    }
+    print(f"{users} users, {cycles} cycles")
+    print(f"{'records':<20}{'bytes/user':>12}{'alloc/cycle KiB':>17}{'ms/cycle':>10}")
+    for name, (retained, allocated, ms) in results.items():
+        print(f"{name:<20}{retained / users:>12.0f}{allocated / 1024:>17.0f}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--cycles", type=int, default=5)
+    args = parser.parse_args()
+    run(args.users, args.cycles)
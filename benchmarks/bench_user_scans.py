@@ -0,0 +1,74 @@
+"""
+Bytes transferred by user scans: full users/ read versus the user_queries helpers.
+
+    FIREBASE_BACKEND=memory python -m benchmarks.bench_user_scans [--users 2000]
+
+    firebase emulators:start --only database      # in another shell, with database.rules.json
+    FIREBASE_DATABASE_EMULATOR_HOST=localhost:9000 python -m benchmarks.bench_user_scans
+
+Seeds the in-memory database or the emulator with users carrying a trade
+history, then runs each scan and reports reads, JSON bytes and wall time.
+Refuses to run against anything else so it never writes to a real database.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+from firebase_admin import db
+
+from firebase import initialize_firebase
+
+STRATEGIES = ("dip_buyer", "momentum_trading", "range_trader", "trend_follow")
+
+
+def seed(users, trades_per_user):
+    rng = random.Random(42)
+    data = {}
+    for i in range(users):
+        data[f"bench{i:06d}"] = {
+            "first_name": f"User{i}", "strategy": rng.choice(STRATEGIES), "active": rng.random() < 0.5,
+            "autobot": {"status": rng.random() < 0.2}, "risk_tolerance": 0.02, "dip_threshold": -3.0,
+            "total_profit": round(rng.uniform(-500, 5000), 2),
+            "binance_api_key": "k" * 64, "binance_api_secret": "s" * 64,
+            "trades": {f"t{j}": {"symbol": "BTCUSDT", "side": "buy", "quantity": 0.001, "price": 30000 + j,
+                                 "timestamp": 1700000000 + j} for j in range(trades_per_user)},
+        }
+    db.reference("users").set(data)
+
+
+def run(users, trades_per_user):
+    import user_queries
+
+    seed(users, trades_per_user)
+    scans = {
+        "full users/ read": lambda: user_queries._read("full", db.reference("users")),
+        "user_ids()": user_queries.user_ids,
+        "active_autobot_users()": user_queries.active_autobot_users,
+        "users_with_strategy()": lambda: user_queries.users_with_strategy("dip_buyer", fields=("risk_tolerance",)),
+        "top(total_profit, 10)": lambda: user_queries.top("total_profit", 10, fields=("first_name", "total_profit")),
+        "project(2 fields)": lambda: user_queries.project(("strategy", "autobot/status")),
+    }
+    print(f"{users} users, {trades_per_user} trades each")
+    print(f"{'scan':<26}{'reads':>8}{'KiB':>12}{'ms':>10}")
+    for name, scan in scans.items():
+        reads_before = sum(user_queries.READS.values().values())
+        bytes_before = sum(user_queries.READ_BYTES.values().values())
+        start = time.perf_counter()
+        scan()
+        elapsed = (time.perf_counter() - start) * 1000
+        reads = sum(user_queries.READS.values().values()) - reads_before
+        size = sum(user_queries.READ_BYTES.values().values()) - bytes_before
+        print(f"{name:<26}{reads:>8}{size / 1024:>12.1f}{elapsed:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--trades", type=int, default=20, help="trades per user")
+    args = parser.parse_args()
+    if not os.getenv("FIREBASE_DATABASE_EMULATOR_HOST") and os.getenv("FIREBASE_BACKEND") != "memory":
+        sys.exit("Set FIREBASE_BACKEND=memory or FIREBASE_DATABASE_EMULATOR_HOST; this benchmark overwrites users/.")
+    initialize_firebase()
+    run(args.users, args.trades)
@@ -0,0 +1,248 @@
+"""
+Local simulated exchange for benchmarks.
+
+Serves the subset of the Binance and Luno REST APIs the bot uses, on
+127.0.0.1 from a background thread, with configurable response latency and
+server clock skew:
+
+    GET  /api/v3/ping
+    GET  /api/v3/time
+    GET  /api/v3/ticker/bookTicker
+    GET  /api/v3/ticker/price
+    GET  /api/v3/depth
+    GET  /api/v3/account    (HMAC-verified)
+    POST /api/v3/order      (HMAC-verified, recvWindow enforced, always FILLED)
+    GET  /api/v3/order      (HMAC-verified, by origClientOrderId)
+    GET  /api/1/ticker      (Luno)
+    GET  /api/1/orderbook_top
+    GET  /api/1/balance
+
+    with SimExchange(latency_ms=1, clock_skew_ms=0) as sim:
+        os.environ["BINANCE_API_URL"] = sim.url
+
+Code with hard-coded exchange URLs (python-binance, the Luno helpers) is
+pointed at the simulator with route_requests(sim), which sends every
+`requests` call for api.binance.com / api.luno.com there instead.
+"""
+import hashlib
+import hmac
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+SIM_API_KEY = "sim-key"
+SIM_API_SECRET = "sim-secret"
+SIM_ZAR_PER_USDT = 18.5
+ROUTED_HOSTS = ("https://api.binance.com", "https://api.luno.com")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is measurable
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        sim = self.server.sim
+        sim.delay()
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        if url.path == "/api/v3/ping":
+            self._send(200, {})
+        elif url.path == "/api/v3/time":
+            self._send(200, {"serverTime": sim.now_ms()})
+        elif url.path == "/api/v3/ticker/bookTicker":
+            self._send(200, sim.book_ticker(params.get("symbol", "BTCUSDT")))
+        elif url.path == "/api/v3/ticker/price":
+            self._send(200, {"symbol": params.get("symbol", "BTCUSDT"), "price": f"{sim.price:.2f}"})
+        elif url.path == "/api/v3/depth":
+            self._send(200, sim.depth(int(params.get("limit", 100))))
+        elif url.path == "/api/v3/account":
+            self._send(*sim.account(url.query, self.headers.get("X-MBX-APIKEY")))
+        elif url.path == "/api/v3/order":
+            self._send(*sim.query_order(url.query, self.headers.get("X-MBX-APIKEY")))
+        elif url.path == "/api/1/ticker":
+            self._send(200, sim.luno_ticker(params.get("pair", "XBTZAR")))
+        elif url.path == "/api/1/orderbook_top":
+            self._send(200, sim.luno_book(params.get("pair", "XBTZAR")))
+        elif url.path == "/api/1/balance":
+            self._send(200, {"balance": [{"asset": "XBT", "balance": "0.050000"},
+                                         {"asset": "ZAR", "balance": "2500.00"}]})
+        else:
+            self._send(404, {"code": -1, "msg": f"Unknown path {url.path}"})
+
+    def do_POST(self):
+        sim = self.server.sim
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        sim.delay()
+        if urlsplit(self.path).path != "/api/v3/order":
+            self._send(404, {"code": -1, "msg": "Unknown path"})
+            return
+        status, payload = sim.place_order(body, self.headers.get("X-MBX-APIKEY"))
+        self._send(status, payload)
+
+
+class SimExchange:
+    def __init__(self, latency_ms=0.0, clock_skew_ms=0, price=60000.0,
+                 api_key=SIM_API_KEY, api_secret=SIM_API_SECRET, port=0):
+        self.latency = latency_ms / 1000.0
+        self.clock_skew_ms = clock_skew_ms
+        self.price = price
+        self.api_key = api_key
+        self.api_secret = api_secret.encode()
+        self.stats = {"orders": 0, "rejected": 0}
+        self._order_ids = itertools.count(1)
+        self.orders = {}  # newClientOrderId -> order
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.sim = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="sim-exchange", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # === Simulation ===
+    def delay(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def now_ms(self) -> int:
+        return int(time.time() * 1000) + self.clock_skew_ms
+
+    def book_ticker(self, symbol):
+        return {"symbol": symbol, "bidPrice": f"{self.price - 0.5:.2f}", "bidQty": "1.0",
+                "askPrice": f"{self.price + 0.5:.2f}", "askQty": "1.0"}
+
+    def depth(self, limit):
+        return {
+            "lastUpdateId": self.now_ms(),
+            "bids": [[f"{self.price - 0.5 - i:.2f}", "0.5"] for i in range(limit)],
+            "asks": [[f"{self.price + 0.5 + i:.2f}", "0.5"] for i in range(limit)],
+        }
+
+    def luno_price(self, pair):
+        return SIM_ZAR_PER_USDT if pair.startswith("USDT") else self.price * SIM_ZAR_PER_USDT
+
+    def luno_ticker(self, pair):
+        price = self.luno_price(pair)
+        return {"pair": pair, "timestamp": self.now_ms(), "bid": f"{price * 0.9995:.2f}",
+                "ask": f"{price * 1.0005:.2f}", "last_trade": f"{price:.2f}", "status": "ACTIVE"}
+
+    def luno_book(self, pair):
+        price = self.luno_price(pair)
+        return {"timestamp": self.now_ms(),
+                "bids": [{"price": f"{price * 0.9995 - i:.2f}", "volume": "0.5"} for i in range(10)],
+                "asks": [{"price": f"{price * 1.0005 + i:.2f}", "volume": "0.5"} for i in range(10)]}
+
+    def _verify(self, query: str, api_key: str):
+        """Parsed params of a signed request, or None when the key or HMAC is wrong."""
+        query, _, signature = query.rpartition("&signature=")
+        expected = hmac.new(self.api_secret, query.encode(), hashlib.sha256).hexdigest()
+        if api_key != self.api_key or not hmac.compare_digest(signature, expected):
+            self.stats["rejected"] += 1
+            return None
+        return dict(parse_qsl(query))
+
+    def account(self, query: str, api_key: str):
+        if self._verify(query, api_key) is None:
+            return 400, {"code": -1022, "msg": "Signature for this request is not valid."}
+        return 200, {"balances": [{"asset": "BTC", "free": "0.01000000", "locked": "0.00000000"},
+                                  {"asset": "USDT", "free": "250.00000000", "locked": "0.00000000"}]}
+
+    def place_order(self, body: str, api_key: str):
+        params = self._verify(body, api_key)
+        if params is None:
+            return 400, {"code": -1022, "msg": "Signature for this request is not valid."}
+
+        server_time = self.now_ms()
+        timestamp = int(params.get("timestamp", 0))
+        recv_window = int(params.get("recvWindow", 5000))
+        if timestamp > server_time + 1000 or server_time - timestamp > recv_window:
+            self.stats["rejected"] += 1
+            return 400, {"code": -1021, "msg": "Timestamp for this request is outside of the recvWindow."}
+
+        if "quantity" in params:
+            qty = float(params["quantity"])
+        else:
+            qty = float(params["quoteOrderQty"]) / self.price
+        self.stats["orders"] += 1
+        order = {
+            "symbol": params.get("symbol"),
+            "orderId": next(self._order_ids),
+            "clientOrderId": params.get("newClientOrderId"),
+            "transactTime": server_time,
+            "status": "FILLED",
+            "type": params.get("type"),
+            "side": params.get("side"),
+            "executedQty": f"{qty:.8f}",
+            "cummulativeQuoteQty": f"{qty * self.price:.8f}",
+        }
+        if order["clientOrderId"]:
+            self.orders[order["clientOrderId"]] = order
+        return 200, order
+
+    def query_order(self, query: str, api_key: str):
+        params = self._verify(query, api_key)
+        if params is None:
+            return 400, {"code": -1022, "msg": "Signature for this request is not valid."}
+        order = self.orders.get(params.get("origClientOrderId"))
+        if order is None:
+            return 400, {"code": -2013, "msg": "Order does not exist."}
+        return 200, order
+
+
+# === Routing Hard-Coded URLs ===
+class _SimAdapter(HTTPAdapter):
+    def __init__(self, sim_url):
+        super().__init__(pool_maxsize=64)
+        self.sim_url = sim_url
+
+    def send(self, request, **kwargs):
+        for host in ROUTED_HOSTS:
+            if request.url.startswith(host):
+                request.url = self.sim_url + request.url[len(host):]
+                break
+        return super().send(request, **kwargs)
+
+
+def route_requests(sim):
+    """Send every `requests` call for the real exchange hosts to `sim`, for the rest of the process."""
+    adapter = _SimAdapter(sim.url)
+    get_adapter = Session.get_adapter
+
+    def routed(session, url):
+        return adapter if url.startswith(ROUTED_HOSTS) else get_adapter(session, url)
+
+    Session.get_adapter = routed
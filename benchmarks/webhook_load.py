@@ -0,0 +1,356 @@
+"""
+Load test for the Telegram webhook: updates per second, latency and errors per command.
+
+    python -m benchmarks.webhook_load [--requests 2000] [--concurrency 50]
+        [--mix balance=3,price=3,leaderboard=1,trade=2,autobot=1] [--users 200]
+        [--replay updates.jsonl] [--sources 1] [--no-rate-limit]
+        [--exchange-latency-ms 20] [--firebase-latency-ms 5]
+
+Drives main.app in-process through httpx's ASGI transport, so the whole
+webhook path runs: HTTPS redirect, rate limiter, secret-token and bearer
+checks, Update.de_json, process_update and the command handler. Everything
+the handlers reach is local:
+
+    Firebase   FIREBASE_BACKEND=memory, seeded with --users registered users
+    exchanges  benchmarks.sim_exchange; api.binance.com / api.luno.com calls are routed to it
+    Telegram   the bot's HTTP layer is replaced by a stub that answers getMe and
+               records every reply (sendMessage etc.) instead of sending it
+
+Updates are generated from --mix (weights per command), or replayed from a
+JSONL file of recorded Telegram updates with fresh update_ids. Telegram
+delivers webhooks from a handful of addresses, so by default every request
+comes from one client address and shares the webhook's 10/second limit;
+--sources spreads them over more addresses, --no-rate-limit switches the
+limiter off to measure the handlers alone. One update per command is sent
+first, unmeasured, to pay for lazy imports. Startup events (set_webhook,
+the strategy loop) are not run.
+
+Per command it reports throughput, p50/p90/p99/max latency, and errors:
+non-200 responses, handler exceptions (seen by the bot's error handlers)
+and replies that report a failure (starting with ❌, ⚠️ or 🚫).
+"""
+import argparse
+import asyncio
+import base64
+import contextlib
+import contextvars
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+
+from benchmarks.sim_exchange import SIM_API_KEY, SIM_API_SECRET, SimExchange, route_requests
+
+BOT_TOKEN = "123456:load-test"
+WEBHOOK_SECRET = "load-test-secret"
+COMMANDS = {
+    "balance": "/balance",
+    "price": "/price binance BTCUSDT",
+    "leaderboard": "/leaderboard",
+    "trade": "/trade BUY BTCUSDT 0.001",
+    "autobot": "/autobot",
+}
+DEFAULT_MIX = "balance=3,price=3,leaderboard=1,trade=2,autobot=1"
+FAILURE_PREFIXES = ("❌", "⚠️", "🚫")
+USER_ID_BASE = 700000000
+WARMUP_UPDATE_ID = 10 ** 9
+
+_sample = contextvars.ContextVar("webhook_load_sample", default=None)
+
+
+def configure_environment(firebase_latency_ms):
+    """Settings main.py validates at import, all pointing at local stand-ins."""
+    from cryptography.fernet import Fernet
+
+    credentials = {"type": "service_account", "project_id": "load-test", "private_key": "unused"}
+    os.environ.update({
+        "FIREBASE_BACKEND": "memory",
+        "FIREBASE_MEMORY_LATENCY_MS": str(firebase_latency_ms),
+        "FIREBASE_CREDENTIALS": base64.b64encode(json.dumps(credentials).encode()).decode(),
+        "DATABASE_URL": "https://load-test.firebaseio.com",
+        "BOT_TOKEN": BOT_TOKEN,
+        "WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "LOG_LEVEL": "WARNING",
+    })
+    os.environ.setdefault("SECRET_KEY", Fernet.generate_key().decode())
+
+
+# === Telegram Stub ===
+class _Sample:
+    __slots__ = ("command", "status", "latency_ms", "exception", "replies")
+
+    def __init__(self, command):
+        self.command = command
+        self.status = None
+        self.latency_ms = 0.0
+        self.exception = None
+        self.replies = []
+
+
+def stub_request_class():
+    from telegram.request import BaseRequest
+
+    class StubRequest(BaseRequest):
+        """Answers Bot API calls locally and attaches replies to the update being measured."""
+
+        def __init__(self, calls: Counter):
+            self.calls = calls
+            self._message_ids = itertools.count(1)
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        @property
+        def read_timeout(self):
+            return None
+
+        async def do_request(self, url, method, request_data=None, **timeouts):
+            endpoint = url.rsplit("/", 1)[-1]
+            params = request_data.parameters if request_data else {}
+            self.calls[endpoint] += 1
+            if endpoint == "getMe":
+                result = {"id": int(BOT_TOKEN.split(":")[0]), "is_bot": True,
+                          "first_name": "LoadTestBot", "username": "load_test_bot"}
+            elif endpoint.startswith(("send", "edit")):
+                text = params.get("text", "")
+                sample = _sample.get()
+                if sample is not None:
+                    sample.replies.append(text)
+                result = {"message_id": next(self._message_ids), "date": int(time.time()),
+                          "chat": {"id": params.get("chat_id"), "type": "private"}, "text": text}
+            else:
+                result = True
+            return 200, json.dumps({"ok": True, "result": result}).encode()
+
+    return StubRequest
+
+
+async def install_stub_bot(main) -> Counter:
+    """Rebuild main.telegram_app on the stub request, keeping every registered handler."""
+    from telegram.ext import Application
+
+    StubRequest = stub_request_class()
+    calls = Counter()
+    stubbed = (Application.builder().token(BOT_TOKEN)
+               .request(StubRequest(calls)).get_updates_request(StubRequest(calls)).build())
+    for group, handlers in main.telegram_app.handlers.items():
+        stubbed.add_handlers(handlers, group=group)
+    for callback, block in main.telegram_app.error_handlers.items():
+        stubbed.add_error_handler(callback, block=block)
+
+    async def record_error(update, context):
+        sample = _sample.get()
+        if sample is not None:
+            sample.exception = type(context.error).__name__
+
+    stubbed.add_error_handler(record_error)
+    await stubbed.initialize()
+    main.telegram_app = stubbed
+    return calls
+
+
+# === Users and Updates ===
+def seed_users(count):
+    from cryptography.fernet import Fernet
+    from firebase_admin import db
+
+    fernet = Fernet(os.environ["SECRET_KEY"].encode())
+    key, secret = fernet.encrypt(SIM_API_KEY.encode()).decode(), fernet.encrypt(SIM_API_SECRET.encode()).decode()
+    rng = random.Random(42)
+    users = {}
+    for i in range(count):
+        users[str(USER_ID_BASE + i)] = {
+            "username": f"load{i}", "exchange": "binance", "strategy": "dip_buyer",
+            "binance_api_key": key, "binance_api_secret": secret,
+            "luno_api_key": key, "luno_api_secret": secret,
+            "autobot": {"status": False},
+            "profit": round(rng.uniform(-100, 500), 2), "initial_investment": 1000,
+            "total_profit": round(rng.uniform(-100, 500), 2),
+        }
+    db.reference("users").set(users)
+    return list(users)
+
+
+def make_update(update_id, user_id, text) -> dict:
+    user_id = int(user_id)
+    command = text.split()[0]
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Load"},
+            "text": text,
+            "entities": [{"type": "bot_command", "offset": 0, "length": len(command)}],
+        },
+    }
+
+
+def command_of(update) -> str:
+    text = (update.get("message") or {}).get("text") or ""
+    return text.split()[0].lstrip("/").split("@")[0] if text.startswith("/") else "other"
+
+
+def generate(requests, mix, user_ids, seed=7):
+    rng = random.Random(seed)
+    names, weights = list(mix), list(mix.values())
+    for update_id in range(1, requests + 1):
+        command = rng.choices(names, weights)[0]
+        yield command, make_update(update_id, rng.choice(user_ids), COMMANDS[command])
+
+
+def replay(path, requests):
+    with open(path) as f:
+        recorded = [json.loads(line) for line in f if line.strip()]
+    if not recorded:
+        sys.exit(f"No updates in {path}")
+    for update_id, update in zip(range(1, requests + 1), itertools.cycle(recorded)):
+        # Fresh ids so the replayed stream is a sequence of distinct deliveries
+        update = dict(update, update_id=update_id)
+        yield command_of(update), update
+
+
+def parse_mix(spec) -> dict:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in COMMANDS:
+            sys.exit(f"Unknown command {name!r} in --mix (choose from {', '.join(COMMANDS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# === Load ===
+async def post(client, command, update) -> _Sample:
+    sample = _Sample(command)
+    token = _sample.set(sample)
+    start = time.perf_counter()
+    try:
+        response = await client.post(
+            f"/webhook/{BOT_TOKEN}", json=update,
+            headers={"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET, "Authorization": f"Bearer {BOT_TOKEN}"})
+        sample.status = response.status_code
+    except Exception as e:
+        sample.status, sample.exception = "exception", type(e).__name__
+    finally:
+        sample.latency_ms = (time.perf_counter() - start) * 1000
+        _sample.reset(token)
+    return sample
+
+
+async def run_load(app, jobs, concurrency, sources):
+    import httpx
+
+    clients = [httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(f"10.0.{i // 250}.{i % 250 + 1}", 443)),
+                                 base_url="https://testserver", timeout=60)
+               for i in range(sources)]
+    jobs = iter(jobs)
+    samples = []
+
+    async def worker(client):
+        for command, update in jobs:
+            samples.append(await post(client, command, update))
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(clients[i % sources]) for i in range(concurrency)))
+    finally:
+        for client in clients:
+            await client.aclose()
+    return samples, time.perf_counter() - start
+
+
+def failure_reply(sample) -> bool:
+    return any(reply.startswith(FAILURE_PREFIXES) for reply in sample.replies)
+
+
+def failed(sample) -> bool:
+    return sample.status != 200 or sample.exception is not None or failure_reply(sample)
+
+
+def report(samples, elapsed):
+    by_command = defaultdict(list)
+    for sample in samples:
+        by_command[sample.command].append(sample)
+    by_command["all"] = samples
+
+    print(f"{len(samples)} updates in {elapsed:.2f} s\n")
+    print(f"{'command':<13}{'sent':>7}{'req/s':>9}{'p50 ms':>9}{'p90':>9}{'p99':>9}{'max':>9}"
+          f"{'non-200':>9}{'raised':>8}{'failed':>8}{'err %':>8}")
+    for command, rows in by_command.items():
+        latencies = sorted(s.latency_ms for s in rows)
+        pct = lambda p: latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+        non_200 = sum(s.status != 200 for s in rows)
+        raised = sum(s.exception is not None for s in rows)
+        replies = sum(failure_reply(s) for s in rows)
+        errors = sum(failed(s) for s in rows)
+        print(f"{command:<13}{len(rows):>7}{len(rows) / elapsed:>9.1f}{pct(0.5):>9.1f}{pct(0.9):>9.1f}"
+              f"{pct(0.99):>9.1f}{latencies[-1]:>9.1f}{non_200:>9}{raised:>8}{replies:>8}"
+              f"{errors / len(rows) * 100:>8.1f}")
+
+    statuses = Counter(str(s.status) for s in samples)
+    exceptions = Counter(f"{s.command}:{s.exception}" for s in samples if s.exception)
+    print(f"\nHTTP status: {dict(statuses)}")
+    if exceptions:
+        print(f"Handler exceptions: {dict(exceptions.most_common(10))}")
+
+
+async def main_async(args):
+    with SimExchange(latency_ms=args.exchange_latency_ms) as sim:
+        route_requests(sim)
+        import main
+        import firebase_memory
+
+        # httpx logs every request at INFO, which would bury the report
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+        if args.no_rate_limit:
+            main.limiter.enabled = False
+        calls = await install_stub_bot(main)
+        user_ids = seed_users(args.users)
+
+        warmup = [(name, make_update(WARMUP_UPDATE_ID + i, user_ids[0], text))
+                  for i, (name, text) in enumerate(COMMANDS.items())]
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            await run_load(main.app, warmup, 1, 1)
+        # Let the limiter's one-second window pass so warmup doesn't eat into the run
+        await asyncio.sleep(1.1)
+        reads, writes = firebase_memory.database.stats["reads"], firebase_memory.database.stats["writes"]
+        calls.clear()
+
+        jobs = replay(args.replay, args.requests) if args.replay else generate(args.requests, parse_mix(args.mix), user_ids)
+        # The exchange and database helpers print per call; keep the report readable
+        with contextlib.redirect_stdout(open(os.devnull, "w")):
+            samples, elapsed = await run_load(main.app, jobs, args.concurrency, args.sources)
+
+        print(f"concurrency {args.concurrency}, {args.sources} source address(es), rate limit "
+              f"{'off' if args.no_rate_limit else 'on'}, exchange latency {args.exchange_latency_ms} ms, "
+              f"firebase latency {args.firebase_latency_ms} ms")
+        report(samples, elapsed)
+        print(f"Firebase: {firebase_memory.database.stats['reads'] - reads} reads, "
+              f"{firebase_memory.database.stats['writes'] - writes} writes")
+        print(f"Bot API calls: {dict(calls)}")
+        await main.telegram_app.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="command=weight,... for generated updates")
+    parser.add_argument("--users", type=int, default=200, help="registered users to seed")
+    parser.add_argument("--replay", help="JSONL file of recorded Telegram updates to replay instead of --mix")
+    parser.add_argument("--sources", type=int, default=1, help="client addresses to spread requests over")
+    parser.add_argument("--no-rate-limit", action="store_true")
+    parser.add_argument("--exchange-latency-ms", type=float, default=20.0)
+    parser.add_argument("--firebase-latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    configure_environment(args.firebase_latency_ms)
+    asyncio.run(main_async(args))
@@ -12,7 +12,12 @@ celery_app.conf.update(
             "task": "tasks.run_auto_bot_task",
             "schedule": 300.0,  # 5 minutes
             "args": [],
-        }
+        },
+        "archive-trades-daily": {
+            "task": "tasks.archive_trades_task",
+            "schedule": 86400.0,  # daily; trades older than TRADE_RETENTION_DAYS
+            "args": [],
+        },
     }
 )
 
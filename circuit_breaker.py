@@ -0,0 +1,205 @@
+"""
+Circuit breakers and retry for exchange calls, keyed by (exchange, endpoint).
+
+    with exchange_guard("luno", "balance"):
+        ...                                    # raises CircuitOpenError while open
+
+    r = http_get("luno", "ticker", url, params=...)   # guarded + retried read
+
+A breaker trips when, over its last CB_WINDOW calls (and at least
+CB_MIN_CALLS), the share of failures reaches CB_ERROR_RATE or the share of
+calls slower than CB_SLOW_CALL_SECONDS reaches CB_SLOW_RATE. While open,
+calls fail immediately with CircuitOpenError. After CB_OPEN_SECONDS it goes
+half-open and lets CB_HALF_OPEN_PROBES calls through: a success closes it, a
+failure opens it again.
+
+Only exchange-side failures count (timeouts, connection errors, 5xx, 429); a
+rejected order or bad request says nothing about exchange health. Idempotent
+reads are retried with full-jitter exponential backoff; orders never are.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import requests
+
+from hedging import hedged
+from metrics import Counter, exchange_call, register_gauge
+
+logger = logging.getLogger(__name__)
+
+CB_WINDOW = int(os.getenv("CB_WINDOW", 20))
+CB_MIN_CALLS = int(os.getenv("CB_MIN_CALLS", 10))
+CB_ERROR_RATE = float(os.getenv("CB_ERROR_RATE", 0.5))
+CB_SLOW_CALL_SECONDS = float(os.getenv("CB_SLOW_CALL_SECONDS", 5))
+CB_SLOW_RATE = float(os.getenv("CB_SLOW_RATE", 0.8))
+CB_OPEN_SECONDS = float(os.getenv("CB_OPEN_SECONDS", 30))
+CB_HALF_OPEN_PROBES = int(os.getenv("CB_HALF_OPEN_PROBES", 1))
+
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", 3))
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 0.2))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 2.0))
+READ_TIMEOUT = float(os.getenv("EXCHANGE_READ_TIMEOUT", 10))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+CIRCUIT_REJECTIONS = Counter(
+    "circuit_breaker_rejections_total", "Calls failed fast by an open breaker", ("exchange", "endpoint"),
+)
+EXCHANGE_RETRIES = Counter(
+    "exchange_retries_total", "Retried idempotent exchange reads", ("exchange", "endpoint"),
+)
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, exchange, endpoint, retry_in):
+        super().__init__(f"{exchange} {endpoint} circuit open, retry in {retry_in:.0f}s")
+        self.exchange, self.endpoint, self.retry_in = exchange, endpoint, retry_in
+
+
+def is_exchange_failure(exc) -> bool:
+    """True for errors that indicate the exchange is unhealthy rather than the request being wrong."""
+    if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, TimeoutError)):
+        return True
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status_code", None) or getattr(exc, "status", None)
+    if isinstance(status, int):
+        return status >= 500 or status == 429
+    if isinstance(exc, requests.exceptions.JSONDecodeError):
+        return True  # usually an HTML error page in front of the API
+    # Parsing/argument errors are ours; anything else unknown counts against the exchange
+    return not isinstance(exc, (ValueError, KeyError, TypeError))
+
+
+class CircuitBreaker:
+    def __init__(self, exchange, endpoint):
+        self.exchange, self.endpoint = exchange, endpoint
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self._outcomes = deque(maxlen=CB_WINDOW)  # (failed, slow)
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        with self._lock:
+            if self.state == OPEN:
+                remaining = self.opened_at + CB_OPEN_SECONDS - time.monotonic()
+                if remaining > 0:
+                    CIRCUIT_REJECTIONS.inc(self.exchange, self.endpoint)
+                    raise CircuitOpenError(self.exchange, self.endpoint, remaining)
+                self.state, self._probes = HALF_OPEN, 0
+                logger.info(f"Circuit {self.exchange}.{self.endpoint} half-open, probing")
+            if self.state == HALF_OPEN:
+                if self._probes >= CB_HALF_OPEN_PROBES:
+                    CIRCUIT_REJECTIONS.inc(self.exchange, self.endpoint)
+                    raise CircuitOpenError(self.exchange, self.endpoint, 0)
+                self._probes += 1
+
+    def record(self, failed: bool, seconds: float):
+        slow = seconds >= CB_SLOW_CALL_SECONDS
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probes -= 1
+                if failed or slow:
+                    self._trip("probe failed")
+                else:
+                    self.state = CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"Circuit {self.exchange}.{self.endpoint} closed")
+                return
+
+            self._outcomes.append((failed, slow))
+            calls = len(self._outcomes)
+            if self.state == CLOSED and calls >= CB_MIN_CALLS:
+                error_rate = sum(f for f, _ in self._outcomes) / calls
+                slow_rate = sum(s for _, s in self._outcomes) / calls
+                if error_rate >= CB_ERROR_RATE:
+                    self._trip(f"error rate {error_rate:.0%}")
+                elif slow_rate >= CB_SLOW_RATE:
+                    self._trip(f"slow call rate {slow_rate:.0%}")
+
+    def _trip(self, reason):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._outcomes.clear()
+        logger.warning(f"Circuit {self.exchange}.{self.endpoint} opened: {reason}")
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+register_gauge("circuit_breaker_open", "Exchange endpoints whose breaker is not closed (1 open, 0.5 half-open)",
+               lambda: {f"{b.exchange}.{b.endpoint}": {OPEN: 1, HALF_OPEN: 0.5}.get(b.state, 0)
+                        for b in list(_breakers.values())})
+
+
+def get_breaker(exchange: str, endpoint: str) -> CircuitBreaker:
+    key = (exchange, endpoint)
+    breaker = _breakers.get(key)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(key, CircuitBreaker(exchange, endpoint))
+    return breaker
+
+
+def open_circuits(exchanges=None) -> list:
+    """Breakers currently refusing calls, optionally limited to some exchanges."""
+    now = time.monotonic()
+    return [
+        b for b in list(_breakers.values())
+        if (exchanges is None or b.exchange in exchanges)
+        and b.state == OPEN and now < b.opened_at + CB_OPEN_SECONDS
+    ]
+
+
+# === Guarded Calls ===
+@contextmanager
+def exchange_guard(exchange: str, endpoint: str):
+    """exchange_call() plus the endpoint's circuit breaker."""
+    breaker = get_breaker(exchange, endpoint)
+    breaker.before_call()
+    start = time.perf_counter()
+    failed = False
+    try:
+        with exchange_call(exchange, endpoint):
+            yield
+    except Exception as e:
+        failed = is_exchange_failure(e)
+        raise
+    finally:
+        breaker.record(failed, time.perf_counter() - start)
+
+
+def retry_read(exchange: str, endpoint: str, fn, attempts: int = RETRY_ATTEMPTS, hedge: bool = False):
+    """
+    Call fn() under the breaker, retrying exchange-side failures with jittered
+    backoff. hedge=True also sends a hedge request when the call is slow (see
+    hedging.py; only active with HEDGE_REQUESTS).
+    """
+    for attempt in range(attempts):
+        try:
+            with exchange_guard(exchange, endpoint):
+                return hedged(exchange, endpoint, fn) if hedge else fn()
+        except CircuitOpenError:
+            raise
+        except Exception as e:
+            if attempt == attempts - 1 or not is_exchange_failure(e):
+                raise
+            EXCHANGE_RETRIES.inc(exchange, endpoint)
+            time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt)))
+
+
+def _get(url, **kwargs):
+    kwargs.setdefault("timeout", READ_TIMEOUT)
+    r = requests.get(url, **kwargs)
+    r.raise_for_status()
+    return r
+
+
+def http_get(exchange: str, endpoint: str, url: str, hedge: bool = False, **kwargs) -> requests.Response:
+    """Idempotent GET: default timeout, raise on HTTP errors, breaker and retry."""
+    return retry_read(exchange, endpoint, lambda: _get(url, **kwargs), hedge=hedge)
@@ -5,23 +5,22 @@ from telegram.constants import ParseMode
 from telegram.ext import ContextTypes
 from database import (
     get_user_data, save_trade,
-    get_user, get_all_users, firebase_ref
+    get_user, firebase_ref
 )
+from user_queries import top
 from exchanges import get_price, get_balance
+from idempotency import claim
 
 logger = logging.getLogger(__name__)
 
-# Global dict to avoid replying to the same message twice
-last_message_ids = {}
-
 # /start
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.message.from_user.id)
     msg_id = update.message.message_id
 
-    if last_message_ids.get(user_id) == msg_id:
+    # Don't reply to the same message twice (bounded, time-windowed; see idempotency.py)
+    if not claim(f"start:{user_id}:{msg_id}"):
         return
-    last_message_ids[user_id] = msg_id
 
     user_data = firebase_ref.child(user_id).get()
 
@@ -185,17 +184,12 @@ async def stop_autobot(update: Update, context: ContextTypes.DEFAULT_TYPE):
 # /leaderboard
 async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
-        leaderboard = get_all_users()
+        # Top ten by total_profit, server-side (indexed in database.rules.json)
+        leaderboard = top("total_profit", 10, fields=("first_name", "total_profit"))
 
         if leaderboard:
-            sorted_users = sorted(
-                leaderboard.items(),
-                key=lambda x: float(x[1].get("total_profit", 0) or 0),
-                reverse=True
-            )
-
             message = "*Leaderboard*\n\n"
-            for i, (uid, data) in enumerate(sorted_users[:10], start=1):
+            for i, (uid, data) in enumerate(leaderboard, start=1):
                 name = data.get("first_name") or f"User {uid[-4:]}"
                 profit = float(data.get("total_profit", 0) or 0)
                 message += f"{i}. {name} — ${profit:,.2f}\n"
@@ -4,7 +4,7 @@ from telegram import Update
 from telegram.ext import ContextTypes
 from database import get_autobot_status, set_autobot_status
 from utils import send_alert
-from firebase_admin import db
+from event_log import log_event
 
 def migrate_keys(user_id):
     # Optional: any logic you want for migrating keys or updating structure
@@ -27,12 +27,7 @@ async def autobot_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         else:
             send_alert("🛑 AutoBot stopped.", chat_id)
 
-        log_ref = db.reference(f"logs/{user_id}")
-        log_ref.push({
-            "timestamp": update.effective_message.date.isoformat(),
-            "event": "autobot_toggle",
-            "status": "on" if new_status else "off"
-        })
+        log_event(user_id, "autobot_toggle", status="on" if new_status else "off")
 
     except Exception as e:
         send_alert(f"⚠️ Error toggling AutoBot: {e}", chat_id)
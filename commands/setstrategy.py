@@ -1,6 +1,7 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 from firebase_admin import db
+from strategies import get_strategy, strategy_names
 
 # No longer using in-memory storage (user_strategies),
 # because we'll use Firebase to persist the data.
@@ -24,16 +25,18 @@ async def setstrategy_command(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
 
-    strategy = args[0].lower()
-    supported_strategies = ["momentum", "scalping", "meanreversion"]
+    spec = get_strategy(args[0])
 
-    if strategy not in supported_strategies:
+    if spec is None:
         await update.message.reply_text(
             f"❌ Unsupported strategy.\n"
-            f"Supported strategies: {', '.join(supported_strategies)}"
+            f"Supported strategies: {', '.join(strategy_names())}"
         )
         return
 
+    # Always store the canonical name so the runners can dispatch on it
+    strategy = spec.name
+
     try:
         # Save to Firebase under the user's record
         db.reference(f"/users/{user_id}").update({
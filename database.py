@@ -1,7 +1,8 @@
-import os
-import json
-import firebase_admin
-from firebase_admin import credentials, db
+from firebase_admin import db
+from firebase import initialize_firebase
+from metrics import firebase_call
+from user_profile import update_profiles
+from trade_stats import record_trade
 import logging
 from datetime import datetime
 
@@ -9,24 +10,7 @@ from datetime import datetime
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def initialize_firebase():
-    """Initialize Firebase app using JSON credentials from environment variable."""
-    try:
-        creds_json = os.getenv("FIREBASE_CREDENTIALS_ENCODED")
-        if not creds_json:
-            raise ValueError("FIREBASE_CREDENTIALS_ENCODED is not set.")
-        creds_dict = json.loads(creds_json)
-        if not firebase_admin._apps:
-            cred = credentials.Certificate(creds_dict)
-            firebase_admin.initialize_app(cred, {
-                'databaseURL': os.getenv("FIREBASE_DATABASE_URL")
-            })
-            logger.info("Firebase app initialized successfully.")
-    except Exception as e:
-        logger.error(f"Error initializing Firebase: {e}")
-        raise
-
-# Initialize Firebase
+# Initialize Firebase (no-op if the app or another module already did)
 initialize_firebase()
 
 # === Database References ===
@@ -35,14 +19,16 @@ firebase_ref = db.reference("users")
 # === User Management ===
 def get_user_data(user_id: str):
     try:
-        return db.reference(f'users/{user_id}').get()
+        with firebase_call("read", "users"):
+            return db.reference(f'users/{user_id}').get()
     except Exception as e:
         logger.error(f"Error getting user {user_id}: {e}")
         return None
 
 def get_all_users():
     try:
-        return firebase_ref.get()
+        with firebase_call("read", "users"):
+            return firebase_ref.get()
     except Exception as e:
         logger.error(f"Error getting all users: {e}")
         return None
@@ -74,14 +60,16 @@ def create_user(user_id: str, default_data: dict = None):
             }
         }
     try:
-        db.reference(f'users/{user_id}').set(default_data)
+        with firebase_call("write", "users"):
+            db.reference(f'users/{user_id}').set(default_data)
         logger.info(f"User {user_id} created with default data.")
     except Exception as e:
         logger.error(f"Error creating user {user_id}: {e}")
 
 def update_user_data(user_id: str, data: dict):
     try:
-        db.reference(f'users/{user_id}').update(data)
+        with firebase_call("write", "users"):
+            db.reference(f'users/{user_id}').update(data)
         logger.info(f"User {user_id} data updated.")
     except Exception as e:
         logger.error(f"Error updating user {user_id} data: {e}")
@@ -90,12 +78,13 @@ def update_user_data(user_id: str, data: dict):
 def set_api_keys(user_id: str, binance_api_key: str, binance_api_secret: str, luno_api_key: str, luno_api_secret: str):
     """Store user API keys."""
     try:
-        db.reference(f'users/{user_id}').update({
-            "binance_api_key": binance_api_key,
-            "binance_api_secret": binance_api_secret,
-            "luno_api_key": luno_api_key,
-            "luno_api_secret": luno_api_secret
-        })
+        with firebase_call("write", "users"):
+            db.reference(f'users/{user_id}').update({
+                "binance_api_key": binance_api_key,
+                "binance_api_secret": binance_api_secret,
+                "luno_api_key": luno_api_key,
+                "luno_api_secret": luno_api_secret
+            })
         logger.info(f"API keys updated for user {user_id}.")
     except Exception as e:
         logger.error(f"Error setting API keys for user {user_id}: {e}")
@@ -103,7 +92,8 @@ def set_api_keys(user_id: str, binance_api_key: str, binance_api_secret: str, lu
 def get_api_keys(user_id: str):
     """Retrieve API keys."""
     try:
-        user = db.reference(f'users/{user_id}').get() or {}
+        with firebase_call("read", "users"):
+            user = db.reference(f'users/{user_id}').get() or {}
         return {
             "binance_api_key": user.get("binance_api_key", ""),
             "binance_api_secret": user.get("binance_api_secret", ""),
@@ -121,29 +111,8 @@ def get_users_with_api_keys_and_strategy():
         if not users_data:
             return []
 
-        valid_users = []
-        for user_id, data in users_data.items():
-            if all(data.get(k) for k in ("binance_api_key", "binance_api_secret", "luno_api_key", "luno_api_secret")):
-                valid_users.append({
-                    "user_id": user_id,
-                    "strategy": data.get("strategy", "default"),
-                    "risk_tolerance": data.get("risk_tolerance", 0.02),
-                    "profit_target": data.get("profit_target", 50),
-                    "dip_threshold": data.get("dip_threshold", -3.0),
-                    "range_lower_bound": data.get("range_lower_bound", 29500),
-                    "range_upper_bound": data.get("range_upper_bound", 30500),
-                    "binance_api_key": data.get("binance_api_key"),
-                    "binance_api_secret": data.get("binance_api_secret"),
-                    "luno_api_key": data.get("luno_api_key"),
-                    "luno_api_secret": data.get("luno_api_secret"),
-                    "notification_prefs": data.get("notifications", {
-                        "telegram": True,
-                        "push": True,
-                        "email": False
-                    }),
-                    "autobot": data.get("autobot", {})
-                })
-        return valid_users
+        # Shared UserProfiles (see user_profile.py); notification channels are profile.notifications
+        return [profile for profile in update_profiles(users_data) if profile.has_exchange_keys()]
 
     except Exception as e:
         logger.error(f"Error fetching users with API keys and strategy: {e}")
@@ -163,7 +132,8 @@ def set_autobot_status(user_id: str, status: bool, source: str = "manual"):
                 "source": source
             }
         }
-        db.reference(f'users/{user_id}').update(update_data)
+        with firebase_call("write", "users"):
+            db.reference(f'users/{user_id}').update(update_data)
         logger.info(f"Autobot status for user {user_id} set to {status} by {source} at {timestamp}")
         return True
     except Exception as e:
@@ -173,7 +143,8 @@ def set_autobot_status(user_id: str, status: bool, source: str = "manual"):
 def get_autobot_status(user_id: str) -> bool:
     """Retrieve the autobot status (True/False) for a given user."""
     try:
-        status = db.reference(f'users/{user_id}/autobot/status').get()
+        with firebase_call("read", "users"):
+            status = db.reference(f'users/{user_id}/autobot/status').get()
         return bool(status) if status is not None else False
     except Exception as e:
         logger.error(f"Error getting autobot status for user {user_id}: {e}")
@@ -198,11 +169,16 @@ def save_trade(user_id: str, trade_data: dict):
     """
     try:
         trades_ref = db.reference(f'users/{user_id}/trades')
-        if "trade_id" in trade_data:
-            trade_id = trade_data["trade_id"]
-            trades_ref.child(trade_id).set(trade_data)
-        else:
-            trades_ref.push(trade_data)
+        with firebase_call("write", "users"):
+            if "trade_id" in trade_data:
+                trade_id = trade_data["trade_id"]
+                trades_ref.child(trade_id).set(trade_data)
+            else:
+                trades_ref.push(trade_data)
+        # Trades recorded here did not go through trading_api's fill accounting
+        pnl = trade_data.get("profit", trade_data.get("profit_or_loss"))
+        record_trade(user_id, trade_data.get("strategy"), str(trade_data.get("side", trade_data.get("action", ""))).lower(),
+                     pnl=pnl if isinstance(pnl, (int, float)) else None)
         logger.info(f"Trade saved for user {user_id} with trade_id {trade_data.get('trade_id', 'new')}")
     except Exception as e:
         logger.error(f"Error saving trade for user {user_id}: {e}")
@@ -3,6 +3,7 @@ import os
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
 import bcrypt
+from tracing import span
 
 # === Load environment variables ===
 load_dotenv()
@@ -27,7 +28,8 @@ def encrypt_data(data: str) -> str:
 
 def decrypt_data(encrypted_data: str) -> str:
     print(f"[DEBUG DECRYPT] Attempting to decrypt: {encrypted_data}")
-    decrypted = fernet.decrypt(encrypted_data.encode()).decode()
+    with span("fernet.decrypt"):
+        decrypted = fernet.decrypt(encrypted_data.encode()).decode()
     print(f"[DEBUG DECRYPT] Decrypted: {decrypted}")
     return decrypted
 
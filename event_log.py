@@ -0,0 +1,205 @@
+import atexit
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+
+from firebase_admin import db
+from metrics import firebase_call, register_gauge
+
+logger = logging.getLogger(__name__)
+
+# === Buffer Settings ===
+# Events are flushed as one multi-path update every EVENT_LOG_BATCH_SIZE events
+# or EVENT_LOG_FLUSH_MS milliseconds, whichever comes first. Once the buffer
+# holds EVENT_LOG_MAX_BUFFER events new ones are dropped and counted.
+EVENT_LOG_BATCH_SIZE = int(os.getenv("EVENT_LOG_BATCH_SIZE", 200))
+EVENT_LOG_FLUSH_MS = int(os.getenv("EVENT_LOG_FLUSH_MS", 1000))
+EVENT_LOG_MAX_BUFFER = int(os.getenv("EVENT_LOG_MAX_BUFFER", 10000))
+EVENT_LOG_ROOT = "logs"
+
+ENVIRONMENT = "production" if os.getenv("PRODUCTION") else "development"
+
+# === Push IDs ===
+# Same layout as Firebase push keys (8 time chars + 12 random chars) so buffered
+# entries keep chronological ordering under logs/{user_id} without a round trip.
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+_push_lock = threading.Lock()
+_last_push_ms = 0
+_last_rand = [0] * 12
+
+
+def generate_push_id() -> str:
+    global _last_push_ms
+    with _push_lock:
+        now = int(time.time() * 1000)
+        duplicate = now == _last_push_ms
+        _last_push_ms = now
+
+        time_chars = []
+        for _ in range(8):
+            time_chars.append(PUSH_CHARS[now % 64])
+            now //= 64
+        push_id = "".join(reversed(time_chars))
+
+        if not duplicate:
+            for i in range(12):
+                _last_rand[i] = random.randrange(64)
+        else:
+            # Same millisecond: increment the random part to keep keys ordered
+            i = 11
+            while i >= 0 and _last_rand[i] == 63:
+                _last_rand[i] = 0
+                i -= 1
+            if i >= 0:
+                _last_rand[i] += 1
+
+        return push_id + "".join(PUSH_CHARS[r] for r in _last_rand)
+
+
+# === Buffered Sink ===
+class EventLogSink:
+    """Batches log entries in memory and writes them as multi-path updates."""
+
+    def __init__(self, batch_size=EVENT_LOG_BATCH_SIZE, flush_ms=EVENT_LOG_FLUSH_MS,
+                 max_buffer=EVENT_LOG_MAX_BUFFER, root=EVENT_LOG_ROOT):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(flush_ms, 1) / 1000.0
+        self.max_buffer = max(self.batch_size, max_buffer)
+        self.root = root
+
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+        self.stats = {
+            "enqueued": 0,
+            "written": 0,
+            "dropped": 0,
+            "flushes": 0,
+            "failed_flushes": 0,
+        }
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="event-log-flusher", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, user_id: str, entry: dict) -> bool:
+        path = f"{user_id}/{generate_push_id()}"
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.stats["dropped"] += 1
+                return False
+            self._buffer.append((path, entry))
+            self.stats["enqueued"] += 1
+            full = len(self._buffer) >= self.batch_size
+
+        if self._thread is None:
+            self.start()
+        if full:
+            self._wakeup.set()
+        return True
+
+    def pending(self) -> int:
+        return len(self._buffer)
+
+    def flush(self) -> int:
+        """Write everything currently buffered. Returns the number of entries written."""
+        written = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._buffer:
+                        break
+                    count = min(self.batch_size, len(self._buffer))
+                    batch = [self._buffer.popleft() for _ in range(count)]
+
+                try:
+                    with firebase_call("write", self.root):
+                        db.reference(self.root).update(dict(batch))
+                except Exception as e:
+                    logger.error(f"Event log flush failed ({len(batch)} entries): {e}")
+                    self._requeue(batch)
+                    with self._lock:
+                        self.stats["failed_flushes"] += 1
+                    break
+
+                written += len(batch)
+                with self._lock:
+                    self.stats["written"] += len(batch)
+                    self.stats["flushes"] += 1
+        return written
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the background flusher and synchronously flush what is left."""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+
+    def _requeue(self, batch):
+        # Put a failed batch back at the front, dropping its oldest entries
+        # rather than growing past max_buffer (events queued since are newer
+        # still, so they stay).
+        with self._lock:
+            room = max(self.max_buffer - len(self._buffer), 0)
+            keep = batch[max(len(batch) - room, 0):] if room else []
+            self.stats["dropped"] += len(batch) - len(keep)
+            self._buffer.extendleft(reversed(keep))
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopped.is_set():
+                break
+            self.flush()
+
+
+_sink = EventLogSink()
+atexit.register(_sink.stop)
+register_gauge("event_log_pending", "Log events buffered and not yet written", _sink.pending)
+register_gauge("event_log_dropped", "Log events dropped because the buffer was full", lambda: _sink.stats["dropped"])
+
+
+# === Public API ===
+def log_event(user_id: str, event_type: str, message_text: str = "", status: str = "ok",
+              error: Optional[object] = None, **extra) -> bool:
+    """Queue a log entry for logs/{user_id}. Never blocks on Firebase."""
+    entry = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "event": event_type,
+        "message": message_text,
+        "status": status,
+        "environment": ENVIRONMENT,
+    }
+    if error:
+        entry["error"] = str(error)[:500]  # Truncate long errors
+    entry.update(extra)
+    return _sink.enqueue(str(user_id), entry)
+
+
+def flush_event_log() -> int:
+    return _sink.flush()
+
+
+def shutdown_event_log():
+    _sink.stop()
+
+
+def get_event_log_stats() -> dict:
+    stats = dict(_sink.stats)
+    stats["pending"] = _sink.pending()
+    return stats
@@ -0,0 +1,241 @@
+"""
+Exchange metadata: symbol mapping plus lot size, tick size and min-notional
+rules for Binance (exchangeInfo) and Luno (markets).
+
+Rules are loaded once per exchange, refreshed every EXCHANGE_INFO_TTL seconds
+on access, and used to normalise order quantities and prices locally so that
+orders the exchange would reject never leave the process.
+
+    qty = normalize_order("binance", "BTC/USDT", quantity=0.0012345, price=60000)
+"""
+import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from decimal import Decimal, ROUND_DOWN
+
+from circuit_breaker import http_get
+
+logger = logging.getLogger(__name__)
+
+EXCHANGE_INFO_TTL = float(os.getenv("EXCHANGE_INFO_TTL", 3600))
+
+
+class OrderValidationError(Exception):
+    """An order cannot satisfy the exchange's filters after rounding."""
+
+
+# === Symbol Mapping ===
+# Quote currencies used to split concatenated pair names, longest first
+QUOTES = ("USDT", "USDC", "BUSD", "FDUSD", "ZAR", "EUR", "GBP", "BTC", "ETH", "BNB", "XBT")
+# Luno calls bitcoin XBT; everything else uses BTC
+EXCHANGE_ASSETS = {"luno": {"BTC": "XBT"}}
+CANONICAL_ASSETS = {"XBT": "BTC"}
+
+
+def split_pair(pair: str, aliases=CANONICAL_ASSETS):
+    """'XBTZAR' -> ('BTC', 'ZAR'), 'BTC/USDT' -> ('BTC', 'USDT'); None when unrecognised."""
+    pair = pair.upper().replace("-", "/")
+    if "/" in pair:
+        base, quote = pair.split("/", 1)
+    else:
+        for quote in QUOTES:
+            if pair.endswith(quote) and len(pair) > len(quote):
+                base = pair[:-len(quote)]
+                break
+        else:
+            return None
+    return aliases.get(base, base), aliases.get(quote, quote)
+
+
+def exchange_symbol(symbol: str, exchange: str = "binance") -> str:
+    """
+    'BTC/USDT', 'btcusdt' -> 'BTCUSDT' on Binance; 'BTC/ZAR', 'XBTZAR' -> 'XBTZAR' on Luno.
+    """
+    split = split_pair(symbol)
+    if split is None:
+        return symbol.replace("/", "").upper()
+    assets = EXCHANGE_ASSETS.get(exchange, {})
+    return assets.get(split[0], split[0]) + assets.get(split[1], split[1])
+
+
+def canonical_symbol(symbol: str) -> str:
+    """'XBTZAR' -> 'BTC/ZAR', 'BTCUSDT' -> 'BTC/USDT'."""
+    split = split_pair(symbol)
+    return f"{split[0]}/{split[1]}" if split else symbol.upper()
+
+
+# === Rules ===
+SymbolRules = namedtuple("SymbolRules", (
+    "exchange", "symbol", "base", "quote",
+    "step_size", "min_qty", "max_qty",       # base quantity
+    "tick_size", "min_price", "max_price",   # price
+    "quote_step", "min_notional",            # quote amount
+))
+
+
+def _d(value, default="0") -> Decimal:
+    return Decimal(str(value if value not in (None, "") else default))
+
+
+def _parse_binance_symbol(info: dict) -> SymbolRules:
+    filters = {f["filterType"]: f for f in info.get("filters", [])}
+    lot = filters.get("MARKET_LOT_SIZE") or filters.get("LOT_SIZE", {})
+    # Prefer the market lot filter but fall back to LOT_SIZE when its step is zero
+    if _d(lot.get("stepSize")) == 0:
+        lot = filters.get("LOT_SIZE", lot)
+    price = filters.get("PRICE_FILTER", {})
+    notional = filters.get("NOTIONAL") or filters.get("MIN_NOTIONAL", {})
+    return SymbolRules(
+        exchange="binance",
+        symbol=info["symbol"],
+        base=info["baseAsset"],
+        quote=info["quoteAsset"],
+        step_size=_d(lot.get("stepSize")),
+        min_qty=_d(lot.get("minQty")),
+        max_qty=_d(lot.get("maxQty")),
+        tick_size=_d(price.get("tickSize")),
+        min_price=_d(price.get("minPrice")),
+        max_price=_d(price.get("maxPrice")),
+        quote_step=Decimal(1).scaleb(-int(info.get("quoteAssetPrecision", info.get("quotePrecision", 8)))),
+        min_notional=_d(notional.get("minNotional")),
+    )
+
+
+def _parse_luno_market(market: dict) -> SymbolRules:
+    return SymbolRules(
+        exchange="luno",
+        symbol=market["market_id"],
+        base=market["base_currency"],
+        quote=market["counter_currency"],
+        step_size=Decimal(1).scaleb(-int(market.get("volume_scale", 6))),
+        min_qty=_d(market.get("min_volume")),
+        max_qty=_d(market.get("max_volume")),
+        tick_size=Decimal(1).scaleb(-int(market.get("price_scale", 0))),
+        min_price=_d(market.get("min_price")),
+        max_price=_d(market.get("max_price")),
+        quote_step=Decimal("0.01"),
+        min_notional=Decimal(0),
+    )
+
+
+def fetch_binance_rules() -> dict:
+    r = http_get("binance", "exchange_info", "https://api.binance.com/api/v3/exchangeInfo",
+                 params={"permissions": "SPOT"}, timeout=20)
+    return {s["symbol"]: _parse_binance_symbol(s) for s in r.json()["symbols"] if s.get("status") == "TRADING"}
+
+
+def fetch_luno_rules() -> dict:
+    r = http_get("luno", "markets", "https://api.luno.com/api/exchange/1/markets", timeout=20)
+    return {m["market_id"]: _parse_luno_market(m) for m in r.json().get("markets", [])
+            if m.get("trading_status", "ACTIVE") == "ACTIVE"}
+
+
+_FETCHERS = {"binance": fetch_binance_rules, "luno": fetch_luno_rules}
+_lock = threading.Lock()
+_rules = {}        # exchange -> {symbol: SymbolRules}
+_loaded_at = {}    # exchange -> monotonic time
+
+
+def _load(exchange: str) -> dict:
+    with _lock:
+        fresh = time.monotonic() - _loaded_at.get(exchange, float("-inf")) < EXCHANGE_INFO_TTL
+        if exchange in _rules and fresh:
+            return _rules[exchange]
+        try:
+            _rules[exchange] = _FETCHERS[exchange]()
+            logger.info(f"Loaded {len(_rules[exchange])} {exchange} symbol rules")
+            _loaded_at[exchange] = time.monotonic()
+        except Exception as e:
+            # Keep serving the previous rules and retry in a minute
+            logger.error(f"Failed to load {exchange} exchange info: {e}")
+            _rules.setdefault(exchange, {})
+            _loaded_at[exchange] = time.monotonic() - EXCHANGE_INFO_TTL + 60
+        return _rules[exchange]
+
+
+def get_rules(exchange: str, symbol: str):
+    """SymbolRules for any spelling of the symbol, or None when unknown."""
+    return _load(exchange).get(exchange_symbol(symbol, exchange))
+
+
+# === Rounding ===
+def _floor(value, step: Decimal) -> Decimal:
+    value = _d(value)
+    if step <= 0:
+        return value
+    return ((value / step).to_integral_value(rounding=ROUND_DOWN) * step).quantize(step)
+
+
+def round_quantity(rules: SymbolRules, quantity) -> Decimal:
+    return _floor(quantity, rules.step_size)
+
+
+def round_price(rules: SymbolRules, price) -> Decimal:
+    return _floor(price, rules.tick_size)
+
+
+def round_quote(rules: SymbolRules, quote_qty) -> Decimal:
+    return _floor(quote_qty, rules.quote_step)
+
+
+def _reference_price(exchange: str, symbol: str):
+    """Last price from the shared ticker cache, for sizing checks on market orders."""
+    from market_data import get_ticker  # deferred: market_data imports this module
+    try:
+        return get_ticker(exchange, symbol)
+    except Exception as e:
+        logger.warning(f"No {exchange} reference price for {symbol}: {e}")
+        return None
+
+
+def normalize_order(exchange: str, symbol: str, quantity=None, quote_qty=None, price=None, ref_price=None) -> dict:
+    """
+    Round a market/limit order to the symbol's filters and check its limits.
+
+    Returns {"symbol", "quantity", "quote_qty", "price"} with values as plain
+    decimal strings (or None when not given). Raises OrderValidationError when
+    the order cannot be placed. Unknown symbols (e.g. metadata unavailable) are
+    passed through with only the symbol mapped.
+
+    A quantity is checked against the minimum notional at `price`, else at
+    `ref_price` (the caller's expected fill for a market order), else at the
+    cached ticker.
+    """
+    rules = get_rules(exchange, symbol)
+    mapped = exchange_symbol(symbol, exchange)
+    if rules is None:
+        logger.warning(f"No {exchange} rules for {mapped}; sending order unvalidated")
+        return {"symbol": mapped, "quantity": quantity and str(quantity),
+                "quote_qty": quote_qty and str(quote_qty), "price": price and str(price)}
+
+    order = {"symbol": rules.symbol, "quantity": None, "quote_qty": None, "price": None}
+    reference = price or ref_price
+    if not reference and quantity is not None and rules.min_notional > 0:
+        reference = _reference_price(exchange, symbol)
+    ref_price = _d(reference) if reference else None
+
+    if price is not None:
+        rounded = round_price(rules, price)
+        if rounded < rules.min_price or (rules.max_price and rounded > rules.max_price):
+            raise OrderValidationError(f"{rules.symbol} price {rounded} outside [{rules.min_price}, {rules.max_price}]")
+        order["price"] = format(rounded, "f")
+
+    if quantity is not None:
+        rounded = round_quantity(rules, quantity)
+        if rounded <= 0 or rounded < rules.min_qty:
+            raise OrderValidationError(f"{rules.symbol} quantity {quantity} below minimum {rules.min_qty}")
+        if rules.max_qty and rounded > rules.max_qty:
+            raise OrderValidationError(f"{rules.symbol} quantity {rounded} above maximum {rules.max_qty}")
+        if ref_price and rounded * ref_price < rules.min_notional:
+            raise OrderValidationError(f"{rules.symbol} notional {rounded * ref_price} below minimum {rules.min_notional}")
+        order["quantity"] = format(rounded, "f")
+
+    if quote_qty is not None:
+        rounded = round_quote(rules, quote_qty)
+        if rounded <= 0 or rounded < rules.min_notional:
+            raise OrderValidationError(f"{rules.symbol} quote amount {quote_qty} below minimum {rules.min_notional}")
+        order["quote_qty"] = format(rounded, "f")
+
+    return order
@@ -1,9 +1,9 @@
 import base64
 import os
 import traceback
-import requests
+from circuit_breaker import http_get, retry_read
+from tracing import span
 from firebase_admin import db
-from binance.client import Client as BinanceClient
 from cryptography.fernet import Fernet, InvalidToken
 
 # === Fernet Setup with DEBUG ===
@@ -28,7 +28,8 @@ except Exception as e:
 def decrypt_api_key(encrypted_key: str) -> str:
     print(f"[DEBUG DECRYPT] Attempting to decrypt: {encrypted_key}")
     try:
-        decrypted = fernet.decrypt(encrypted_key.encode()).decode()
+        with span("fernet.decrypt"):
+            decrypted = fernet.decrypt(encrypted_key.encode()).decode()
         print(f"[DEBUG DECRYPT] Decrypted: {decrypted}")
         return decrypted
     except InvalidToken:
@@ -48,12 +49,13 @@ def get_binance_client(user_id, user=None):
         raise ValueError("Missing Binance API credentials.")
     api_key = decrypt_api_key(encrypted_key)
     api_secret = decrypt_api_key(encrypted_secret)
+    from binance.client import Client as BinanceClient  # deferred: heavy import
     return BinanceClient(api_key, api_secret)
 
 def get_binance_price(user_id, symbol="BTCUSDT"):
     try:
         client = get_binance_client(user_id)
-        ticker = client.get_symbol_ticker(symbol=symbol)
+        ticker = retry_read("binance", "ticker", lambda: client.get_symbol_ticker(symbol=symbol))
         return float(ticker["price"])
     except Exception as e:
         print(f"[Binance] Error fetching price for {symbol}: {e}")
@@ -79,8 +81,7 @@ def get_luno_price(user_id, pair="XBTZAR"):
         headers = get_luno_auth_header(api_key, api_secret)
 
         url = f"https://api.luno.com/api/1/ticker?pair={pair}"
-        r = requests.get(url, headers=headers, timeout=10)
-        r.raise_for_status()
+        r = http_get("luno", "ticker", url, headers=headers)
         return float(r.json()["last_trade"])
     except Exception as e:
         print(f"[Luno] Error fetching price for {pair}: {e}")
@@ -98,45 +99,47 @@ def get_price(user_id, source="binance", symbol="BTCUSDT", pair="XBTZAR"):
 
 # === Balance ===
 def get_balance(user_id: str, source: str, user=None) -> dict:
-    print(f"[Balance] Fetching for user {user_id} on {source}")
     try:
-        if user is None:
-            user = db.reference(f"/users/{user_id}").get()
-
-        if source == "luno":
-            enc_key = user.get("luno_api_key") or user.get("api_key")
-            enc_secret = user.get("luno_api_secret") or user.get("secret")
-
-            api_key = decrypt_api_key(enc_key)
-            api_secret = decrypt_api_key(enc_secret)
-
-            headers = get_luno_auth_header(api_key, api_secret)
-
-            r = requests.get("https://api.luno.com/api/1/balance", headers=headers)
-            print(f"[Luno Balance] Status Code: {r.status_code}")
-            print(f"[Luno Balance] Response Body: {r.text}")
-            r.raise_for_status()
-            data = r.json().get("balance", [])
-            return {
-                asset["asset"]: float(asset["balance"])
-                for asset in data
-                if float(asset["balance"]) > 0
-            }
-
-        elif source == "binance":
-            client = get_binance_client(user_id, user=user)
-            raw_balances = client.get_account()["balances"]
-            print("[Binance Balance] Raw:", raw_balances)
-            return {
-                b["asset"]: float(b["free"])
-                for b in raw_balances
-                if float(b["free"]) > 0
-            }
-
-        else:
-            raise ValueError(f"Unknown exchange source: {source}")
-
+        return fetch_balance(user_id, source, user)
     except Exception as e:
         print(f"[Balance Fetch Error] {e}")
         traceback.print_exc()
         return {}
+
+def fetch_balance(user_id: str, source: str, user=None) -> dict:
+    """Like get_balance, but raises instead of returning {} so a failed fetch isn't an empty wallet."""
+    print(f"[Balance] Fetching for user {user_id} on {source}")
+    if user is None:
+        user = db.reference(f"/users/{user_id}").get()
+
+    if source == "luno":
+        enc_key = user.get("luno_api_key") or user.get("api_key")
+        enc_secret = user.get("luno_api_secret") or user.get("secret")
+
+        api_key = decrypt_api_key(enc_key)
+        api_secret = decrypt_api_key(enc_secret)
+
+        headers = get_luno_auth_header(api_key, api_secret)
+
+        r = http_get("luno", "balance", "https://api.luno.com/api/1/balance", headers=headers)
+        print(f"[Luno Balance] Status Code: {r.status_code}")
+        print(f"[Luno Balance] Response Body: {r.text}")
+        data = r.json().get("balance", [])
+        return {
+            asset["asset"]: float(asset["balance"])
+            for asset in data
+            if float(asset["balance"]) > 0
+        }
+
+    elif source == "binance":
+        client = get_binance_client(user_id, user=user)
+        raw_balances = retry_read("binance", "balance", client.get_account)["balances"]
+        print("[Binance Balance] Raw:", raw_balances)
+        return {
+            b["asset"]: float(b["free"])
+            for b in raw_balances
+            if float(b["free"]) > 0
+        }
+
+    else:
+        raise ValueError(f"Unknown exchange source: {source}")
@@ -1,31 +1,60 @@
 import base64
 import json
+import logging
 import os
 import firebase_admin
-from firebase_admin import credentials, db
+from firebase_admin import credentials
 
-# === Get Firebase credentials from environment ===
-raw_creds = os.getenv("FIREBASE_CREDENTIALS_ENCODED")
-if not raw_creds:
-    raise Exception("❌ FIREBASE_CREDENTIALS_ENCODED is not set!")
+logger = logging.getLogger(__name__)
 
-# === Try to load raw JSON or decode if base64 ===
-try:
-    # Try plain JSON first
-    creds_dict = json.loads(raw_creds)
-    print("[DEBUG] Firebase credentials loaded as JSON.")
-except json.JSONDecodeError:
+# === Credential Parsing ===
+def load_credentials(raw_creds: str) -> dict:
+    """Accept service-account credentials as raw JSON or base64-encoded JSON."""
     try:
-        # Try decoding base64
-        decoded = base64.b64decode(raw_creds).decode()
-        creds_dict = json.loads(decoded)
-        print("[DEBUG] Firebase credentials decoded from base64.")
-    except Exception as e:
-        raise Exception(f"❌ Failed to parse Firebase credentials: {e}")
+        # Try plain JSON first
+        return json.loads(raw_creds)
+    except json.JSONDecodeError:
+        try:
+            # Try decoding base64
+            return json.loads(base64.b64decode(raw_creds).decode())
+        except Exception as e:
+            raise ValueError(f"❌ Failed to parse Firebase credentials: {e}")
 
-# === Initialize Firebase ===
-if not firebase_admin._apps:
-    cred = credentials.Certificate(creds_dict)
-    firebase_admin.initialize_app(cred, {
-        "databaseURL": os.getenv("FIREBASE_DATABASE_URL")
-    })
+# === Initialize Firebase (once per process) ===
+def initialize_firebase(raw_creds: str = None, database_url: str = None):
+    """
+    Single Firebase initialisation point for the web app, the strategy loop
+    and Celery workers. Safe to call repeatedly; only the first call does work.
+    Falls back to the environment (and .env) when arguments are not given.
+    FIREBASE_BACKEND=memory swaps in the in-memory database instead.
+    """
+    if os.getenv("FIREBASE_BACKEND", "firebase").lower() == "memory":
+        # In-memory stand-in for tests and benchmarks (see firebase_memory.py)
+        from firebase_memory import install
+        install()
+        return None
+
+    if firebase_admin._apps:
+        return firebase_admin.get_app()
+
+    if raw_creds is None or database_url is None:
+        from dotenv import load_dotenv
+        load_dotenv()
+    raw_creds = raw_creds or os.getenv("FIREBASE_CREDENTIALS_ENCODED") or os.getenv("FIREBASE_CREDENTIALS")
+    database_url = database_url or os.getenv("FIREBASE_DATABASE_URL") or os.getenv("DATABASE_URL")
+    emulator = os.getenv("FIREBASE_DATABASE_EMULATOR_HOST")
+    if emulator and not raw_creds:
+        # Local emulator: the Admin SDK authenticates to it without a service account
+        database_url = database_url or f"http://{emulator}?ns={os.getenv('FIREBASE_PROJECT_ID', 'crypto-bot-local')}"
+        app = firebase_admin.initialize_app(options={"databaseURL": database_url})
+        logger.info(f"Firebase app initialized against the emulator at {emulator}.")
+        return app
+    if not raw_creds:
+        raise ValueError("❌ FIREBASE_CREDENTIALS_ENCODED is not set!")
+    if not database_url:
+        raise ValueError("❌ FIREBASE_DATABASE_URL is not set!")
+
+    cred = credentials.Certificate(load_credentials(raw_creds))
+    app = firebase_admin.initialize_app(cred, {"databaseURL": database_url})
+    logger.info("Firebase app initialized successfully.")
+    return app
@@ -0,0 +1,359 @@
+"""
+In-memory stand-in for the Firebase Realtime Database, for tests and benchmarks.
+
+Implements the part of firebase_admin.db the bot uses: reference(), child(),
+get (incl. shallow), set, update (incl. multi-path), push, delete,
+transaction, listen, and order_by_child/key/value queries with
+start_at/end_at/equal_to/limit_to_first/limit_to_last. Semantics follow the
+real database: a write of None deletes, empty objects are not stored,
+queries order null < false < true < numbers < strings < objects with ties
+broken by key, and push keys are chronological.
+
+Selected with FIREBASE_BACKEND=memory: initialize_firebase() then calls
+install(), which points firebase_admin.db.reference at this module. Every
+module that does `from firebase_admin import db` is redirected without code
+changes. No credentials or network are needed.
+
+    FIREBASE_MEMORY_LATENCY_MS   added to every read/write (default 0)
+    FIREBASE_MEMORY_JITTER_MS    uniform random extra latency (default 0)
+    FIREBASE_MEMORY_SEED         JSON file loaded as the initial tree
+"""
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+FIREBASE_MEMORY_LATENCY_MS = float(os.getenv("FIREBASE_MEMORY_LATENCY_MS", 0))
+FIREBASE_MEMORY_JITTER_MS = float(os.getenv("FIREBASE_MEMORY_JITTER_MS", 0))
+FIREBASE_MEMORY_SEED = os.getenv("FIREBASE_MEMORY_SEED")
+
+
+def _parts(path) -> list:
+    return [p for p in str(path or "").split("/") if p]
+
+
+def _join(parts) -> str:
+    return "/" + "/".join(parts)
+
+
+def _clean(value):
+    """Copy of value as the database would store it: no None leaves, no empty objects."""
+    if isinstance(value, dict):
+        cleaned = {str(k): _clean(v) for k, v in value.items()}
+        cleaned = {k: v for k, v in cleaned.items() if v is not None}
+        return cleaned or None
+    if isinstance(value, (list, tuple)):
+        return _clean({str(i): v for i, v in enumerate(value)})
+    return value
+
+
+class MemoryDatabase:
+    def __init__(self, data=None, latency_ms=FIREBASE_MEMORY_LATENCY_MS, jitter_ms=FIREBASE_MEMORY_JITTER_MS):
+        self.root = _clean(data) or {}
+        self.latency_ms, self.jitter_ms = latency_ms, jitter_ms
+        self._lock = threading.RLock()
+        self._listeners = []
+        self.stats = {"reads": 0, "writes": 0}
+
+    def _delay(self):
+        if self.latency_ms or self.jitter_ms:
+            time.sleep((self.latency_ms + random.uniform(0, self.jitter_ms)) / 1000)
+
+    # === Tree Access (callers hold the lock) ===
+    def _get(self, parts):
+        node = self.root
+        for part in parts:
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node
+
+    def _put(self, parts, value):
+        if not parts:
+            self.root = value if isinstance(value, dict) else {}
+            return
+        chain, node = [], self.root
+        for part in parts[:-1]:
+            child = node.get(part)
+            if not isinstance(child, dict):
+                child = node[part] = {}
+            chain.append((node, part))
+            node = child
+        if value is None:
+            node.pop(parts[-1], None)
+            # Deleting the last child removes now-empty parents too
+            for parent, part in reversed(chain):
+                if parent[part]:
+                    break
+                del parent[part]
+        else:
+            node[parts[-1]] = value
+
+    # === Operations ===
+    def read(self, parts, shallow=False):
+        self._delay()
+        with self._lock:
+            self.stats["reads"] += 1
+            value = self._get(parts)
+            if shallow and isinstance(value, dict):
+                return {k: True for k in value}
+            return copy.deepcopy(value)
+
+    def write(self, parts, value):
+        self._delay()
+        value = _clean(value)
+        with self._lock:
+            self.stats["writes"] += 1
+            self._put(parts, copy.deepcopy(value))
+        self._notify(parts, "put", value)
+
+    def update(self, parts, values: dict):
+        self._delay()
+        cleaned = {}
+        with self._lock:
+            self.stats["writes"] += 1
+            for key, value in values.items():
+                value = _clean(value)
+                cleaned[key] = value
+                self._put(parts + _parts(key), copy.deepcopy(value))
+        self._notify(parts, "patch", cleaned)
+
+    def transaction(self, parts, fn):
+        self._delay()
+        with self._lock:
+            self.stats["reads"] += 1
+            self.stats["writes"] += 1
+            value = _clean(fn(copy.deepcopy(self._get(parts))))
+            self._put(parts, copy.deepcopy(value))
+        self._notify(parts, "put", value)
+        return value
+
+    # === Listeners ===
+    def listen(self, parts, callback):
+        registration = ListenerRegistration(self, parts, callback)
+        with self._lock:
+            self._listeners.append(registration)
+            initial = copy.deepcopy(self._get(parts))
+        registration.deliver(Event("put", "/", initial))
+        return registration
+
+    def _notify(self, parts, event_type, data):
+        for registration in list(self._listeners):
+            base = registration.parts
+            if parts[:len(base)] == base:
+                # Write at or below the listener: relay it relative to the listened path
+                registration.deliver(Event(event_type, _join(parts[len(base):]), copy.deepcopy(data)))
+            elif base[:len(parts)] == parts:
+                # Write above the listener: send the listened node's new value
+                with self._lock:
+                    registration.deliver(Event("put", "/", copy.deepcopy(self._get(base))))
+
+
+class Event:
+    """Mirror of firebase_admin.db.Event."""
+
+    def __init__(self, event_type, path, data):
+        self.event_type, self.path, self.data = event_type, path, data
+
+
+class ListenerRegistration:
+    """Delivers events on a background thread, like the SDK's listener."""
+
+    def __init__(self, database, parts, callback):
+        self.database, self.parts, self.callback = database, parts, callback
+        self._events = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="firebase-memory-listener", daemon=True)
+        self._thread.start()
+
+    def deliver(self, event):
+        self._events.put(event)
+
+    def _run(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            try:
+                self.callback(event)
+            except Exception as e:
+                logger.error(f"Listener callback failed for {_join(self.parts)}: {e}")
+
+    def close(self):
+        with self.database._lock:
+            if self in self.database._listeners:
+                self.database._listeners.remove(self)
+        self._events.put(None)
+
+
+# === References and Queries ===
+def _type_rank(value) -> int:
+    if value is None:
+        return 0
+    if value is False:
+        return 1
+    if value is True:
+        return 2
+    if isinstance(value, (int, float)):
+        return 3
+    if isinstance(value, str):
+        return 4
+    return 5
+
+
+def _sort_key(value, key):
+    rank = _type_rank(value)
+    return (rank, value if rank in (3, 4) else 0, key)
+
+
+class Query:
+    def __init__(self, reference, order_by, child=None):
+        self._ref, self._order_by, self._child = reference, order_by, _parts(child)
+        self._start = self._end = self._equal = None
+        self._first = self._last = None
+
+    def _value(self, key, node):
+        if self._order_by == "key":
+            return key
+        if self._order_by == "value":
+            return node
+        for part in self._child:
+            node = node.get(part) if isinstance(node, dict) else None
+        return node
+
+    def start_at(self, start):
+        self._start = start
+        return self
+
+    def end_at(self, end):
+        self._end = end
+        return self
+
+    def equal_to(self, value):
+        self._equal = value
+        return self
+
+    def limit_to_first(self, limit):
+        self._first = limit
+        return self
+
+    def limit_to_last(self, limit):
+        self._last = limit
+        return self
+
+    def get(self):
+        data = self._ref.get()
+        if not isinstance(data, dict):
+            return {}
+        rows = sorted(((_sort_key(self._value(k, v), k), k, v) for k, v in data.items()), key=lambda r: r[0])
+        if self._equal is not None:
+            bound = _sort_key(self._equal, "")[:2]
+            rows = [r for r in rows if r[0][:2] == bound]
+        if self._start is not None:
+            rows = [r for r in rows if r[0][:2] >= _sort_key(self._start, "")[:2]]
+        if self._end is not None:
+            rows = [r for r in rows if r[0][:2] <= _sort_key(self._end, "")[:2]]
+        if self._first is not None:
+            rows = rows[:self._first]
+        if self._last is not None:
+            rows = rows[-self._last:] if self._last else []
+        return {k: v for _, k, v in rows}
+
+
+class Reference:
+    def __init__(self, path="/"):
+        self._parts = _parts(path)
+
+    @property
+    def _db(self):
+        # Looked up per call, so references made before reset() (e.g. a module's
+        # firebase_ref = db.reference("users")) use the new tree
+        return _current()
+
+    @property
+    def key(self):
+        return self._parts[-1] if self._parts else None
+
+    @property
+    def path(self):
+        return _join(self._parts)
+
+    @property
+    def parent(self):
+        return Reference(_join(self._parts[:-1])) if self._parts else None
+
+    def child(self, path):
+        return Reference(_join(self._parts + _parts(path)))
+
+    def get(self, etag=False, shallow=False):
+        value = self._db.read(self._parts, shallow)
+        return (value, str(hash(json.dumps(value, sort_keys=True)))) if etag else value
+
+    def set(self, value):
+        self._db.write(self._parts, value)
+
+    def update(self, value: dict):
+        if not value:
+            raise ValueError("Value argument must be a non-empty dictionary.")
+        self._db.update(self._parts, value)
+
+    def push(self, value=""):
+        from event_log import generate_push_id
+        ref = self.child(generate_push_id())
+        ref.set(value)
+        return ref
+
+    def delete(self):
+        self._db.write(self._parts, None)
+
+    def transaction(self, transaction_update):
+        return self._db.transaction(self._parts, transaction_update)
+
+    def listen(self, callback):
+        return self._db.listen(self._parts, callback)
+
+    def order_by_child(self, path):
+        return Query(self, "child", path)
+
+    def order_by_key(self):
+        return Query(self, "key")
+
+    def order_by_value(self):
+        return Query(self, "value")
+
+
+# === Installation ===
+database = None
+
+
+def _current() -> MemoryDatabase:
+    return database if database is not None else reset()
+
+
+def reference(path="/", app=None, url=None):
+    """Drop-in for firebase_admin.db.reference backed by the in-memory database."""
+    return Reference(path)
+
+
+def reset(data=None, latency_ms=FIREBASE_MEMORY_LATENCY_MS, jitter_ms=FIREBASE_MEMORY_JITTER_MS) -> MemoryDatabase:
+    """Start over with `data` (or FIREBASE_MEMORY_SEED) as the whole tree."""
+    global database
+    if data is None and FIREBASE_MEMORY_SEED:
+        with open(FIREBASE_MEMORY_SEED) as f:
+            data = json.load(f)
+    database = MemoryDatabase(data, latency_ms, jitter_ms)
+    return database
+
+
+def install() -> MemoryDatabase:
+    """Route firebase_admin.db.reference to the in-memory database (idempotent)."""
+    from firebase_admin import db
+    if db.reference is not reference:
+        db.reference = reference
+        logger.info("Firebase backend: in-memory")
+    return _current()
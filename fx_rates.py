@@ -0,0 +1,106 @@
+"""
+ZAR per USDT, derived from live order books and shared from memory.
+
+The rate is the Luno USDTZAR mid, falling back to the BTC cross
+(Luno XBTZAR mid / Binance BTCUSDT mid). It is refreshed at most every
+FX_REFRESH_SECONDS; if refreshing fails and the cached rate is older than
+FX_MAX_AGE_SECONDS, get_zar_usdt_rate() raises StaleRateError so arbitrage
+skips the tick instead of trading on a bad conversion.
+
+One thread refreshes at a time, and the book fetch runs outside the lock that
+guards the rate. Readers holding a rate younger than their max_age get it
+straight away while a refresh is in flight; only readers without a usable
+rate wait for it.
+"""
+import logging
+import os
+import threading
+import time
+
+from metrics import register_gauge
+from order_book import refresh_book
+
+logger = logging.getLogger(__name__)
+
+FX_REFRESH_SECONDS = float(os.getenv("FX_REFRESH_SECONDS", 5))
+FX_MAX_AGE_SECONDS = float(os.getenv("FX_MAX_AGE_SECONDS", 30))
+
+
+class StaleRateError(Exception):
+    """No ZAR/USDT rate fresher than the configured bound is available."""
+
+
+_lock = threading.Lock()  # guards _rate; never held across a fetch
+_refresh_lock = threading.Lock()  # one refresh in flight at a time
+_rate = {"value": None, "source": None, "at": 0.0}
+
+register_gauge("fx_rate_age_seconds", "Age of the cached ZAR/USDT rate",
+               lambda: round(time.monotonic() - _rate["at"], 3) if _rate["value"] else -1)
+
+
+def _mid(exchange: str, symbol: str):
+    book = refresh_book(exchange, symbol)
+    if book is None:
+        return None
+    bid, ask = book.best_bid(), book.best_ask()
+    if not bid or not ask:
+        return None
+    return (bid + ask) / 2
+
+
+def fetch_zar_usdt_rate():
+    """(rate, source) from the books, or (None, None) when neither source is available."""
+    direct = _mid("luno", "USDTZAR")
+    if direct:
+        return direct, "luno:USDTZAR"
+    btc_zar, btc_usdt = _mid("luno", "XBTZAR"), _mid("binance", "BTCUSDT")
+    if btc_zar and btc_usdt:
+        return btc_zar / btc_usdt, "cross:XBTZAR/BTCUSDT"
+    return None, None
+
+
+def _cached():
+    with _lock:
+        return _rate["value"], _rate["at"]
+
+
+def _refresh(wait: bool):
+    """Fetch a new rate unless another thread is (wait=False) or just did (wait=True)."""
+    if not _refresh_lock.acquire(blocking=wait):
+        return
+    try:
+        value, at = _cached()
+        if value is not None and time.monotonic() - at < FX_REFRESH_SECONDS:
+            return  # refreshed by the thread we waited for
+        try:
+            value, source = fetch_zar_usdt_rate()
+        except Exception as e:
+            logger.error(f"ZAR/USDT refresh failed: {e}")
+            value, source = None, None
+        if value:
+            with _lock:
+                _rate.update(value=value, source=source, at=time.monotonic())
+    finally:
+        _refresh_lock.release()
+
+
+def get_zar_usdt_rate(max_age: float = FX_MAX_AGE_SECONDS) -> float:
+    """ZAR per 1 USDT. Raises StaleRateError when the best rate is older than max_age."""
+    value, at = _cached()
+    if value is None or time.monotonic() - at >= FX_REFRESH_SECONDS:
+        usable = value is not None and time.monotonic() - at < max_age
+        _refresh(wait=not usable)
+        value, at = _cached()
+
+    age = time.monotonic() - at
+    if value is None or age >= max_age:
+        raise StaleRateError(f"ZAR/USDT rate is stale ({age:.0f}s old, bound {max_age:.0f}s)")
+    return value
+
+
+def get_fx_status() -> dict:
+    return {
+        "zar_usdt": _rate["value"],
+        "source": _rate["source"],
+        "age_seconds": round(time.monotonic() - _rate["at"], 3) if _rate["value"] else None,
+    }
@@ -3,32 +3,31 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 from telegram.constants import ParseMode
-from database import firebase_ref
+from trade_stats import get_stats, summary
 
 async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = str(update.effective_user.id)
-    user_data = firebase_ref.child(user_id).get()
+    # One read of the incrementally maintained users/{id}/stats node (see trade_stats.py)
+    user_stats = get_stats(user_id)
 
-    if not user_data:
+    if not user_stats:
         await update.message.reply_text("No stats found. Make a trade first.")
         return
 
-    balance = float(user_data.get("balance", 0))
-    pnl = float(user_data.get("pnl", 0))
-    trades = int(user_data.get("trades", 0))
-    wins = int(user_data.get("wins", 0))
-    losses = int(user_data.get("losses", 0))
-
-    win_rate = (wins / trades * 100) if trades > 0 else 0.0
+    s = summary(user_stats)
+    hours = s["avg_hold_seconds"] / 3600
 
     msg = (
         f"*Your Stats:*\n"
-        f"`Balance:` ${balance:.2f}\n"
-        f"`PnL:` ${pnl:.2f}\n"
-        f"`Trades:` {trades}\n"
-        f"`Wins:` {wins}\n"
-        f"`Losses:` {losses}\n"
-        f"`Win Rate:` {win_rate:.1f}%"
+        f"`PnL:` ${s['pnl']:.2f}\n"
+        f"`Trades:` {s['trades']}\n"
+        f"`Wins:` {s['wins']}\n"
+        f"`Losses:` {s['losses']}\n"
+        f"`Win Rate:` {s['win_rate']:.1f}%\n"
+        f"`Max Drawdown:` ${s['max_drawdown']:.2f}\n"
+        f"`Avg Hold:` {hours:.1f}h"
     )
+    for name, strategy in sorted(s["by_strategy"].items()):
+        msg += f"\n`{name}:` {strategy.get('trades', 0)} trades, ${strategy.get('pnl', 0):.2f}"
 
     await update.message.reply_text(msg, parse_mode=ParseMode.MARKDOWN)
@@ -0,0 +1,149 @@
+"""
+Hedged requests for idempotent market-data reads.
+
+When HEDGE_REQUESTS is enabled, a read that has not answered within the
+endpoint's running p90 latency (never less than HEDGE_MIN_DELAY_MS) gets a
+second identical request, and whichever succeeds first wins. Hedges draw from
+a token budget that refills by HEDGE_MAX_EXTRA per primary request, so extra
+load stays below that fraction of traffic (plus a small burst).
+
+Reports hedge_requests_total, hedge_wins_total and
+hedge_latency_saved_seconds (how much sooner the winning hedge answered than
+the primary it replaced).
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+HEDGE_REQUESTS = os.getenv("HEDGE_REQUESTS", "").lower() in ("1", "true", "yes", "on")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 0.9))
+HEDGE_MIN_DELAY_MS = float(os.getenv("HEDGE_MIN_DELAY_MS", 50))
+HEDGE_MAX_EXTRA = float(os.getenv("HEDGE_MAX_EXTRA", 0.1))
+HEDGE_BURST = float(os.getenv("HEDGE_BURST", 5))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", 200))
+HEDGE_WORKERS = int(os.getenv("HEDGE_WORKERS", 16))
+
+HEDGE_PRIMARY = Counter("hedge_primary_requests_total", "Reads eligible for hedging", ("exchange", "endpoint"))
+HEDGE_SENT = Counter("hedge_requests_total", "Hedge requests sent", ("exchange", "endpoint"))
+HEDGE_WINS = Counter("hedge_wins_total", "Reads answered by the hedge first", ("exchange", "endpoint"))
+HEDGE_SAVED_SECONDS = Histogram(
+    "hedge_latency_saved_seconds", "How much sooner a winning hedge answered than its primary",
+    ("exchange", "endpoint"),
+)
+
+_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="hedge")
+
+
+class _Endpoint:
+    """Recent latencies and the hedge token budget for one (exchange, endpoint)."""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=HEDGE_WINDOW)
+        self.tokens = HEDGE_BURST
+        self._threshold = None
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.latencies.append(seconds)
+            self._threshold = None
+
+    def threshold(self):
+        with self._lock:
+            if self._threshold is None:
+                if len(self.latencies) < 20:
+                    return None  # Not enough history to know what "slow" is
+                ordered = sorted(self.latencies)
+                self._threshold = ordered[min(len(ordered) - 1, int(HEDGE_PERCENTILE * len(ordered)))]
+            return max(self._threshold, HEDGE_MIN_DELAY_MS / 1000.0)
+
+    def earn(self):
+        with self._lock:
+            self.tokens = min(HEDGE_BURST, self.tokens + HEDGE_MAX_EXTRA)
+
+    def spend(self) -> bool:
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+_endpoints = {}
+_endpoints_lock = threading.Lock()
+
+
+def _endpoint(exchange, endpoint) -> _Endpoint:
+    key = (exchange, endpoint)
+    state = _endpoints.get(key)
+    if state is None:
+        with _endpoints_lock:
+            state = _endpoints.setdefault(key, _Endpoint())
+    return state
+
+
+def _timed(fn, state):
+    start = time.perf_counter()
+    try:
+        return fn()
+    finally:
+        state.observe(time.perf_counter() - start)
+
+
+def hedged(exchange: str, endpoint: str, fn):
+    """Call fn(), hedging it with a second call if it is slower than usual. fn must be idempotent."""
+    if not HEDGE_REQUESTS:
+        return fn()
+
+    state = _endpoint(exchange, endpoint)
+    HEDGE_PRIMARY.inc(exchange, endpoint)
+    state.earn()
+    threshold = state.threshold()
+    if threshold is None:
+        return _timed(fn, state)
+
+    primary = _executor.submit(_timed, fn, state)
+    done, _ = wait([primary], timeout=threshold)
+    if done or not state.spend():
+        return primary.result()
+
+    HEDGE_SENT.inc(exchange, endpoint)
+    hedge = _executor.submit(_timed, fn, state)
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                error = future.exception()
+                continue
+            if future is hedge:
+                HEDGE_WINS.inc(exchange, endpoint)
+                won_at = time.perf_counter()
+                # Measure the saving once the primary finishes in the background
+                primary.add_done_callback(
+                    lambda _, won_at=won_at: HEDGE_SAVED_SECONDS.observe(
+                        time.perf_counter() - won_at, exchange, endpoint))
+            return future.result()
+    raise error
+
+
+def get_hedge_stats() -> dict:
+    stats = {}
+    for (exchange, endpoint), state in list(_endpoints.items()):
+        primaries = HEDGE_PRIMARY.value(exchange, endpoint)
+        hedges = HEDGE_SENT.value(exchange, endpoint)
+        stats[f"{exchange}.{endpoint}"] = {
+            "requests": primaries,
+            "hedge_rate": round(hedges / primaries, 4) if primaries else 0.0,
+            "hedge_wins": HEDGE_WINS.value(exchange, endpoint),
+            "threshold_ms": round(state.threshold() * 1000, 1) if state.threshold() else None,
+        }
+    return {"enabled": HEDGE_REQUESTS, "endpoints": stats}
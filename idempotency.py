@@ -0,0 +1,143 @@
+"""
+Bounded, time-windowed idempotency keys for Telegram update deduplication.
+
+Telegram redelivers an update when the webhook is slow or fails, so the same
+update_id can arrive more than once; claim() lets only the first delivery
+through:
+
+    if not claim(f"update:{update_id}"):
+        return {"ok": True}          # duplicate, already handled
+    try:
+        ...dispatch...
+    except Exception:
+        release(f"update:{update_id}")   # let Telegram's retry run it
+        raise
+
+Keys live for IDEMPOTENCY_TTL_SECONDS. In-process, the store is an ordered
+dict capped at IDEMPOTENCY_MAX_KEYS: keys are inserted in time order, so
+expired and overflow keys are both evicted from the oldest end and memory
+stays flat however long the process runs. With several web workers set
+IDEMPOTENCY_BACKEND=redis so they share one window (SET NX EX, expired by
+Redis itself); if Redis is unreachable the in-process store is used so
+updates are still handled.
+
+    IDEMPOTENCY_TTL_SECONDS   dedup window (default 86400, Telegram's retry horizon)
+    IDEMPOTENCY_MAX_KEYS      in-process cap (default 100000)
+    IDEMPOTENCY_BACKEND       memory | redis (default memory)
+    IDEMPOTENCY_REDIS_URL     defaults to REDIS_URL, as for Celery
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from metrics import Counter, register_gauge
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 86400))
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", 100000))
+IDEMPOTENCY_BACKEND = os.getenv("IDEMPOTENCY_BACKEND", "memory").lower()
+IDEMPOTENCY_REDIS_URL = os.getenv("IDEMPOTENCY_REDIS_URL") or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+REDIS_KEY_PREFIX = "idempotency:"
+
+CLAIMS = Counter("idempotency_claims_total", "Idempotency key checks by outcome", ("result",))
+
+
+class MemoryStore:
+    """Keys in first-seen order with their expiry; never more than max_keys."""
+
+    def __init__(self, ttl=IDEMPOTENCY_TTL_SECONDS, max_keys=IDEMPOTENCY_MAX_KEYS):
+        self.ttl, self.max_keys = ttl, max_keys
+        self._keys = OrderedDict()  # key -> expires_at (monotonic)
+        self._lock = threading.Lock()
+        self.stats = {"evicted": 0}
+
+    def claim(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            expires_at = self._keys.get(key)
+            if expires_at is not None and expires_at > now:
+                return False
+            self._keys.pop(key, None)
+            self._keys[key] = now + self.ttl
+            self._evict(now)
+            return True
+
+    def release(self, key: str):
+        with self._lock:
+            self._keys.pop(key, None)
+
+    def _evict(self, now):
+        keys = self._keys
+        while keys and (len(keys) > self.max_keys or next(iter(keys.values())) <= now):
+            keys.popitem(last=False)
+            self.stats["evicted"] += 1
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class RedisStore:
+    """Shared window for multi-worker deployments; Redis expires the keys."""
+
+    def __init__(self, url=IDEMPOTENCY_REDIS_URL, ttl=IDEMPOTENCY_TTL_SECONDS):
+        import redis
+        self.ttl = ttl
+        self.client = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+
+    def claim(self, key: str) -> bool:
+        return bool(self.client.set(REDIS_KEY_PREFIX + key, 1, nx=True, ex=max(1, int(self.ttl))))
+
+    def release(self, key: str):
+        self.client.delete(REDIS_KEY_PREFIX + key)
+
+
+# === Store Selection ===
+_local = MemoryStore()
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if IDEMPOTENCY_BACKEND == "redis":
+                    try:
+                        _store = RedisStore()
+                    except ImportError as e:
+                        logger.error(f"Redis idempotency store unavailable ({e}); using the in-process store")
+                        _store = _local
+                else:
+                    _store = _local
+    return _store
+
+
+def claim(key: str) -> bool:
+    """True the first time `key` is seen within the window, False for repeats."""
+    store = get_store()
+    try:
+        first = store.claim(key)
+    except Exception as e:
+        # Redis down: fall back to this process's window rather than drop the update
+        logger.error(f"Idempotency check failed for {key}: {e}")
+        first = _local.claim(key)
+    CLAIMS.inc("new" if first else "duplicate")
+    return first
+
+
+def release(key: str):
+    """Forget `key` so a redelivery is processed again (after a failed attempt)."""
+    _local.release(key)
+    store = get_store()
+    if store is not _local:
+        try:
+            store.release(key)
+        except Exception as e:
+            logger.error(f"Idempotency release failed for {key}: {e}")
+
+
+register_gauge("idempotency_keys", "Idempotency keys held in-process", lambda: len(_local))
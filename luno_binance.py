@@ -1,9 +1,10 @@
-import requests
 import os
+from circuit_breaker import http_get
+from fx_rates import get_zar_usdt_rate, StaleRateError
 
 def get_luno_price(pair="XBTZAR"):
     try:
-        response = requests.get(f"https://api.luno.com/api/1/ticker?pair={pair}")
+        response = http_get("luno", "ticker", f"https://api.luno.com/api/1/ticker?pair={pair}")
         data = response.json()
         return float(data["ask"]), float(data["bid"])
     except Exception as e:
@@ -11,13 +12,20 @@ def get_luno_price(pair="XBTZAR"):
 
 def get_binance_price(symbol="BTCUSDT"):
     try:
-        response = requests.get(f"https://api.binance.com/api/v3/ticker/bookTicker?symbol={symbol}")
+        response = http_get("binance", "book_ticker", f"https://api.binance.com/api/v3/ticker/bookTicker?symbol={symbol}")
         data = response.json()
         return float(data["askPrice"]), float(data["bidPrice"])
     except Exception as e:
         return None, None
 
-def calculate_arbitrage(luno_ask, luno_bid, binance_ask, binance_bid, zar_usd_rate):
+def calculate_arbitrage(luno_ask, luno_bid, binance_ask, binance_bid, zar_usd_rate=None):
+    if zar_usd_rate is None:
+        # Shared FX service; a stale rate means no decision rather than a bad one
+        try:
+            zar_usd_rate = get_zar_usdt_rate()
+        except StaleRateError:
+            return None
+
     if not all([luno_ask, luno_bid, binance_ask, binance_bid, zar_usd_rate]):
         return None
 
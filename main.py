@@ -11,13 +11,14 @@ from pathlib import Path
 from fastapi import FastAPI, Request, HTTPException, Depends, status
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 from telegram import Update
 from telegram.ext import Application, CommandHandler, CallbackContext
 from telegram.error import TelegramError
-from firebase_admin import credentials, db, initialize_app
+from firebase_admin import db
 from firebase_admin.exceptions import FirebaseError
 from dotenv import load_dotenv
 from datetime import datetime
@@ -25,25 +26,28 @@ import firebase_admin
 from urllib.parse import unquote
 from pydantic import BaseSettings, AnyUrl, validator, ValidationError
 
-# Import your strategy modules
-from strategy_loop import strategy_loop
-from handlers.login import login_handler
-from commands.start import start_command
-from commands.help import help_command
-from commands.trade import trade_command
-from commands.leaderboard import leaderboard_command
-from commands.setbase import setbase_command
-from commands.setplatform import setplatform_command
-from commands.setstrategy import setstrategy_command
-from commands.setamount import setamount_command
-from commands.showconfig import showconfig_command
-from commands.balance import balance_command
-from commands.register import register_command
-from commands.autobot import autobot_command
-from database import get_user_data, get_autobot_status, create_user, get_user
+# Command handlers, the strategy loop and the exchange/database helpers are
+# resolved on first use (see startup.py) so cold starts don't pay for pandas,
+# python-binance and every strategy module up front.
+from startup import STARTUP_MODE, lazy_attr, lazy_handler, preload
+from firebase import initialize_firebase
 from utils import send_alert, format_trade_message
-from price_feed import get_price
 from utils.logger_utils import get_logger
+from event_log import log_event, shutdown_event_log, get_event_log_stats
+import metrics
+from idempotency import claim as claim_update, release as release_update
+from tracing import slowest_traces
+from fx_rates import get_fx_status
+from hedging import get_hedge_stats
+
+get_user_data = lazy_attr("database", "get_user_data")
+get_autobot_status = lazy_attr("database", "get_autobot_status")
+create_user = lazy_attr("database", "create_user")
+get_user = lazy_attr("database", "get_user")
+get_price = lazy_attr("price_feed", "get_price")
+get_opportunities = lazy_attr("arbitrage_scanner", "get_opportunities")
+get_risk_snapshot = lazy_attr("risk_engine", "get_risk_snapshot")
+iter_trades = lazy_attr("trade_archive", "iter_trades")
 
 # ===== Configuration Model =====
 class BotSettings(BaseSettings):
@@ -54,6 +58,7 @@ class BotSettings(BaseSettings):
     webhook_secret: str
     log_level: str = "INFO"
     rate_limit: str = "100/minute"
+    admin_token: Optional[str] = None
 
     @validator("firebase_credentials")
     def validate_credentials(cls, v):
@@ -82,19 +87,14 @@ except ValidationError as e:
 logger = get_logger("crypto-bot-3", settings.log_level)
 
 # ===== Firebase Initialization =====
-def initialize_firebase():
-    if not firebase_admin._apps:
-        try:
-            decoded = base64.b64decode(settings.firebase_credentials).decode("utf-8")
-            cred_data = json.loads(decoded)
-            cred = credentials.Certificate(cred_data)
-            initialize_app(cred, {"databaseURL": settings.database_url})
-            logger.info("Firebase initialized successfully")
-        except (base64.binascii.Error, json.JSONDecodeError, ValueError) as e:
-            logger.critical(f"Firebase initialization failed: {str(e)}")
-            exit(1)
-
-initialize_firebase()
+# firebase.initialize_firebase is the one initialisation point shared with
+# database.py and the workers; whoever calls it first wins.
+try:
+    initialize_firebase(settings.firebase_credentials, settings.database_url)
+    logger.info("Firebase initialized successfully")
+except ValueError as e:
+    logger.critical(f"Firebase initialization failed: {str(e)}")
+    exit(1)
 
 # ===== FastAPI App Setup =====
 app = FastAPI(title="Crypto Trading Bot", version="1.0.0")
@@ -114,19 +114,23 @@ security_scheme = HTTPBearer()
 telegram_app = Application.builder().token(settings.bot_token).build()
 
 # ===== Command Registration (Preserving your explicit handler setup) =====
-telegram_app.add_handler(CommandHandler("start", start_command))
-telegram_app.add_handler(CommandHandler("help", help_command))
-telegram_app.add_handler(CommandHandler("trade", trade_command))
-telegram_app.add_handler(CommandHandler("login", login_handler))
-telegram_app.add_handler(CommandHandler("leaderboard", leaderboard_command))
-telegram_app.add_handler(CommandHandler("setbase", setbase_command))
-telegram_app.add_handler(CommandHandler("setplatform", setplatform_command))
-telegram_app.add_handler(CommandHandler("setstrategy", setstrategy_command))
-telegram_app.add_handler(CommandHandler("setamount", setamount_command))
-telegram_app.add_handler(CommandHandler("showconfig", showconfig_command))
-telegram_app.add_handler(CommandHandler("register", register_command))
-telegram_app.add_handler(CommandHandler("balance", balance_command))
-telegram_app.add_handler(CommandHandler("autobot", autobot_command))
+COMMAND_HANDLERS = {
+    "start": lazy_handler("commands.start", "start_command"),
+    "help": lazy_handler("commands.help", "help_command"),
+    "trade": lazy_handler("commands.trade", "trade_command"),
+    "login": lazy_handler("handlers.login", "login_handler"),
+    "leaderboard": lazy_handler("commands.leaderboard", "leaderboard_command"),
+    "setbase": lazy_handler("commands.setbase", "setbase_command"),
+    "setplatform": lazy_handler("commands.setplatform", "setplatform_command"),
+    "setstrategy": lazy_handler("commands.setstrategy", "setstrategy_command"),
+    "setamount": lazy_handler("commands.setamount", "setamount_command"),
+    "showconfig": lazy_handler("commands.showconfig", "showconfig_command"),
+    "register": lazy_handler("commands.register", "register_command"),
+    "balance": lazy_handler("commands.balance", "balance_command"),
+    "autobot": lazy_handler("commands.autobot", "autobot_command"),
+}
+for command_name, handler in COMMAND_HANDLERS.items():
+    telegram_app.add_handler(CommandHandler(command_name, handler))
 
 # ===== Enhanced Price Command Handler =====
 async def price_command(update: Update, context: CallbackContext):
@@ -157,29 +161,14 @@ async def price_command(update: Update, context: CallbackContext):
 telegram_app.add_handler(CommandHandler("price", price_command))
 
 # ===== Enhanced Logging Functions =====
+# Events go through the buffered sink in event_log, which batches them into
+# multi-path updates instead of one Firebase push per event.
 def sync_log_event(user_id: str, event_type: str, message_text: str, status: str = "ok", error: Optional[str] = None):
-    try:
-        log_ref = db.reference(f"logs/{user_id}")
-        log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "event": event_type,
-            "message": message_text,
-            "status": status,
-            "environment": "production" if os.getenv("PRODUCTION") else "development"
-        }
-        if error:
-            log_entry["error"] = error[:500]  # Truncate long errors
-        log_ref.push(log_entry)
-    except FirebaseError as e:
-        logger.error(f"Firebase logging failed: {str(e)}")
+    log_event(user_id, event_type, message_text, status=status, error=error)
 
 async def log_event_async(user_id: str, event_type: str, message_text: str, status: str = "ok", error: Optional[str] = None):
-    loop = asyncio.get_running_loop()
-    await loop.run_in_executor(
-        None, 
-        sync_log_event, 
-        user_id, event_type, message_text, status, error
-    )
+    # Enqueueing is a non-blocking in-memory append, no executor thread needed
+    log_event(user_id, event_type, message_text, status=status, error=error)
 
 # ===== Webhook Security =====
 async def verify_webhook_signature(request: Request) -> Dict[str, Any]:
@@ -203,7 +192,8 @@ async def verify_webhook_signature(request: Request) -> Dict[str, Any]:
         raise HTTPException(status_code=400, detail="Invalid request")
 
 # ===== Webhook Endpoint with Legacy Support =====
-@app.post("/webhook/{token}", dependencies=[Depends(limiter.limit("10/second"))])
+@app.post("/webhook/{token}")
+@limiter.limit("10/second")
 async def telegram_webhook(request: Request, token: str):
     token = unquote(token)
     if token != settings.bot_token:
@@ -214,8 +204,17 @@ async def telegram_webhook(request: Request, token: str):
         
         # Standard Telegram update processing
         if "update_id" in data:
-            update = Update.de_json(data, telegram_app.bot)
-            await telegram_app.process_update(update)
+            # Telegram redelivers slow or failed updates; run each update_id once
+            key = f"update:{data['update_id']}"
+            if not claim_update(key):
+                logger.info(f"Duplicate update {data['update_id']} ignored")
+                return {"ok": True}
+            try:
+                update = Update.de_json(data, telegram_app.bot)
+                await telegram_app.process_update(update)
+            except Exception:
+                release_update(key)
+                raise
         # Legacy message processing
         else:
             message = data.get("message", {})
@@ -224,36 +223,45 @@ async def telegram_webhook(request: Request, token: str):
 
             if not chat_id:
                 return {"ok": False}
-
-            user_id = str(chat_id)
-            user = get_user(user_id)
-
-            if not user:
-                create_user(user_id)
-                send_alert("Welcome! Your crypto bot profile has been created.", chat_id)
-                await log_event_async(user_id, "new_user", text)
+            message_id = message.get("message_id")
+            key = f"message:{chat_id}:{message_id}" if message_id is not None else None
+            if key and not claim_update(key):
                 return {"ok": True}
 
-            if text.startswith("/"):
+            try:
+                user_id = str(chat_id)
+                user = get_user(user_id)
+
+                if not user:
+                    create_user(user_id)
+                    send_alert("Welcome! Your crypto bot profile has been created.", chat_id)
+                    await log_event_async(user_id, "new_user", text)
+                    return {"ok": True}
+
+                if text.startswith("/"):
+                    try:
+                        response = handle_command(text, user_id)
+                        if response:
+                            send_alert(response, chat_id)
+                        await log_event_async(user_id, "command", text)
+                    except Exception as e:
+                        send_alert(f"Command error for user {user_id}: {e}", chat_id)
+                        send_alert("Oops, there was an error handling your command.", chat_id)
+                        await log_event_async(user_id, "command", text, status="error", error=str(e))
+                    return {"ok": True}
+
                 try:
-                    response = handle_command(text, user_id)
-                    if response:
-                        send_alert(response, chat_id)
-                    await log_event_async(user_id, "command", text)
+                    if get_autobot_status(user_id):
+                        run_auto_bot(user_id)
+                        await log_event_async(user_id, "autobot", text)
                 except Exception as e:
-                    send_alert(f"Command error for user {user_id}: {e}", chat_id)
-                    send_alert("Oops, there was an error handling your command.", chat_id)
-                    await log_event_async(user_id, "command", text, status="error", error=str(e))
-                return {"ok": True}
-
-            try:
-                if get_autobot_status(user_id):
-                    run_auto_bot(user_id)
-                    await log_event_async(user_id, "autobot", text)
-            except Exception as e:
-                send_alert(f"AutoBot error for {user_id}: {e}", chat_id)
-                send_alert("Error running AutoBot. Check your settings.", chat_id)
-                await log_event_async(user_id, "autobot", text, status="error", error=str(e))
+                    send_alert(f"AutoBot error for {user_id}: {e}", chat_id)
+                    send_alert("Error running AutoBot. Check your settings.", chat_id)
+                    await log_event_async(user_id, "autobot", text, status="error", error=str(e))
+            except Exception:
+                if key:
+                    release_update(key)
+                raise
 
         return {"ok": True}
     except json.JSONDecodeError:
@@ -275,7 +283,10 @@ async def health_check():
     status = {
         "telegram": telegram_app.running if telegram_app else False,
         "firebase": bool(firebase_admin._apps),
-        "database": "unknown"
+        "database": "unknown",
+        "event_log": get_event_log_stats(),
+        "fx": get_fx_status(),
+        "hedging": get_hedge_stats()
     }
     
     try:
@@ -287,6 +298,42 @@ async def health_check():
     
     return status
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    # Prometheus text format: exchange/Firebase/strategy latency histograms,
+    # cycle durations, queue depths and cache hit counters
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+# ===== Admin Endpoints =====
+async def verify_admin(request: Request):
+    # Admin endpoints are disabled unless ADMIN_TOKEN is configured
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled")
+    credentials: HTTPAuthorizationCredentials = await security_scheme(request)
+    if not hmac.compare_digest(credentials.credentials, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+@app.get("/admin/traces/slowest", dependencies=[Depends(verify_admin)])
+def slowest_cycles(limit: int = 10):
+    # Slowest sampled user cycles with their span breakdown
+    return {"traces": slowest_traces(min(max(limit, 1), 100))}
+
+@app.get("/admin/arbitrage/opportunities", dependencies=[Depends(verify_admin)])
+async def arbitrage_opportunities(limit: int = 20):
+    # Ranked cycles from the shared scanner cache (rescans if older than SCANNER_TTL)
+    return {"opportunities": await asyncio.to_thread(get_opportunities, min(max(limit, 1), 200))}
+
+@app.get("/admin/risk", dependencies=[Depends(verify_admin)])
+def fleet_risk(top: int = 10):
+    # Fleet exposure by asset and strategy, concentration, largest users and caps
+    return get_risk_snapshot(min(max(top, 1), 100))
+
+@app.get("/admin/trades/{user_id}", dependencies=[Depends(verify_admin)])
+def trade_history(user_id: str, since: Optional[float] = None, until: Optional[float] = None):
+    # Full history as JSON lines, streamed from the archive files then the live trades node
+    lines = (json.dumps(trade) + "\n" for trade in iter_trades(user_id, since, until))
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
 # ===== Error Handling =====
 def global_error_handler(update: object, context: CallbackContext):
     error = context.error
@@ -304,6 +351,10 @@ telegram_app.add_error_handler(global_error_handler)
 @app.on_event("startup")
 async def start_bot():
     logger.info("Starting bot initialization...")
+
+    if STARTUP_MODE == "eager":
+        await asyncio.to_thread(preload, COMMAND_HANDLERS.values())
+        logger.info("Eager startup: deferred modules preloaded")
     
     # Initialize Telegram commands
     commands = [
@@ -335,6 +386,7 @@ async def start_bot():
     logger.info(f"Webhook set to: {webhook_url}")
     
     # Start strategy loop in background
+    from strategy_loop import strategy_loop
     asyncio.create_task(strategy_loop())
     logger.info("Bot startup complete")
 
@@ -343,6 +395,7 @@ async def stop_bot():
     logger.info("Shutting down bot...")
     await telegram_app.stop()
     await telegram_app.shutdown()
+    shutdown_event_log()
     logger.info("Bot shutdown complete")
 
 # ===== Main Entry Point =====
@@ -0,0 +1,102 @@
+import logging
+import os
+import threading
+import time
+
+from exchange_info import exchange_symbol
+from metrics import cache_hit, register_gauge
+from order_book import refresh_book
+from trading_api import get_binance_price, get_luno_price, get_price_history
+
+logger = logging.getLogger(__name__)
+
+# === Cycle Cache ===
+# Market data is shared by every user in a cycle: the runner prefetches what
+# the active strategies declare (see strategies.registry) and strategies read
+# from here instead of each issuing their own ticker/kline requests.
+MARKET_DATA_TTL = float(os.getenv("MARKET_DATA_TTL", 15))
+
+_lock = threading.Lock()
+_klines = {}   # (symbol, interval) -> (fetched_at, limit, closes)
+_tickers = {}  # (source, symbol) -> (fetched_at, price)
+
+register_gauge("market_data_cache_entries", "Entries in the market data cycle cache",
+               lambda: {"klines": len(_klines), "ticker": len(_tickers)})
+
+
+def binance_symbol(symbol: str) -> str:
+    """'BTC/USDT' -> 'BTCUSDT'"""
+    return exchange_symbol(symbol, "binance")
+
+
+def _fresh(fetched_at: float) -> bool:
+    return time.monotonic() - fetched_at < MARKET_DATA_TTL
+
+
+def _fetch_klines(symbol: str, interval: str, limit: int) -> list:
+    closes = get_price_history(symbol, interval=interval, limit=limit)
+    if closes:
+        with _lock:
+            _klines[(symbol, interval)] = (time.monotonic(), limit, closes)
+    return closes
+
+
+def _fetch_ticker(source: str, symbol: str):
+    price = get_binance_price(symbol) if source == "binance" else get_luno_price(symbol)
+    if price is not None:
+        with _lock:
+            _tickers[(source, symbol)] = (time.monotonic(), price)
+    return price
+
+
+# === Reads ===
+def get_closes(symbol: str, interval: str, lookback: int) -> list:
+    """Last `lookback` closing prices, from the cycle cache when possible."""
+    symbol = binance_symbol(symbol)
+    cached = _klines.get((symbol, interval))
+    hit = bool(cached and _fresh(cached[0]) and cached[1] >= lookback)
+    cache_hit("klines", hit)
+    if hit:
+        return cached[2][-lookback:]
+    return _fetch_klines(symbol, interval, lookback)[-lookback:]
+
+
+def get_ticker(source: str, symbol: str):
+    symbol = binance_symbol(symbol) if source == "binance" else symbol.upper()
+    cached = _tickers.get((source, symbol))
+    hit = bool(cached and _fresh(cached[0]))
+    cache_hit("ticker", hit)
+    if hit:
+        return cached[1]
+    return _fetch_ticker(source, symbol)
+
+
+# === Prefetch ===
+def prefetch(requirements):
+    """
+    Fetch each distinct (symbol, interval) once at the largest lookback any
+    strategy asked for, plus each distinct ticker and order book.
+    """
+    klines, tickers, books = {}, set(), set()
+    for req in requirements:
+        if req.get("kind") == "ticker":
+            tickers.add((req["source"], req["symbol"]))
+        elif req.get("kind") == "depth":
+            books.add((req["source"], req["symbol"]))
+        else:
+            key = (binance_symbol(req["symbol"]), req["interval"])
+            klines[key] = max(klines.get(key, 0), req["lookback"])
+
+    for (symbol, interval), lookback in klines.items():
+        cached = _klines.get((symbol, interval))
+        if cached and _fresh(cached[0]) and cached[1] >= lookback:
+            continue
+        _fetch_klines(symbol, interval, lookback)
+
+    for source, symbol in tickers:
+        get_ticker(source, symbol)
+
+    for source, symbol in books:
+        refresh_book(source, symbol)
+
+    logger.info(f"Prefetched {len(klines)} kline series, {len(tickers)} tickers and {len(books)} order books")
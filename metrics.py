@@ -0,0 +1,193 @@
+"""
+In-process metrics with Prometheus text exposition, served at /metrics.
+
+Kept dependency-free and cheap enough to leave on in production: an
+observation is a dict lookup, a bisect over the bucket bounds and a couple of
+integer increments under a per-metric lock. See benchmarks/bench_metrics.py
+for the measured overhead.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from tracing import span
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow exchange calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CYCLE_BUCKETS = (0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+# === Metric Types ===
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def values(self) -> dict:
+        """{label values tuple: count} for every series."""
+        with self._lock:
+            return dict(self._values)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Gauge:
+    """Gauge whose value is read from a callback at scrape time (queue depths, cache sizes)."""
+
+    def __init__(self, name, documentation, callback):
+        self.name, self.documentation, self.callback = name, documentation, callback
+        _registry.append(self)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        try:
+            value = self.callback()
+        except Exception:
+            return lines
+        if isinstance(value, dict):
+            # {label_value: number} for a single-label gauge
+            for key, v in sorted(value.items()):
+                lines.append(f'{self.name}{{name="{key}"}} {v}')
+        else:
+            lines.append(f"{self.name} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def count(self, *labels):
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+        for labels, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', bound))} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, ('le', '+Inf'))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+# === Bot Metrics ===
+EXCHANGE_REQUEST_SECONDS = Histogram(
+    "exchange_request_seconds", "Latency of exchange API calls",
+    ("exchange", "endpoint", "status"),
+)
+FIREBASE_OP_SECONDS = Histogram(
+    "firebase_op_seconds", "Latency of Firebase Realtime Database operations",
+    ("op", "path", "status"),
+)
+STRATEGY_EXECUTE_SECONDS = Histogram(
+    "strategy_execute_seconds", "Time spent in a strategy's execute() for one user",
+    ("strategy", "status"),
+)
+CYCLE_SECONDS = Histogram(
+    "cycle_duration_seconds", "Duration of a full runner cycle",
+    ("runner",), buckets=CYCLE_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests_total", "Cache lookups by result", ("cache", "result"),
+)
+
+
+@contextmanager
+def _timed(histogram, span_name, *labels):
+    # Also opens a tracing span, which is a no-op unless the cycle is sampled
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        with span(span_name):
+            yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, *labels, status)
+
+
+def exchange_call(exchange: str, endpoint: str):
+    """with exchange_call("binance", "ticker"): ... — records latency and ok/error."""
+    return _timed(EXCHANGE_REQUEST_SECONDS, f"{exchange}.{endpoint}", exchange, endpoint)
+
+
+def firebase_call(op: str, path: str):
+    """with firebase_call("read", "users"): ... — path is the top-level node, not the full key."""
+    return _timed(FIREBASE_OP_SECONDS, f"firebase.{op}.{path}", op, path)
+
+
+def strategy_call(strategy: str):
+    return _timed(STRATEGY_EXECUTE_SECONDS, f"strategy.{strategy}", strategy)
+
+
+def cache_hit(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache, "hit" if hit else "miss")
+
+
+def register_gauge(name: str, documentation: str, callback):
+    return Gauge(name, documentation, callback)
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,130 @@
+"""
+Parallel grid and random search over a strategy's PARAMETER_SPACE.
+
+    python -m optimizer range_trader --candles data/btcusdt_1m.npy \
+        [--method random --samples 10000] [--workers 8] [--top 20] [--out ranked.json]
+
+Every worker process opens the candle file memory-mapped (one physical copy
+in the page cache however many workers run), resamples it to the strategy's
+interval once and evaluates parameter sets in chunks. Indicators are cached
+per worker, so an RSI period is computed once however many thresholds are
+tried with it. Results are ranked by total return, with max drawdown and
+trade count alongside.
+"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from backtest import indicators_for, load_candles, run_backtest
+from strategies import get_strategy
+
+logger = logging.getLogger(__name__)
+
+OPTIMIZER_WORKERS = int(os.getenv("OPTIMIZER_WORKERS", os.cpu_count() or 1))
+CHUNKS_PER_WORKER = 4
+
+
+# === Search Spaces ===
+def space_size(space) -> int:
+    total = 1
+    for values in space.values():
+        total *= len(values)
+    return total
+
+
+def grid(space) -> list:
+    names = list(space)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(space[n] for n in names))]
+
+
+def random_sample(space, samples, seed=None) -> list:
+    """Up to `samples` distinct parameter sets drawn uniformly from the grid."""
+    total = space_size(space)
+    if samples >= total:
+        return grid(space)
+    names = list(space)
+    picked = []
+    for index in random.Random(seed).sample(range(total), samples):
+        params = {}
+        for name in reversed(names):  # decode the grid index, last parameter fastest
+            index, position = divmod(index, len(space[name]))
+            params[name] = space[name][position]
+        picked.append({n: params[n] for n in names})
+    return picked
+
+
+# === Workers ===
+_worker = {}
+
+
+def _init_worker(candles_path, strategy, start, end):
+    spec = get_strategy(strategy)
+    _worker["spec"] = spec
+    _worker["ind"] = indicators_for(spec, load_candles(candles_path)[start:end])
+
+
+def _evaluate(chunk) -> list:
+    spec, ind = _worker["spec"], _worker["ind"]
+    return [{"params": params, **run_backtest(spec, params, ind=ind)} for params in chunk]
+
+
+def rank(results, top=None) -> list:
+    ranked = sorted(results, key=lambda r: (-r["total_return"], r["max_drawdown"]))
+    return ranked[:top] if top else ranked
+
+
+def optimize(strategy, candles_path, method="grid", samples=1000, workers=OPTIMIZER_WORKERS, top=20,
+             seed=None, start=None, end=None, candidates=None) -> list:
+    """
+    Backtest every candidate parameter set of `strategy` on candle rows
+    [start:end] of candles_path and return the `top` best, best first.
+    """
+    spec = get_strategy(strategy)
+    if spec is None or spec.signals is None:
+        raise ValueError(f"Strategy '{strategy}' does not support backtesting")
+    if candidates is None:
+        space = spec.parameter_space
+        candidates = grid(space) if method == "grid" else random_sample(space, samples, seed)
+    candidates = [{**spec.parameters, **params} for params in candidates]
+
+    started = time.perf_counter()
+    workers = max(1, min(workers, len(candidates)))
+    if workers == 1:
+        _init_worker(candles_path, spec.name, start, end)
+        results = _evaluate(candidates)
+    else:
+        size = max(1, -(-len(candidates) // (workers * CHUNKS_PER_WORKER)))
+        chunks = [candidates[i:i + size] for i in range(0, len(candidates), size)]
+        with ProcessPoolExecutor(workers, initializer=_init_worker,
+                                 initargs=(candles_path, spec.name, start, end)) as pool:
+            results = [r for chunk in pool.map(_evaluate, chunks) for r in chunk]
+    logger.info(f"Optimized {spec.name}: {len(candidates)} parameter sets on {workers} workers "
+                f"in {time.perf_counter() - started:.1f}s")
+    return rank(results, top)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("strategy")
+    parser.add_argument("--candles", required=True)
+    parser.add_argument("--method", choices=("grid", "random"), default="grid")
+    parser.add_argument("--samples", type=int, default=1000)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int, default=OPTIMIZER_WORKERS)
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="write the ranked results as JSON")
+    args = parser.parse_args()
+
+    ranked = optimize(args.strategy, args.candles, args.method, args.samples, args.workers, args.top, args.seed)
+    print(f"{'return':>9}{'drawdown':>10}{'trades':>8}  params")
+    for r in ranked:
+        print(f"{r['total_return']:>9.2%}{r['max_drawdown']:>10.2%}{r['trades']:>8}  {r['params']}")
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(ranked, f, indent=2)
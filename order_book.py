@@ -0,0 +1,288 @@
+"""
+Local L2 order books for Binance and Luno.
+
+Books are built from a REST snapshot plus incremental diffs and kept as
+sorted array('d') columns (price, quantity) per side, so walking the book to
+price an order of size X is a tight loop over a few contiguous levels.
+
+Binance diffs are the depthUpdate events from <symbol>@depth (U/u update ids).
+Luno diffs are the order-level messages from the streaming API (sequence,
+create_update, delete_update, trade_updates), aggregated into price levels.
+
+Recorded streams (one JSON message per line, snapshot first) can be replayed
+with replay_file() to reproduce a book offline.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from circuit_breaker import http_get
+
+logger = logging.getLogger(__name__)
+
+BOOK_SNAPSHOT_TTL = float(os.getenv("BOOK_SNAPSHOT_TTL", 2))
+BINANCE_DEPTH_LIMIT = int(os.getenv("BINANCE_DEPTH_LIMIT", 100))
+
+
+class OutOfSyncError(Exception):
+    """A diff does not follow the book's last update id; a new snapshot is needed."""
+
+
+class _Side:
+    """Price levels kept in ascending price order with parallel quantity column."""
+
+    __slots__ = ("prices", "qtys")
+
+    def __init__(self):
+        self.prices = array("d")
+        self.qtys = array("d")
+
+    def clear(self):
+        self.prices = array("d")
+        self.qtys = array("d")
+
+    def set_level(self, price: float, qty: float):
+        i = bisect_left(self.prices, price)
+        exists = i < len(self.prices) and self.prices[i] == price
+        if qty <= 0:
+            if exists:
+                del self.prices[i]
+                del self.qtys[i]
+        elif exists:
+            self.qtys[i] = qty
+        else:
+            self.prices.insert(i, price)
+            self.qtys.insert(i, qty)
+
+    def add(self, price: float, delta: float):
+        i = bisect_left(self.prices, price)
+        if i < len(self.prices) and self.prices[i] == price:
+            self.set_level(price, self.qtys[i] + delta)
+        else:
+            self.set_level(price, delta)
+
+    def __len__(self):
+        return len(self.prices)
+
+
+class OrderBook:
+    def __init__(self, exchange: str, symbol: str):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.bids = _Side()
+        self.asks = _Side()
+        self.last_update_id = None
+        self.updated_at = 0.0
+        self._orders = {}  # Luno order_id -> (side, price, volume)
+        self._lock = threading.Lock()
+
+    # === Top of Book ===
+    def best_bid(self):
+        return self.bids.prices[-1] if len(self.bids) else None
+
+    def best_ask(self):
+        return self.asks.prices[0] if len(self.asks) else None
+
+    def age(self) -> float:
+        return time.monotonic() - self.updated_at
+
+    # === Book Walking ===
+    def average_fill_price(self, side: str, size: float):
+        """
+        Volume-weighted price to buy (walk asks) or sell (walk bids) `size` base
+        units. Returns None when the book is not deep enough.
+        """
+        if size <= 0:
+            return None
+        with self._lock:
+            if side == "buy":
+                prices, qtys, indices = self.asks.prices, self.asks.qtys, range(len(self.asks))
+            else:
+                prices, qtys, indices = self.bids.prices, self.bids.qtys, range(len(self.bids) - 1, -1, -1)
+            remaining, cost = size, 0.0
+            for i in indices:
+                take = qtys[i] if qtys[i] < remaining else remaining
+                cost += take * prices[i]
+                remaining -= take
+                if remaining <= 1e-12:
+                    return cost / size
+        return None
+
+    def fill_for_quote(self, side: str, quote_amount: float):
+        """
+        Walk the book spending (buy) or receiving (sell) `quote_amount` of the
+        quote currency. Returns (average_price, base_quantity) or (None, 0.0).
+        """
+        if quote_amount <= 0:
+            return None, 0.0
+        with self._lock:
+            if side == "buy":
+                prices, qtys, indices = self.asks.prices, self.asks.qtys, range(len(self.asks))
+            else:
+                prices, qtys, indices = self.bids.prices, self.bids.qtys, range(len(self.bids) - 1, -1, -1)
+            remaining, base = quote_amount, 0.0
+            for i in indices:
+                level_quote = qtys[i] * prices[i]
+                if level_quote >= remaining:
+                    base += remaining / prices[i]
+                    return quote_amount / base, base
+                base += qtys[i]
+                remaining -= level_quote
+        return None, 0.0
+
+    # === Snapshots ===
+    def apply_binance_snapshot(self, snapshot: dict):
+        with self._lock:
+            self.bids.clear()
+            self.asks.clear()
+            for price, qty in snapshot.get("bids", []):
+                self.bids.set_level(float(price), float(qty))
+            for price, qty in snapshot.get("asks", []):
+                self.asks.set_level(float(price), float(qty))
+            self.last_update_id = int(snapshot["lastUpdateId"])
+            self.updated_at = time.monotonic()
+
+    def apply_luno_snapshot(self, snapshot: dict):
+        """Luno streaming snapshot: order-level bids/asks with ids and a sequence."""
+        with self._lock:
+            self.bids.clear()
+            self.asks.clear()
+            self._orders = {}
+            for side_name, side in (("bids", self.bids), ("asks", self.asks)):
+                for order in snapshot.get(side_name, []):
+                    price, volume = float(order["price"]), float(order["volume"])
+                    side.add(price, volume)
+                    if "id" in order:
+                        self._orders[order["id"]] = (side_name, price, volume)
+            self.last_update_id = int(snapshot.get("sequence", 0))
+            self.updated_at = time.monotonic()
+
+    # === Diffs ===
+    def apply_binance_diff(self, event: dict):
+        first, final = int(event["U"]), int(event["u"])
+        with self._lock:
+            if self.last_update_id is None:
+                raise OutOfSyncError("No snapshot loaded")
+            if final <= self.last_update_id:
+                return  # Already covered by the snapshot
+            if first > self.last_update_id + 1:
+                raise OutOfSyncError(f"Gap in {self.symbol} depth stream: {self.last_update_id} -> {first}")
+            for price, qty in event.get("b", []):
+                self.bids.set_level(float(price), float(qty))
+            for price, qty in event.get("a", []):
+                self.asks.set_level(float(price), float(qty))
+            self.last_update_id = final
+            self.updated_at = time.monotonic()
+
+    def apply_luno_diff(self, message: dict):
+        sequence = int(message["sequence"])
+        with self._lock:
+            if self.last_update_id is None:
+                raise OutOfSyncError("No snapshot loaded")
+            if sequence <= self.last_update_id:
+                return
+            if sequence != self.last_update_id + 1:
+                raise OutOfSyncError(f"Gap in {self.symbol} stream: {self.last_update_id} -> {sequence}")
+
+            for trade in message.get("trade_updates") or []:
+                order_id = trade.get("maker_order_id")
+                if order_id in self._orders:
+                    side_name, price, volume = self._orders[order_id]
+                    filled = min(float(trade["base"]), volume)
+                    self._side(side_name).add(price, -filled)
+                    if volume - filled > 1e-12:
+                        self._orders[order_id] = (side_name, price, volume - filled)
+                    else:
+                        del self._orders[order_id]
+
+            create = message.get("create_update")
+            if create:
+                side_name = "bids" if create["type"] == "BID" else "asks"
+                price, volume = float(create["price"]), float(create["volume"])
+                self._side(side_name).add(price, volume)
+                self._orders[create["order_id"]] = (side_name, price, volume)
+
+            delete = message.get("delete_update")
+            if delete and delete["order_id"] in self._orders:
+                side_name, price, volume = self._orders.pop(delete["order_id"])
+                self._side(side_name).add(price, -volume)
+
+            self.last_update_id = sequence
+            self.updated_at = time.monotonic()
+
+    def apply(self, message: dict):
+        """Dispatch a raw snapshot or diff message by its shape."""
+        if "lastUpdateId" in message:
+            self.apply_binance_snapshot(message)
+        elif "U" in message and "u" in message:
+            self.apply_binance_diff(message)
+        elif "bids" in message or "asks" in message:
+            self.apply_luno_snapshot(message)
+        elif "sequence" in message:
+            self.apply_luno_diff(message)
+        else:
+            raise ValueError(f"Unrecognised depth message: {list(message)[:5]}")
+
+    def _side(self, side_name):
+        return self.bids if side_name == "bids" else self.asks
+
+
+# === REST Snapshots ===
+def fetch_binance_snapshot(symbol: str = "BTCUSDT", limit: int = BINANCE_DEPTH_LIMIT) -> dict:
+    r = http_get("binance", "depth", "https://api.binance.com/api/v3/depth",
+                 params={"symbol": symbol, "limit": limit})
+    return r.json()
+
+
+def fetch_luno_snapshot(pair: str = "XBTZAR") -> dict:
+    # orderbook_top is already aggregated by price, which apply_luno_snapshot accepts
+    r = http_get("luno", "depth", "https://api.luno.com/api/1/orderbook_top", params={"pair": pair})
+    return r.json()
+
+
+_books = {}
+_books_lock = threading.Lock()
+
+
+def get_book(exchange: str, symbol: str) -> OrderBook:
+    key = (exchange, symbol)
+    with _books_lock:
+        if key not in _books:
+            _books[key] = OrderBook(exchange, symbol)
+        return _books[key]
+
+
+def refresh_book(exchange: str, symbol: str, max_age: float = BOOK_SNAPSHOT_TTL):
+    """
+    Return the shared book for (exchange, symbol), re-snapshotting over REST when
+    no stream has updated it within max_age seconds. Returns None on failure.
+    """
+    book = get_book(exchange, symbol)
+    if book.last_update_id is not None and book.age() < max_age:
+        return book
+    try:
+        if exchange == "binance":
+            book.apply_binance_snapshot(fetch_binance_snapshot(symbol))
+        else:
+            book.apply_luno_snapshot(fetch_luno_snapshot(symbol))
+        return book
+    except Exception as e:
+        logger.error(f"Failed to refresh {exchange} {symbol} order book: {e}")
+        return None
+
+
+# === Recorded Streams ===
+def replay(book: OrderBook, messages):
+    """Apply an iterable of recorded messages in order; returns the book."""
+    for message in messages:
+        book.apply(message)
+    return book
+
+
+def replay_file(path: str, exchange: str, symbol: str) -> OrderBook:
+    with open(path) as f:
+        return replay(OrderBook(exchange, symbol), (json.loads(line) for line in f if line.strip()))
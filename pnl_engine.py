@@ -0,0 +1,248 @@
+"""
+Mark-to-market PnL for every user, recomputed on each tick.
+
+Open quantity and cost basis per user per asset (average cost, USD, assets in
+RISK_ASSETS order) are held in (users x assets) float64 arrays alongside
+per-user realized PnL and the day's opening state. Fills update one row.
+Each tick revalues the whole user base with NumPy:
+
+    unrealized   = qty * mark - cost
+    daily_pnl    = realized_today + unrealized - unrealized_at_open
+    daily_profit = daily_pnl / (value_at_open + bought_today)
+
+daily_profit is the fraction notifications_manager reads. Only users whose
+daily_profit or unrealized PnL moved by more than PNL_PROFIT_EPSILON /
+PNL_USD_EPSILON (or who had a fill) are written back, as multi-path updates
+of up to PNL_WRITE_BATCH paths. Days roll over at UTC midnight. Marks come
+from the risk engine, which refreshes them once per strategy loop cycle.
+"""
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+from firebase_admin import db
+
+from metrics import Counter, Histogram, firebase_call
+from risk_engine import engine as risk
+from user_queries import project
+
+logger = logging.getLogger(__name__)
+
+PNL_PROFIT_EPSILON = float(os.getenv("PNL_PROFIT_EPSILON", 0.0001))
+PNL_USD_EPSILON = float(os.getenv("PNL_USD_EPSILON", 0.01))
+PNL_WRITE_BATCH = int(os.getenv("PNL_WRITE_BATCH", 1000))
+TICK_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+PNL_TICK_SECONDS = Histogram("pnl_tick_seconds", "Time to revalue every user on a tick", buckets=TICK_BUCKETS)
+PNL_WRITES = Counter("pnl_user_writes_total", "Users whose PnL was written back")
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+
+class PnLEngine:
+    def __init__(self, assets, capacity=1024):
+        self.assets = tuple(assets)
+        self._asset_index = {a: i for i, a in enumerate(self.assets)}
+        self.user_ids = []
+        self._rows = {}
+        self.day = _today()
+        self.loaded = False
+        self._lock = threading.Lock()
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = getattr(self, "qty", None)
+        n = len(old) if old is not None else 0
+        shapes = {
+            "qty": (capacity, len(self.assets)), "cost": (capacity, len(self.assets)),
+            "realized": capacity, "realized_today": capacity, "bought_today": capacity,
+            "value_open": capacity, "unrealized_open": capacity,
+            "written_profit": capacity, "written_unrealized": capacity,
+        }
+        for name, shape in shapes.items():
+            array = np.zeros(shape)
+            if old is not None:
+                array[:n] = getattr(self, name)[:n]
+            setattr(self, name, array)
+        for name in ("dirty", "reopen"):
+            flags = np.zeros(capacity, dtype=bool)
+            if old is not None:
+                flags[:n] = getattr(self, name)[:n]
+            setattr(self, name, flags)
+
+    def _row(self, user_id) -> int:
+        row = self._rows.get(user_id)
+        if row is None:
+            row = self._rows[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            if row == len(self.qty):
+                self._allocate(2 * len(self.qty))
+        return row
+
+    # === Loading ===
+    def load(self, users: dict):
+        """Seed positions and today's state from users/{id}/pnl, once at startup."""
+        with self._lock:
+            for user_id, data in users.items():
+                pnl = (data or {}).get("pnl") if isinstance(data, dict) else None
+                if not pnl:
+                    continue
+                row = self._row(user_id)
+                for asset, position in (pnl.get("positions") or {}).items():
+                    a = self._asset_index.get(asset)
+                    if a is not None:
+                        self.qty[row, a] = position.get("qty", 0)
+                        self.cost[row, a] = position.get("cost", 0)
+                self.realized[row] = pnl.get("realized", 0)
+                if pnl.get("day") == self.day:
+                    self.realized_today[row] = pnl.get("realized_today", 0)
+                    self.bought_today[row] = pnl.get("bought_today", 0)
+                    self.value_open[row] = pnl.get("value_open", 0)
+                    self.unrealized_open[row] = pnl.get("unrealized_open", 0)
+                else:
+                    self.reopen[row] = True  # Saved on an earlier day: reopen at the first tick's marks
+            self.loaded = True
+
+    # === Fills ===
+    def record_fill(self, user_id, asset, qty, quote_usd, fee_usd=0.0):
+        """
+        +qty for buys, -qty for sells; quote_usd is the fill's total USD value.
+        Returns (realized PnL or None for a buy, quantity held afterwards).
+        """
+        a = self._asset_index.get(asset)
+        if a is None or not qty:
+            return None, None
+        with self._lock:
+            row = self._row(user_id)
+            held, cost = self.qty[row, a], self.cost[row, a]
+            pnl = None
+            if qty > 0:
+                self.qty[row, a] = held + qty
+                self.cost[row, a] = cost + quote_usd + fee_usd
+                self.bought_today[row] += quote_usd
+            else:
+                sold = min(-qty, held) if held > 0 else 0.0
+                basis = cost * sold / held if held > 0 else 0.0
+                pnl = quote_usd * (sold / -qty) - basis - fee_usd
+                self.qty[row, a] = held - sold
+                self.cost[row, a] = cost - basis
+                self.realized[row] += pnl
+                self.realized_today[row] += pnl
+            self.dirty[row] = True
+            return (float(pnl) if pnl is not None else None), float(self.qty[row, a])
+
+    # === Ticks ===
+    def _roll_day(self, value, unrealized, n):
+        self.day = _today()
+        self.realized_today[:n] = 0
+        self.bought_today[:n] = 0
+        self.value_open[:n] = value
+        self.unrealized_open[:n] = unrealized
+        self.dirty[:n] = True
+
+    def revalue(self, marks):
+        """Recompute PnL for every user; returns the rows to write and their values."""
+        with self._lock:
+            n = len(self.user_ids)
+            marks = np.asarray(marks, dtype=np.float64)
+            unmarked = np.isnan(marks)
+            # Assets without a mark yet are carried at cost rather than at zero
+            # Row sums as mat-vec products: sum(axis=1) is several times slower on narrow arrays
+            value = self.qty[:n] @ np.where(unmarked, 0.0, marks) + self.cost[:n] @ unmarked
+            unrealized = value - self.cost[:n] @ np.ones(len(marks))
+            if _today() != self.day:
+                self._roll_day(value, unrealized, n)
+            elif self.reopen[:n].any():
+                reopen = np.flatnonzero(self.reopen[:n])
+                self.value_open[reopen] = value[reopen]
+                self.unrealized_open[reopen] = unrealized[reopen]
+                self.dirty[reopen] = True
+            self.reopen[:n] = False
+            daily = self.realized_today[:n] + unrealized - self.unrealized_open[:n]
+            base = self.value_open[:n] + self.bought_today[:n]
+            profit = np.divide(daily, base, out=np.zeros(n), where=base > 0)
+
+            changed = (self.dirty[:n]
+                       | (np.abs(profit - self.written_profit[:n]) >= PNL_PROFIT_EPSILON)
+                       | (np.abs(unrealized - self.written_unrealized[:n]) >= PNL_USD_EPSILON))
+            rows = np.flatnonzero(changed)
+            positions = rows[self.dirty[rows]]
+            self.written_profit[rows] = profit[rows]
+            self.written_unrealized[rows] = unrealized[rows]
+            self.dirty[:n] = False
+            return rows, positions, profit, unrealized, daily
+
+    def updates(self, rows, positions, profit, unrealized, daily) -> dict:
+        """Multi-path update for users/ covering only the changed rows."""
+        updates = {}
+        for row, p, u, d, realized_today in zip(rows.tolist(), profit[rows].tolist(), unrealized[rows].tolist(),
+                                                daily[rows].tolist(), self.realized_today[rows].tolist()):
+            uid = self.user_ids[row]
+            updates[f"{uid}/daily_profit"] = round(p, 6)
+            updates[f"{uid}/pnl/unrealized"] = round(u, 2)
+            updates[f"{uid}/pnl/daily"] = round(d, 2)
+            updates[f"{uid}/pnl/realized_today"] = round(realized_today, 2)
+        for row in positions.tolist():
+            uid = self.user_ids[row]
+            updates[f"{uid}/pnl/day"] = self.day
+            updates[f"{uid}/pnl/realized"] = round(float(self.realized[row]), 2)
+            updates[f"{uid}/pnl/bought_today"] = round(float(self.bought_today[row]), 2)
+            updates[f"{uid}/pnl/value_open"] = round(float(self.value_open[row]), 2)
+            updates[f"{uid}/pnl/unrealized_open"] = round(float(self.unrealized_open[row]), 2)
+            updates[f"{uid}/pnl/positions"] = {
+                asset: {"qty": float(self.qty[row, a]), "cost": round(float(self.cost[row, a]), 2)}
+                for a, asset in enumerate(self.assets) if self.qty[row, a]
+            }
+        return updates
+
+
+engine = PnLEngine(risk.assets)
+
+
+def write_updates(updates: dict) -> int:
+    items = list(updates.items())
+    for i in range(0, len(items), PNL_WRITE_BATCH):
+        with firebase_call("write", "users"):
+            db.reference("users").update(dict(items[i:i + PNL_WRITE_BATCH]))
+    return len(items)
+
+
+def tick(users=None):
+    """Revalue every user at the risk engine's marks and write back what changed."""
+    if not engine.loaded:
+        # Seed from users/{id}/pnl only, not whole users
+        engine.load(users if users is not None else project(("pnl",)))
+    start = time.perf_counter()
+    rows, positions, profit, unrealized, daily = engine.revalue(risk.marks)
+    PNL_TICK_SECONDS.observe(time.perf_counter() - start)
+    if not len(rows):
+        return 0
+    try:
+        write_updates(engine.updates(rows, positions, profit, unrealized, daily))
+        PNL_WRITES.inc(amount=len(rows))
+    except Exception as e:
+        logger.error(f"PnL write-back failed for {len(rows)} users: {e}")
+        with engine._lock:
+            engine.dirty[rows] = True  # Retry on the next tick
+    return len(rows)
+
+
+def record_fill(user, asset, qty, quote_qty, quote="USDT"):
+    """Record a fill with its quote amount (ZAR converted at the cached rate); returns engine.record_fill's result."""
+    try:
+        quote_usd = float(quote_qty)
+        if quote == "ZAR":
+            from fx_rates import StaleRateError, get_zar_usdt_rate
+            try:
+                quote_usd /= get_zar_usdt_rate()
+            except StaleRateError:
+                quote_usd = abs(qty) * (risk.mark(asset) or 0)
+        return engine.record_fill(user["user_id"], asset, qty, quote_usd)
+    except Exception as e:
+        logger.error(f"PnL engine failed to record fill for {user.get('user_id')}: {e}")
+        return None, None
@@ -0,0 +1,159 @@
+"""
+Balances across every exchange a user has keys for, valued in USDT and ZAR.
+
+Luno and Binance are queried concurrently, so a /balance reply takes about
+as long as the slower exchange rather than both added together. Each asset
+is valued from the shared market data cache (Binance {ASSET}USDT tickers,
+stablecoins at 1) and converted to ZAR at the cached FX rate. Results are
+kept per user for BALANCE_CACHE_TTL seconds, so repeated /balance calls do
+not hit the exchanges again; expired entries are dropped whenever a new
+result is stored. An exchange whose fetch failed is listed under
+"errors" rather than shown as empty, and such results are not cached.
+
+    portfolio = await get_portfolio(user_id)
+    portfolio["exchanges"]["luno"]["BTC"]   # {"amount", "usdt", "zar"}
+    portfolio["total_usdt"], portfolio["total_zar"]
+    portfolio["errors"]                    # {exchange: message} for failed fetches
+"""
+import asyncio
+import logging
+import os
+import time
+
+from exchange_info import CANONICAL_ASSETS
+from metrics import cache_hit
+
+logger = logging.getLogger(__name__)
+
+BALANCE_CACHE_TTL = float(os.getenv("BALANCE_CACHE_TTL", 20))
+EXCHANGES = ("luno", "binance")
+USD_STABLECOINS = ("USDT", "USDC", "BUSD", "FDUSD")
+# Per-exchange keys, plus the single-exchange fields the old /register wrote
+# (read by exchanges.fetch_balance as a fallback)
+LEGACY_KEY_FIELDS = ("exchange", "api_key", "api_secret", "secret")
+LEGACY_SECRET_FIELD = {"luno": "secret", "binance": "api_secret"}
+KEY_FIELDS = tuple(f"{e}_api_{part}" for e in EXCHANGES for part in ("key", "secret")) + LEGACY_KEY_FIELDS
+
+_cache = {}  # user_id -> (fetched_at, portfolio)
+
+
+def _has_keys(user, exchange) -> bool:
+    if user.get(f"{exchange}_api_key") and user.get(f"{exchange}_api_secret"):
+        return True
+    # Legacy keys belong to the exchange the user registered with
+    return bool(user.get("exchange") == exchange and user.get("api_key")
+                and user.get(LEGACY_SECRET_FIELD[exchange]))
+
+
+def _prune(now):
+    """Drop expired entries so the cache holds recent /balance users only."""
+    for user_id in [u for u, (fetched_at, _) in _cache.items() if now - fetched_at >= BALANCE_CACHE_TTL]:
+        del _cache[user_id]
+
+
+def _usdt_price(asset):
+    """USDT per unit of asset from the shared ticker cache (None when there is no USDT market)."""
+    if asset in USD_STABLECOINS:
+        return 1.0
+    from market_data import get_ticker
+    return get_ticker("binance", f"{asset}USDT")
+
+
+def _zar_rate():
+    from fx_rates import StaleRateError, get_zar_usdt_rate
+    try:
+        return get_zar_usdt_rate()
+    except StaleRateError as e:
+        logger.warning(f"Balances valued without ZAR: {e}")
+        return None
+
+
+async def _value(balances: dict) -> dict:
+    """{exchange: {asset: {"amount", "usdt", "zar"}}} plus totals, pricing every asset concurrently."""
+    assets = sorted({CANONICAL_ASSETS.get(a.upper(), a.upper()) for b in balances.values() for a in b} - {"ZAR"})
+    prices, zar = await asyncio.gather(
+        asyncio.gather(*(asyncio.to_thread(_usdt_price, a) for a in assets)),
+        asyncio.to_thread(_zar_rate),
+    )
+    usdt = dict(zip(assets, prices))
+    portfolio = {"exchanges": {}, "total_usdt": 0.0, "total_zar": 0.0 if zar else None,
+                 "zar_per_usdt": zar, "unpriced": []}
+    for exchange, held in balances.items():
+        rows = portfolio["exchanges"][exchange] = {}
+        for raw_asset, amount in held.items():
+            asset = CANONICAL_ASSETS.get(raw_asset.upper(), raw_asset.upper())
+            if asset == "ZAR":
+                value = amount / zar if zar else None
+            else:
+                value = amount * usdt[asset] if usdt.get(asset) else None
+            rows[asset] = {"amount": amount, "usdt": value, "zar": value * zar if value is not None and zar else None}
+            if value is None:
+                portfolio["unpriced"].append(asset)
+                continue
+            portfolio["total_usdt"] += value
+            if zar:
+                portfolio["total_zar"] += value * zar
+    return portfolio
+
+
+async def get_portfolio(user_id: str, user: dict = None, refresh: bool = False) -> dict:
+    """
+    Valued balances on every exchange the user has keys for, cached per user
+    for BALANCE_CACHE_TTL. None when the user has no exchange keys.
+    """
+    cached = _cache.get(user_id)
+    hit = bool(cached and not refresh and time.monotonic() - cached[0] < BALANCE_CACHE_TTL)
+    cache_hit("balance", hit)
+    if hit:
+        return cached[1]
+
+    from exchanges import fetch_balance
+    if user is None:
+        # Just the key fields, not the whole user node
+        from user_queries import project
+        user = (await asyncio.to_thread(project, KEY_FIELDS, [user_id]))[user_id]
+    exchanges = [e for e in EXCHANGES if _has_keys(user, e)]
+    if not exchanges:
+        return None
+    # Both exchanges at once; fetch_balance decrypts the stored keys itself
+    results = await asyncio.gather(*(asyncio.to_thread(fetch_balance, user_id, e, user) for e in exchanges),
+                                   return_exceptions=True)
+    balances, errors = {}, {}
+    for exchange, result in zip(exchanges, results):
+        if isinstance(result, Exception):
+            logger.warning(f"{exchange} balance fetch failed for {user_id}: {result}")
+            errors[exchange] = str(result)
+        else:
+            balances[exchange] = result
+    portfolio = await _value(balances)
+    portfolio["errors"] = errors
+    portfolio["fetched_at"] = time.time()
+    now = time.monotonic()
+    _prune(now)
+    if not errors:
+        # A failed fetch is retried on the next call, not served from cache
+        _cache[user_id] = (now, portfolio)
+    return portfolio
+
+
+def format_portfolio(portfolio: dict) -> str:
+    """Telegram Markdown summary of get_portfolio()'s result."""
+    errors = portfolio.get("errors") or {}
+    if errors and not portfolio["exchanges"]:
+        return "❌ Could not fetch your balance."
+    failed = [f"⚠️ Could not fetch your {exchange.capitalize()} balance." for exchange in errors]
+    if not any(portfolio["exchanges"].values()):
+        return "\n".join(failed) or "ℹ️ You have no assets with a positive balance."
+    lines = failed + ([""] if failed else [])
+    for exchange, rows in portfolio["exchanges"].items():
+        if not rows:
+            continue
+        lines.append(f"📊 *{exchange.capitalize()}*")
+        for asset, row in sorted(rows.items(), key=lambda kv: -(kv[1]["usdt"] or 0)):
+            value = f" ≈ ${row['usdt']:,.2f}" if row["usdt"] is not None else ""
+            value += f" / R{row['zar']:,.2f}" if row["zar"] is not None else ""
+            lines.append(f"• `{asset}`: *{row['amount']:.6f}*{value}")
+    total = f"\n💰 *Total:* ${portfolio['total_usdt']:,.2f}"
+    if portfolio["total_zar"] is not None:
+        total += f" / R{portfolio['total_zar']:,.2f}"
+    return "\n".join(lines) + total
@@ -1,7 +1,7 @@
 import base64
-import requests
+from circuit_breaker import http_get, retry_read
+from tracing import span
 from firebase_admin import db
-from binance.client import Client as BinanceClient
 from cryptography.fernet import Fernet
 import os
 
@@ -13,7 +13,8 @@ fernet = Fernet(SECRET_KEY.encode())
 
 def decrypt_api_key(encrypted_key: str) -> str:
     """Decrypt encrypted API keys stored in Firebase."""
-    return fernet.decrypt(encrypted_key.encode()).decode()
+    with span("fernet.decrypt"):
+        return fernet.decrypt(encrypted_key.encode()).decode()
 
 # === Binance ===
 def get_binance_client(user_id, user=None):
@@ -28,12 +29,13 @@ def get_binance_client(user_id, user=None):
 
     api_key = decrypt_api_key(encrypted_key)
     api_secret = decrypt_api_key(encrypted_secret)
+    from binance.client import Client as BinanceClient  # deferred: heavy import
     return BinanceClient(api_key, api_secret)
 
 def get_binance_price(user_id, symbol="BTCUSDT"):
     try:
         client = get_binance_client(user_id)
-        ticker = client.get_symbol_ticker(symbol=symbol)
+        ticker = retry_read("binance", "ticker", lambda: client.get_symbol_ticker(symbol=symbol), hedge=True)
         return float(ticker["price"])
     except Exception as e:
         print(f"[Binance] Error fetching price for {symbol}: {e}")
@@ -61,8 +63,7 @@ def get_luno_price(user_id, pair="XBTZAR"):
     try:
         headers = get_luno_auth_header(user_id=user_id)
         url = f"https://api.luno.com/api/1/ticker?pair={pair}"
-        r = requests.get(url, headers=headers, timeout=10)
-        r.raise_for_status()
+        r = http_get("luno", "ticker", url, headers=headers, hedge=True)
         return float(r.json()["last_trade"])
     except Exception as e:
         print(f"[Luno] Error fetching price for {pair}: {e}")
@@ -0,0 +1,272 @@
+"""
+Fleet-wide exposure across every user the bot trades for.
+
+Positions (base quantity per user per asset, in RISK_ASSETS order) live in
+one contiguous (users x assets) float64 array, with each user's strategy in a
+parallel int32 array. Fills update a user's row and the running aggregates
+in O(assets). Each tick replaces the USD marks and recomputes everything
+from the arrays in one vectorized pass: gross and net notional per asset,
+gross per user and per strategy, and how concentrated the fleet is in its
+largest users.
+
+    check_order(user, "BTC", 0.01)    # raises RiskLimitError past a fleet cap
+    record_fill(user, "BTC", 0.01)    # +buy / -sell, in base units
+
+check_order only blocks orders that add exposure; reducing a position is
+always allowed. Caps are in USD and 0 disables a cap. While any cap is set
+the checks fail closed: an order that adds exposure is rejected when its
+asset has no mark from the last RISK_MARK_MAX_AGE seconds (after one
+synchronous refresh) or its size can't be valued. Positions are those
+filled since the process started.
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+
+from circuit_breaker import http_get
+from exchange_info import split_pair
+from metrics import Counter, register_gauge
+
+logger = logging.getLogger(__name__)
+
+RISK_ASSETS = tuple(a.strip().upper() for a in os.getenv("RISK_ASSETS", "BTC,ETH").split(",") if a.strip())
+RISK_MAX_GROSS_USD = float(os.getenv("RISK_MAX_GROSS_USD", 0))
+RISK_MAX_ASSET_USD = float(os.getenv("RISK_MAX_ASSET_USD", 0))
+RISK_MAX_STRATEGY_USD = float(os.getenv("RISK_MAX_STRATEGY_USD", 0))
+RISK_MAX_USER_USD = float(os.getenv("RISK_MAX_USER_USD", 0))
+RISK_MARK_TTL = float(os.getenv("RISK_MARK_TTL", 5))
+RISK_MARK_MAX_AGE = float(os.getenv("RISK_MARK_MAX_AGE", 60))
+CAPS_ENABLED = any((RISK_MAX_GROSS_USD, RISK_MAX_ASSET_USD, RISK_MAX_STRATEGY_USD, RISK_MAX_USER_USD))
+
+RISK_REJECTIONS = Counter("risk_rejections_total", "Orders blocked by a fleet exposure cap", ("limit",))
+
+
+class RiskLimitError(Exception):
+    def __init__(self, limit, message):
+        super().__init__(message)
+        self.limit = limit
+
+
+class RiskEngine:
+    def __init__(self, assets=RISK_ASSETS, capacity=1024):
+        self.assets = tuple(assets)
+        self._asset_index = {a: i for i, a in enumerate(self.assets)}
+        self.positions = np.zeros((capacity, len(self.assets)))
+        self.strategy_of = np.zeros(capacity, dtype=np.int32)
+        self.marks = np.full(len(self.assets), np.nan)
+        self.mark_times = np.zeros(len(self.assets))  # per asset: a tick can miss a price
+        self.marked_at = None
+        self.user_ids = []
+        self._rows = {}
+        self.strategies = []
+        self._strategy_index = {}
+        self._lock = threading.Lock()
+        self._recompute()
+
+    # === Rows ===
+    def _strategy(self, name) -> int:
+        name = name or "none"
+        index = self._strategy_index.get(name)
+        if index is None:
+            index = self._strategy_index[name] = len(self.strategies)
+            self.strategies.append(name)
+            self.strategy_gross = np.append(self.strategy_gross, 0.0)
+        return index
+
+    def _row(self, user_id, strategy) -> int:
+        row = self._rows.get(user_id)
+        if row is None:
+            row = self._rows[user_id] = len(self.user_ids)
+            self.user_ids.append(user_id)
+            if row == len(self.positions):
+                # Grow geometrically so rows stay in one contiguous block
+                self.positions = np.concatenate([self.positions, np.zeros_like(self.positions)])
+                self.strategy_of = np.concatenate([self.strategy_of, np.zeros_like(self.strategy_of)])
+                self.user_gross = np.concatenate([self.user_gross, np.zeros_like(self.user_gross)])
+            self.strategy_of[row] = self._strategy(strategy)
+        elif strategy is not None:
+            index = self._strategy(strategy)
+            if index != self.strategy_of[row]:
+                # User switched strategy: their exposure moves with them
+                self.strategy_gross[self.strategy_of[row]] -= self.user_gross[row]
+                self.strategy_gross[index] += self.user_gross[row]
+                self.strategy_of[row] = index
+        return row
+
+    # === Fills and Checks ===
+    def _delta(self, row, asset, qty):
+        """(change in gross USD, change in net USD) if `qty` of `asset` filled for this row now."""
+        a = self._asset_index[asset]
+        mark = self.marks[a]
+        if np.isnan(mark):
+            return 0.0, 0.0
+        old = self.positions[row, a] if row is not None else 0.0
+        return (abs(old + qty) - abs(old)) * mark, qty * mark
+
+    def record_fill(self, user_id, strategy, asset, qty):
+        if asset not in self._asset_index or not qty:
+            return
+        with self._lock:
+            row = self._row(user_id, strategy)
+            a = self._asset_index[asset]
+            # d_gross is this row's change in |position| * mark for the asset, so it is
+            # also the change in the asset's gross
+            d_gross, d_net = self._delta(row, asset, qty)
+            self.positions[row, a] += qty
+            self.user_gross[row] += d_gross
+            self.strategy_gross[self.strategy_of[row]] += d_gross
+            self.asset_net[a] += d_net
+            self.asset_gross[a] += d_gross
+            self.gross += d_gross
+
+    def check_order(self, user_id, strategy, asset, qty):
+        """Raise RiskLimitError if filling `qty` would breach a fleet cap, or can't be valued to check."""
+        if not CAPS_ENABLED or asset not in self._asset_index or not qty:
+            return
+        with self._lock:
+            row = self._rows.get(user_id)
+            a = self._asset_index[asset]
+            old = self.positions[row, a] if row is not None else 0.0
+            if abs(old + qty) <= abs(old):
+                return
+            if np.isnan(self.marks[a]) or time.time() - self.mark_times[a] > RISK_MARK_MAX_AGE:
+                RISK_REJECTIONS.inc("marks")
+                raise RiskLimitError("marks", f"no {asset} mark from the last {RISK_MARK_MAX_AGE:.0f}s "
+                                              f"to check exposure against")
+            d_gross, d_net = self._delta(row, asset, qty)
+            user_gross = self.user_gross[row] if row is not None else 0.0
+            s = self._strategy_index.get(strategy or "none")
+            strategy_gross = self.strategy_gross[s] if s is not None else 0.0
+            for limit, cap, after in (
+                ("gross", RISK_MAX_GROSS_USD, self.gross + d_gross),
+                ("asset", RISK_MAX_ASSET_USD, abs(self.asset_net[a] + d_net)),
+                ("strategy", RISK_MAX_STRATEGY_USD, strategy_gross + d_gross),
+                ("user", RISK_MAX_USER_USD, user_gross + d_gross),
+            ):
+                if cap and after > cap:
+                    RISK_REJECTIONS.inc(limit)
+                    raise RiskLimitError(limit, f"{limit} exposure would reach ${after:,.0f} (cap ${cap:,.0f})")
+
+    # === Ticks ===
+    def _recompute(self):
+        n = len(self.user_ids)
+        notional = self.positions[:n] * np.nan_to_num(self.marks)
+        absolute = np.abs(notional)
+        self.user_gross = np.zeros(len(self.positions))
+        self.user_gross[:n] = absolute.sum(axis=1)
+        self.asset_net = notional.sum(axis=0)
+        self.asset_gross = absolute.sum(axis=0)
+        self.gross = float(self.user_gross[:n].sum())
+        self.strategy_gross = np.bincount(self.strategy_of[:n], weights=self.user_gross[:n],
+                                          minlength=len(self.strategies)).astype(np.float64)
+
+    def tick(self, marks: dict):
+        """New USD marks {asset: price}; recompute every aggregate from the position arrays."""
+        with self._lock:
+            now = time.time()
+            for asset, price in marks.items():
+                if asset in self._asset_index and price:
+                    self.marks[self._asset_index[asset]] = price
+                    self.mark_times[self._asset_index[asset]] = now
+            self.marked_at = now
+            self._recompute()
+
+    def mark(self, asset):
+        a = self._asset_index.get(asset)
+        return None if a is None or np.isnan(self.marks[a]) else float(self.marks[a])
+
+    def snapshot(self, top=10) -> dict:
+        with self._lock:
+            n = len(self.user_ids)
+            gross_by_user = self.user_gross[:n]
+            shares = gross_by_user / self.gross if self.gross else np.zeros(n)
+            largest = np.argsort(gross_by_user)[::-1][:top]
+            return {
+                "marked_at": self.marked_at,
+                "users": n,
+                "gross_usd": round(self.gross, 2),
+                "assets": {
+                    asset: {"mark": self.mark(asset), "net_usd": round(float(self.asset_net[i]), 2),
+                            "gross_usd": round(float(self.asset_gross[i]), 2),
+                            "quantity": round(float(self.positions[:n, i].sum()), 8)}
+                    for i, asset in enumerate(self.assets)
+                },
+                "strategies": {name: round(float(self.strategy_gross[i]), 2) for i, name in enumerate(self.strategies)},
+                "concentration": {
+                    "largest_user_share": round(float(shares.max()), 4) if n else 0.0,
+                    "herfindahl": round(float((shares ** 2).sum()), 4),
+                },
+                "top_users": [{"user_id": self.user_ids[i], "gross_usd": round(float(gross_by_user[i]), 2),
+                               "strategy": self.strategies[self.strategy_of[i]]}
+                              for i in largest if gross_by_user[i] > 0],
+                "caps": {"gross": RISK_MAX_GROSS_USD, "asset": RISK_MAX_ASSET_USD,
+                         "strategy": RISK_MAX_STRATEGY_USD, "user": RISK_MAX_USER_USD},
+            }
+
+
+engine = RiskEngine()
+register_gauge("risk_fleet_gross_usd", "Gross USD exposure across all users", lambda: engine.gross)
+
+
+# === Marks ===
+def fetch_marks() -> dict:
+    """USD marks for RISK_ASSETS from Binance USDT pairs, in one request."""
+    symbols = [f"{a}USDT" for a in engine.assets if a not in ("USDT", "USD")]
+    r = http_get("binance", "ticker_price", "https://api.binance.com/api/v3/ticker/price",
+                 params={"symbols": "[" + ",".join(f'"{s}"' for s in symbols) + "]"}, hedge=True)
+    return {split_pair(t["symbol"])[0]: float(t["price"]) for t in r.json()}
+
+
+def tick():
+    """Refresh marks when they are older than RISK_MARK_TTL and recompute fleet exposure."""
+    if engine.marked_at and time.time() - engine.marked_at < RISK_MARK_TTL:
+        return
+    try:
+        engine.tick(fetch_marks())
+    except Exception as e:
+        logger.warning(f"Risk marks refresh failed: {e}")
+
+
+# === Order Hooks ===
+def base_quantity(asset, quote_qty, quote="USDT"):
+    """Approximate base size of a quote-sized order at the current mark (None if unknown)."""
+    if CAPS_ENABLED:
+        tick()
+    mark = engine.mark(asset)
+    if not mark or quote_qty is None:
+        return None
+    if quote == "ZAR":
+        from fx_rates import StaleRateError, get_zar_usdt_rate
+        try:
+            mark *= get_zar_usdt_rate()
+        except StaleRateError:
+            return None
+    return float(quote_qty) / mark
+
+
+def check_order(user, asset, qty):
+    """
+    Signed base `qty` (+buy/-sell) against the fleet caps. None means the size
+    couldn't be valued (see base_quantity), which is rejected while a cap is set.
+    """
+    if not CAPS_ENABLED or asset not in engine.assets:
+        return
+    if qty is None:
+        RISK_REJECTIONS.inc("marks")
+        raise RiskLimitError("marks", f"{asset} order size unknown: no fresh mark or FX rate to value it")
+    tick()  # synchronous refresh if the marks are older than RISK_MARK_TTL
+    engine.check_order(user["user_id"], user.get("strategy"), asset, qty)
+
+
+def record_fill(user, asset, qty):
+    try:
+        engine.record_fill(user["user_id"], user.get("strategy"), asset, qty)
+    except Exception as e:
+        logger.error(f"Risk engine failed to record fill for {user.get('user_id')}: {e}")
+
+
+def get_risk_snapshot(top=10) -> dict:
+    return engine.snapshot(top)
@@ -0,0 +1,134 @@
+"""
+Startup helpers: deferred imports for heavy modules and an import-time report.
+
+STARTUP_MODE=lazy (default) keeps command handlers, strategies, pandas and
+python-binance out of the import path until first use. STARTUP_MODE=eager
+preloads everything during app startup, which suits long-lived workers that
+would rather pay the cost before the first request.
+
+Profile the import path with:
+    python startup.py main --budget-ms 1500
+"""
+import argparse
+import os
+import subprocess
+import sys
+from importlib import import_module
+
+STARTUP_MODE = os.getenv("STARTUP_MODE", "lazy").lower()
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", 1500))
+
+# Modules that are deferred in lazy mode and preloaded in eager mode
+HEAVY_MODULES = [
+    "pandas",
+    "numpy",
+    "binance.client",
+    "strategy_loop",
+    "price_feed",
+    "database",
+    "arbitrage_scanner",
+    "risk_engine",
+]
+
+# === Deferred Imports ===
+def lazy_attr(module_name: str, attr: str):
+    """Return a callable that imports module_name.attr on first call."""
+    target = None
+
+    def _resolve():
+        nonlocal target
+        if target is None:
+            target = getattr(import_module(module_name), attr)
+        return target
+
+    def _call(*args, **kwargs):
+        return _resolve()(*args, **kwargs)
+
+    _call.__name__ = attr
+    _call.resolve = _resolve
+    return _call
+
+
+def lazy_handler(module_name: str, attr: str):
+    """Async Telegram handler that imports the real handler on first update."""
+    resolve = lazy_attr(module_name, attr).resolve
+
+    async def _handler(update, context):
+        return await resolve()(update, context)
+
+    _handler.__name__ = attr
+    _handler.resolve = resolve
+    return _handler
+
+
+def preload(handlers=()):
+    """Import every deferred module now (used when STARTUP_MODE=eager)."""
+    for name in HEAVY_MODULES:
+        try:
+            import_module(name)
+        except ImportError as e:
+            print(f"[startup] Could not preload {name}: {e}")
+    for handler in handlers:
+        resolve = getattr(handler, "resolve", None)
+        if resolve:
+            resolve()
+
+# === Import-Time Profiling ===
+def profile_imports(module: str = "main", python: str = sys.executable) -> list:
+    """
+    Import `module` in a fresh interpreter with -X importtime and return
+    [(top_level_package, self_ms, cumulative_ms)] sorted by cumulative cost.
+    """
+    proc = subprocess.run(
+        [python, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    # importtime lists modules in completion order; the children of a
+    # top-level import are the deeper lines right before it. Keep only the
+    # tree under `module` so interpreter startup (site, encodings) is ignored.
+    pending, tree = [], []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name[1:]
+        depth = (len(name) - len(name.lstrip())) // 2
+        pending.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+        if depth == 0:
+            if name.strip() == module:
+                tree = pending
+            pending = []
+
+    root = module.split(".")[0]
+    totals = {}
+    for depth, name, self_us, cumulative_us in tree:
+        package = name.split(".")[0]
+        entry = totals.setdefault(package, [0, 0])
+        entry[0] += self_us
+        if depth == 0 or (depth == 1 and package != root):
+            # Cumulative cost is counted where the entry module pulled it in
+            entry[1] += cumulative_us
+    if proc.returncode != 0:
+        print(proc.stderr.strip().splitlines()[-1] if proc.stderr else "import failed", file=sys.stderr)
+    report = [(pkg, s / 1000, c / 1000) for pkg, (s, c) in totals.items()]
+    return sorted(report, key=lambda r: r[2], reverse=True)
+
+
+def print_report(report: list, budget_ms: float, top: int = 25) -> bool:
+    total_ms = sum(self_ms for _, self_ms, _ in report)
+    print(f"{'module':<32}{'self ms':>10}{'cumulative ms':>16}")
+    for pkg, self_ms, cumulative_ms in report[:top]:
+        print(f"{pkg:<32}{self_ms:>10.1f}{cumulative_ms:>16.1f}")
+    within = total_ms <= budget_ms
+    print(f"\nTotal import time: {total_ms:.1f} ms (budget {budget_ms:.0f} ms) — {'OK' if within else 'OVER BUDGET'}")
+    return within
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-module import cost report")
+    parser.add_argument("module", nargs="?", default="main")
+    parser.add_argument("--budget-ms", type=float, default=STARTUP_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+    ok = print_report(profile_imports(args.module), args.budget_ms, args.top)
+    sys.exit(0 if ok else 1)
@@ -1 +1,7 @@
-
+from .registry import (
+    get_strategy,
+    strategy_names,
+    all_strategies,
+    data_requirements,
+    load_strategies,
+)
@@ -1,73 +1,106 @@
 from firebase_admin import db
-from trading_api import (
-    get_binance_price,
-    get_luno_price,
-    trade_on_binance,
-    trade_on_luno,
-    get_user_balance
+from metrics import firebase_call
+from fx_rates import get_zar_usdt_rate, StaleRateError
+from order_book import refresh_book
+from arbitrage_execution import execute_two_legs
+
+NAME = "arbitrage"
+ALIASES = ()
+PARAMETERS = {"profit_target": 50, "arbitrage_size": 0.001}
+DATA_REQUIREMENTS = (
+    {"kind": "depth", "source": "binance", "symbol": "BTCUSDT"},
+    {"kind": "depth", "source": "luno", "symbol": "XBTZAR"},
+    {"kind": "depth", "source": "luno", "symbol": "USDTZAR"},  # FX rate
 )
 
+def get_balance(user, platform) -> float:
+    """Spendable balance on `platform` in ZAR (Binance USDT converted at the cached FX rate)."""
+    from exchanges import get_balance as get_exchange_balance  # deferred: needs SECRET_KEY
+    balances = get_exchange_balance(user["user_id"], platform, user=user) or {}
+    if platform == "binance":
+        return balances.get("USDT", 0.0) * get_zar_usdt_rate()
+    return balances.get("ZAR", 0.0)
+
 def execute(user):
     """
-    Arbitrage strategy that compares Binance and Luno prices,
-    and updates daily profit stats + trade result status in Firebase.
+    Arbitrage strategy that compares Binance and Luno prices walked through
+    the local order books for the trade size, and records the trade result
+    status in Firebase.
     """
-    symbol = "BTC/USDT"
     user_id = user["user_id"]
     platform = user.get("platform", "luno")
 
     # Settings with defaults
-    risk_tolerance = user.get("risk_tolerance", 0.02)  # 2%
     profit_target = user.get("profit_target", 50)      # Minimum profit threshold in ZAR
 
-    # Check user balance (assumes get_balance returns ZAR equivalent)
-    balance = get_balance(user, platform)
+    # Check user balance in ZAR
+    try:
+        balance = get_balance(user, platform)
+    except StaleRateError as e:
+        print(f"[{user_id}] Skipping arbitrage: {e}")
+        update_trade_result(user_id, "stale_fx")
+        return
     if balance < 100:
         print(f"[{user_id}] ✋ You need at least R100 to activate autobot. Chill and top up your wallet 😎")
-        update_trade_result(user_id, 0, "low_balance")
+        update_trade_result(user_id, "low_balance")
         return
 
     try:
-        binance_price = get_binance_price(user, symbol)
-        luno_price = get_luno_price(user, symbol)
+        size = user.get("arbitrage_size", 0.001)  # BTC
+        zar_usdt = get_zar_usdt_rate()
+        binance_book = refresh_book("binance", "BTCUSDT")
+        luno_book = refresh_book("luno", "XBTZAR")
+
+        if binance_book is None or luno_book is None:
+            print(f"[{user_id}] Error: Could not load one or both order books.")
+            update_trade_result(user_id, "error")
+            return
 
-        if not binance_price or not luno_price:
-            print(f"[{user_id}] Error: Could not fetch one or both prices.")
-            update_trade_result(user_id, 0, "error")
+        # Average fill prices for `size`, with Binance converted to ZAR
+        binance_ask = binance_book.average_fill_price("buy", size)
+        binance_bid = binance_book.average_fill_price("sell", size)
+        luno_ask = luno_book.average_fill_price("buy", size)
+        luno_bid = luno_book.average_fill_price("sell", size)
+
+        if None in (binance_ask, binance_bid, luno_ask, luno_bid):
+            print(f"[{user_id}] Not enough depth to fill {size} BTC on both books.")
+            update_trade_result(user_id, "no_depth")
             return
 
-        print(f"[{user_id}] Binance: {binance_price} | Luno: {luno_price}")
+        binance_ask, binance_bid = binance_ask * zar_usdt, binance_bid * zar_usdt
+        print(f"[{user_id}] Binance: {binance_ask:.2f}/{binance_bid:.2f} | Luno: {luno_ask:.2f}/{luno_bid:.2f} (ZAR, {size} BTC)")
 
-        price_diff = abs(binance_price - luno_price)
+        luno_to_binance = (binance_bid - luno_ask) * size
+        binance_to_luno = (luno_bid - binance_ask) * size
         trade_result = "none"
-        profit = 0
 
-        if binance_price > luno_price + profit_target:
+        if luno_to_binance >= profit_target:
             print(f"[{user_id}] Arbitrage Opportunity: Buy on Luno, Sell on Binance")
-            profit, trade_result = attempt_arbitrage_trade(
-                user, "luno", "binance", symbol, risk_tolerance, price_diff
-            )
+            trade_result = attempt_arbitrage_trade(user, "luno", "binance", size, luno_ask)
 
-        elif luno_price > binance_price + profit_target:
+        elif binance_to_luno >= profit_target:
             print(f"[{user_id}] Arbitrage Opportunity: Buy on Binance, Sell on Luno")
-            profit, trade_result = attempt_arbitrage_trade(
-                user, "binance", "luno", symbol, risk_tolerance, price_diff
-            )
+            trade_result = attempt_arbitrage_trade(user, "binance", "luno", size, binance_ask / zar_usdt)
 
         else:
-            print(f"[{user_id}] No arbitrage opportunity (Diff: {price_diff:.2f})")
+            print(f"[{user_id}] No arbitrage opportunity (Edge: R{max(luno_to_binance, binance_to_luno):.2f})")
+
+        update_trade_result(user_id, trade_result)
 
-        update_trade_result(user_id, profit, trade_result)
+    except StaleRateError as e:
+        print(f"[{user_id}] Skipping arbitrage: {e}")
+        update_trade_result(user_id, "stale_fx")
 
     except Exception as e:
         print(f"[{user_id}] Arbitrage strategy failed: {e}")
-        update_trade_result(user_id, 0, "error")
+        update_trade_result(user_id, "error")
 
 
-def attempt_arbitrage_trade(user, buy_exchange, sell_exchange, symbol, risk, profit_value):
+def attempt_arbitrage_trade(user, buy_exchange, sell_exchange, size, buy_price):
     """
     Helper function to execute buy and sell on specified exchanges.
-    Returns (profit, trade_result)
+    Both legs are sent concurrently; a single filled leg is unwound.
+    Returns the trade_result status.
     """
     user_id = user["user_id"]
     platform = user.get("platform", "luno")
@@ -75,35 +108,34 @@ def attempt_arbitrage_trade(user, buy_exchange, sell_exchange, symbol, risk, pro
     balance = get_balance(user, platform)
     if balance < 50:
         print(f"[{user_id}] Minimum trade amount is R50. Current balance: R{balance:.2f}. No trade executed 🌱")
-        return 0, "low_trade_balance"
+        return "low_trade_balance"
 
     try:
-        buy_func = trade_on_binance if buy_exchange == "binance" else trade_on_luno
-        sell_func = trade_on_binance if sell_exchange == "binance" else trade_on_luno
-
-        success_buy = buy_func(user, action="buy", symbol=symbol, risk_tolerance=risk)
-        success_sell = sell_func(user, action="sell", symbol=symbol, risk_tolerance=risk)
-
-        if success_buy and success_sell:
-            return round(profit_value, 2), "profit"
+        result = execute_two_legs(user, buy_exchange, sell_exchange, size, buy_price)
+        print(f"[{user_id}] Arbitrage {result['outcome']} (leg skew: {result['skew_ms']} ms)")
+
+        if result["outcome"] == "filled":
+            return "profit"
+        elif result["outcome"] == "unwound":
+            return "unwound"
+        elif result["outcome"] == "unknown":
+            # A leg may have filled; left for manual review rather than unwound
+            return "unknown"
         else:
-            return 0, "failed"
+            return "failed"
 
     except Exception as e:
         print(f"[{user_id}] Trade execution error: {e}")
-        return 0, "error"
+        return "error"
 
 
-def update_trade_result(user_id, profit, status):
+def update_trade_result(user_id, status):
     """
-    Update Firebase with profit and result of the trade.
+    Update Firebase with the trade result. Profit is tracked from actual fills
+    by pnl_engine, which owns daily_profit.
     """
     try:
-        user_ref = db.reference(f"/users/{user_id}")
-        current_profit = user_ref.child("daily_profit").get() or 0
-        user_ref.update({
-            "daily_profit": round(current_profit + profit, 2),
-            "last_trade_result": status
-        })
+        with firebase_call("write", "users"):
+            db.reference(f"/users/{user_id}").update({"last_trade_result": status})
     except Exception as e:
         print(f"[{user_id}] Error updating trade result: {e}")
@@ -1,5 +1,17 @@
 from firebase_admin import db
-from trading_api import get_price_history, trade_on_binance, get_user_balance
+from metrics import firebase_call
+from trading_api import trade_on_binance, get_user_balance
+from market_data import get_closes
+
+NAME = "mean_reverse"
+ALIASES = ("mean_reversion", "meanreversion")
+PARAMETERS = {"risk_tolerance": 0.02}
+DATA_REQUIREMENTS = (
+    {"kind": "klines", "source": "binance", "symbol": "BTCUSDT", "interval": "1m", "lookback": 10},
+)
+PARAMETER_SPACE = {
+    "risk_tolerance": (0.01, 0.02, 0.05, 0.1, 0.2, 0.5),
+}
 
 def execute(user):
     """
@@ -13,21 +25,20 @@ def execute(user):
     user_id = user["user_id"]
 
     risk = user.get("risk_tolerance", 0.02)
-    profit_target = user.get("profit_target", 50)
 
     try:
         # 💰 Check balance
         balance = get_user_balance(user)
         if balance is None or balance < 100:
             print(f"[{user_id}] Balance too low: R{balance}. You need R100+ to trade this strategy.")
-            update_trade_result(user_id, 0, "low_balance")
+            update_trade_result(user_id, "low_balance")
             return
 
         # 📈 Get price history
-        price_history = get_price_history(user, symbol, interval, lookback)
+        price_history = get_closes(symbol, interval, lookback)
         if not price_history or len(price_history) < lookback:
             print(f"[{user_id}] Not enough data for mean reversion strategy.")
-            update_trade_result(user_id, 0, "error")
+            update_trade_result(user_id, "error")
             return
 
         current_price = price_history[-1]
@@ -37,53 +48,61 @@ def execute(user):
         print(f"[{user_id}] Current: {current_price:.2f} | Mean: {mean_price:.2f} | Deviation: {deviation:.4f}")
 
         trade_result = "none"
-        profit = 0
 
         # 💡 Price ABOVE mean → SELL
         if deviation > 0.01:
             if balance * risk < 50:
                 print(f"[{user_id}] Not enough to sell with R50 minimum. Trade size: R{balance * risk:.2f}")
-                update_trade_result(user_id, 0, "min_trade_not_met")
+                update_trade_result(user_id, "min_trade_not_met")
                 return
 
             print(f"[{user_id}] Price above mean → SELL")
             success = trade_on_binance(user, action="sell", symbol=symbol, amount=risk)
             if success:
-                profit = profit_target
-                trade_result = "profit"
+                trade_result = "executed"
 
         # 📉 Price BELOW mean → BUY
         elif deviation < -0.01:
             if balance * risk < 50:
                 print(f"[{user_id}] Not enough to buy with R50 minimum. Trade size: R{balance * risk:.2f}")
-                update_trade_result(user_id, 0, "min_trade_not_met")
+                update_trade_result(user_id, "min_trade_not_met")
                 return
 
             print(f"[{user_id}] Price below mean → BUY")
             success = trade_on_binance(user, action="buy", symbol=symbol, amount=risk)
             if success:
-                profit = profit_target
-                trade_result = "profit"
+                trade_result = "executed"
 
         else:
             print(f"[{user_id}] No significant deviation → No trade")
 
-        update_trade_result(user_id, profit, trade_result)
+        update_trade_result(user_id, trade_result)
 
     except Exception as e:
         print(f"[{user_id}] Mean Reversion strategy error: {e}")
-        update_trade_result(user_id, 0, "error")
+        update_trade_result(user_id, "error")
+
+def signals(ind, params):
+    """Backtest signals: the same ±1% deviation from the previous 9 closes as execute()."""
+    import numpy as np
+    lookback = 10
+
+    def deviations(closes):
+        mean = np.full(len(closes), np.nan)
+        sums = np.cumsum(np.concatenate(([0.0], closes)))
+        mean[lookback - 1:] = (sums[lookback - 1:-1] - sums[:-lookback]) / (lookback - 1)
+        return (closes - mean) / mean
+
+    deviation = ind.cached(("mean_reverse", lookback), deviations)
+    return np.select([deviation > 0.01, deviation < -0.01], [-1, 1], 0).astype(np.int8)
 
-def update_trade_result(user_id, profit, status):
+def update_trade_result(user_id, status):
     """
-    Update Firebase with trade result and profit.
+    Update Firebase with the trade result. Profit is tracked from actual fills
+    by pnl_engine, which owns daily_profit.
     """
     try:
-        user_ref = db.reference(f"/users/{user_id}")
-        current_profit = user_ref.child("daily_profit").get() or 0
-        user_ref.update({
-            "daily_profit": round(current_profit + profit, 2),
-            "last_trade_result": status
-        })
+        with firebase_call("write", "users"):
+            db.reference(f"/users/{user_id}").update({"last_trade_result": status})
     except Exception as e:
         print(f"[{user_id}] Error updating trade result: {e}")
@@ -1,5 +1,17 @@
 from firebase_admin import db
-from trading_api import get_price_history, trade_on_binance, get_user_balance
+from metrics import firebase_call
+from trading_api import trade_on_binance, get_user_balance
+from market_data import get_closes
+
+NAME = "momentum_trading"
+ALIASES = ("momentum",)
+PARAMETERS = {"risk_tolerance": 0.02}
+DATA_REQUIREMENTS = (
+    {"kind": "klines", "source": "binance", "symbol": "BTCUSDT", "interval": "1m", "lookback": 5},
+)
+PARAMETER_SPACE = {
+    "risk_tolerance": (0.01, 0.02, 0.05, 0.1, 0.2, 0.5),
+}
 
 def execute(user):
     """
@@ -14,21 +26,20 @@ def execute(user):
     user_id = user["user_id"]
 
     risk = user.get("risk_tolerance", 0.02)
-    profit_target = user.get("profit_target", 50)
 
     try:
         # 💰 Balance check
         balance = get_user_balance(user)
         if balance is None or balance < 100:
             print(f"[{user_id}] Balance too low (R{balance}) — Need at least R100 to trade.")
-            update_trade_result(user_id, 0, "low_balance")
+            update_trade_result(user_id, "low_balance")
             return
 
         # 📈 Price history
-        price_history = get_price_history(user, symbol, interval, lookback)
+        price_history = get_closes(symbol, interval, lookback)
         if not price_history or len(price_history) < lookback:
             print(f"[{user_id}] Not enough price history for momentum strategy.")
-            update_trade_result(user_id, 0, "error")
+            update_trade_result(user_id, "error")
             return
 
         print(f"[{user_id}] Price Trend: {price_history}")
@@ -37,53 +48,61 @@ def execute(user):
         trend_down = all(price_history[i] > price_history[i + 1] for i in range(len(price_history) - 1))
 
         trade_result = "none"
-        profit = 0
 
         # 📈 Buy signal
         if trend_up:
             if balance * risk < 50:
                 print(f"[{user_id}] Not enough to buy. R{balance * risk:.2f} < R50 minimum.")
-                update_trade_result(user_id, 0, "min_trade_not_met")
+                update_trade_result(user_id, "min_trade_not_met")
                 return
 
             print(f"[{user_id}] Momentum UP → BUY signal")
             success = trade_on_binance(user, action="buy", symbol=symbol, amount=risk)
             if success:
-                profit = profit_target
-                trade_result = "profit"
+                trade_result = "executed"
 
         # 📉 Sell signal
         elif trend_down:
             if balance * risk < 50:
                 print(f"[{user_id}] Not enough to sell. R{balance * risk:.2f} < R50 minimum.")
-                update_trade_result(user_id, 0, "min_trade_not_met")
+                update_trade_result(user_id, "min_trade_not_met")
                 return
 
             print(f"[{user_id}] Momentum DOWN → SELL signal")
             success = trade_on_binance(user, action="sell", symbol=symbol, amount=risk)
             if success:
-                profit = profit_target
-                trade_result = "profit"
+                trade_result = "executed"
 
         else:
             print(f"[{user_id}] No strong momentum detected → No trade")
 
-        update_trade_result(user_id, profit, trade_result)
+        update_trade_result(user_id, trade_result)
 
     except Exception as e:
         print(f"[{user_id}] Momentum strategy error: {e}")
-        update_trade_result(user_id, 0, "error")
+        update_trade_result(user_id, "error")
+
+def signals(ind, params):
+    """Backtest signals: buy after 5 strictly rising closes, sell after 5 strictly falling ones."""
+    import numpy as np
+    from numpy.lib.stride_tricks import sliding_window_view
+    lookback = 5
+
+    def streaks(closes):
+        steps = sliding_window_view(np.diff(closes), lookback - 1)
+        out = np.zeros(len(closes), dtype=np.int8)
+        out[lookback - 1:] = np.select([(steps > 0).all(axis=1), (steps < 0).all(axis=1)], [1, -1], 0)
+        return out
+
+    return ind.cached(("momentum", lookback), streaks)
 
-def update_trade_result(user_id, profit, status):
+def update_trade_result(user_id, status):
     """
-    Update Firebase with trade result and profit.
+    Update Firebase with the trade result. Profit is tracked from actual fills
+    by pnl_engine, which owns daily_profit.
     """
     try:
-        user_ref = db.reference(f"/users/{user_id}")
-        current_profit = user_ref.child("daily_profit").get() or 0
-        user_ref.update({
-            "daily_profit": round(current_profit + profit, 2),
-            "last_trade_result": status
-        })
+        with firebase_call("write", "users"):
+            db.reference(f"/users/{user_id}").update({"last_trade_result": status})
     except Exception as e:
         print(f"[{user_id}] Error updating trade result: {e}")
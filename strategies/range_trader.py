@@ -1,7 +1,24 @@
 from trading_api import get_rsi, trade_on_binance, get_user_balance
 from notifications_manager import evaluate_and_notify_user as notify_user_profit_loss
 from firebase_admin import db
+from metrics import firebase_call
 import time
+from market_data import get_closes
+
+NAME = "range_trader"
+ALIASES = ("rsi", "range")
+PARAMETERS = {"rsi_period": 14, "rsi_oversold": 30, "rsi_overbought": 70, "risk_tolerance": 0.02}
+RSI_INTERVAL = "1h"
+RSI_LOOKBACK = 100  # enough candles for the EWM to settle at any sane rsi_period
+DATA_REQUIREMENTS = (
+    {"kind": "klines", "source": "binance", "symbol": "BTCUSDT", "interval": RSI_INTERVAL, "lookback": RSI_LOOKBACK},
+)
+PARAMETER_SPACE = {
+    "rsi_period": tuple(range(6, 31, 2)),
+    "rsi_oversold": tuple(range(15, 46, 5)),
+    "rsi_overbought": tuple(range(55, 86, 5)),
+    "risk_tolerance": (0.01, 0.02, 0.05, 0.1, 0.2, 0.5),
+}
 
 def execute(user):
     """
@@ -27,7 +44,7 @@ def execute(user):
             return
 
         # 📉 Get RSI
-        rsi = get_rsi(user, symbol, period)
+        rsi = get_rsi(get_closes(symbol, RSI_INTERVAL, max(RSI_LOOKBACK, period + 1)), period)
         if rsi is None:
             print(f"[{user_id}] RSI fetch failed.")
             return
@@ -58,12 +75,13 @@ def execute(user):
         # 🧾 Log trade to Firebase
         try:
             trades_ref = db.reference(f"/users/{user_id}/trades")
-            trades_ref.push({
-                "timestamp": int(time.time()),
-                "strategy": "rsi",
-                "action": action,
-                "profit_or_loss": round(profit_or_loss, 2),
-            })
+            with firebase_call("write", "users"):
+                trades_ref.push({
+                    "timestamp": int(time.time()),
+                    "strategy": "rsi",
+                    "action": action,
+                    "profit_or_loss": round(profit_or_loss, 2),
+                })
         except Exception as e:
             print(f"[{user_id}] Firebase logging error: {e}")
 
@@ -72,3 +90,10 @@ def execute(user):
 
     except Exception as e:
         print(f"[{user_id}] RSI strategy error: {e}")
+
+
+def signals(ind, params):
+    """Backtest signals: buy below rsi_oversold, sell above rsi_overbought, RSI on 1h closes."""
+    import numpy as np
+    rsi = ind.rsi(params["rsi_period"])
+    return np.select([rsi < params["rsi_oversold"], rsi > params["rsi_overbought"]], [1, -1], 0).astype(np.int8)
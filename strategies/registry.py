@@ -0,0 +1,105 @@
+"""
+Strategy registry.
+
+Every module in strategies/ that defines execute(user) is discovered and
+imported once. Modules describe themselves with a few module-level constants:
+
+    NAME               canonical name stored on users/{id}/strategy
+    ALIASES            other names accepted by /setstrategy
+    PARAMETERS         user fields the strategy reads, with their defaults
+    DATA_REQUIREMENTS  market data needed per cycle, e.g.
+                       {"kind": "klines", "source": "binance", "symbol": "BTCUSDT",
+                        "interval": "1m", "lookback": 5}
+                       {"kind": "ticker", "source": "luno", "symbol": "XBTZAR"}
+    PARAMETER_SPACE    candidate values per parameter, searched by optimizer.py
+
+and may define signals(ind, params) for vectorized backtests (see backtest.py).
+"""
+import logging
+import pkgutil
+import threading
+from collections import namedtuple
+from importlib import import_module
+
+logger = logging.getLogger(__name__)
+
+StrategySpec = namedtuple(
+    "StrategySpec", "name module execute aliases parameters data_requirements parameter_space signals",
+)
+
+_lock = threading.Lock()
+_specs = None     # canonical name -> StrategySpec
+_dispatch = None  # canonical name or alias -> StrategySpec
+
+
+def load_strategies():
+    """Discover and import strategies/* once; later calls return the cached table."""
+    global _specs, _dispatch
+    if _dispatch is not None:
+        return _dispatch
+
+    with _lock:
+        if _dispatch is not None:
+            return _dispatch
+
+        package = import_module(__package__)
+        specs, dispatch = {}, {}
+        for module_info in pkgutil.iter_modules(package.__path__):
+            if module_info.name.startswith("_") or module_info.name == "registry":
+                continue
+            try:
+                module = import_module(f"{__package__}.{module_info.name}")
+            except Exception as e:
+                logger.error(f"Failed to load strategy module '{module_info.name}': {e}")
+                continue
+            if not callable(getattr(module, "execute", None)):
+                continue
+
+            spec = StrategySpec(
+                name=getattr(module, "NAME", module_info.name),
+                module=module,
+                execute=module.execute,
+                aliases=tuple(getattr(module, "ALIASES", ())),
+                parameters=dict(getattr(module, "PARAMETERS", {})),
+                data_requirements=tuple(getattr(module, "DATA_REQUIREMENTS", ())),
+                parameter_space=dict(getattr(module, "PARAMETER_SPACE", {})),
+                signals=getattr(module, "signals", None),
+            )
+            specs[spec.name] = spec
+            for key in (spec.name, module_info.name) + spec.aliases:
+                dispatch.setdefault(key.lower(), spec)
+
+        _specs, _dispatch = specs, dispatch
+        logger.info(f"Loaded {len(specs)} strategies: {', '.join(sorted(specs))}")
+        return _dispatch
+
+
+def get_strategy(name):
+    """Return the StrategySpec for a canonical name or alias, or None."""
+    if not name:
+        return None
+    return load_strategies().get(str(name).lower())
+
+
+def strategy_names():
+    load_strategies()
+    return sorted(_specs)
+
+
+def all_strategies():
+    load_strategies()
+    return list(_specs.values())
+
+
+def data_requirements(specs):
+    """Union of the market data needed by the given strategies (duplicates removed)."""
+    seen, requirements = set(), []
+    for spec in specs:
+        if spec is None:
+            continue
+        for req in spec.data_requirements:
+            key = tuple(sorted(req.items()))
+            if key not in seen:
+                seen.add(key)
+                requirements.append(req)
+    return requirements
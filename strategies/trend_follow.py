@@ -1,3 +1,16 @@
+NAME = "trend_follow"
+ALIASES = ("trend_following", "trend")
+PARAMETERS = {"risk_tolerance": 0.02}
+TREND_INTERVAL = "1h"
+DATA_REQUIREMENTS = (
+    {"kind": "klines", "source": "binance", "symbol": "BTCUSDT", "interval": TREND_INTERVAL, "lookback": 50},
+    {"kind": "ticker", "source": "binance", "symbol": "BTCUSDT"},
+)
+PARAMETER_SPACE = {
+    "risk_tolerance": (0.01, 0.02, 0.05, 0.1, 0.2, 0.5),
+}
+
+
 def execute(user):
     """
     Trend Following Strategy:
@@ -6,9 +19,11 @@ def execute(user):
     Logs profit/loss to Firebase and sends notifications.
     Requires R100+ balance and minimum R50 trade value.
     """
-    from trading_api import get_moving_average, get_binance_price, trade_on_binance, get_user_balance
+    from trading_api import trade_on_binance, get_user_balance
+    from market_data import get_closes, get_ticker
     from notifications_manager import evaluate_and_notify_user as notify_user_profit_loss
     from firebase_admin import db
+    from metrics import firebase_call
     import time
 
     symbol = "BTC/USDT"
@@ -23,9 +38,10 @@ def execute(user):
         return
 
     # Fetch data
-    price = get_binance_price(user, symbol)
-    ma_20 = get_moving_average(user, symbol, period=20)
-    ma_50 = get_moving_average(user, symbol, period=50)
+    price = get_ticker("binance", symbol)
+    closes = get_closes(symbol, TREND_INTERVAL, 50)
+    ma_20 = sum(closes[-20:]) / 20 if len(closes) >= 20 else None
+    ma_50 = sum(closes) / 50 if len(closes) >= 50 else None
 
     if None in (price, ma_20, ma_50):
         print(f"[{user_id}] Could not fetch trend data.")
@@ -58,14 +74,24 @@ def execute(user):
     # Log to Firebase
     try:
         trades_ref = db.reference(f"/users/{user_id}/trades")
-        trades_ref.push({
-            "timestamp": int(time.time()),
-            "strategy": "trend_following",
-            "action": action,
-            "profit_or_loss": round(profit_or_loss, 2),
-        })
+        with firebase_call("write", "users"):
+            trades_ref.push({
+                "timestamp": int(time.time()),
+                "strategy": "trend_following",
+                "action": action,
+                "profit_or_loss": round(profit_or_loss, 2),
+            })
     except Exception as e:
         print(f"[{user_id}] Error logging trade to Firebase: {e}")
 
     # Notify user
     notify_user_profit_loss(user_id, action, profit_or_loss)
+
+
+def signals(ind, params):
+    """Backtest signals: the MA20/MA50 rules of execute(), with the 1h close standing in for the ticker."""
+    import numpy as np
+    price, ma_20, ma_50 = ind.closes, ind.sma(20), ind.sma(50)
+    up = (ma_20 > ma_50) & (price > ma_20)
+    down = (ma_20 < ma_50) & (price < ma_20)
+    return np.select([up, down], [1, -1], 0).astype(np.int8)
@@ -1,105 +1,183 @@
 import asyncio
 import sys
 import os
+import time
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from database import get_all_users, get_user_data, get_autobot_status
-from trading_api import get_binance_price, get_luno_price, trade_on_binance, trade_on_luno
-from strategies.arbitrage import execute as run_arbitrage_strategy
-from strategies.dip_buyer import execute as run_dip_buyer
-from strategies.mean_reverse import execute as run_mean_reversion
-from strategies.momentum_trading import execute as run_momentum
-from strategies.range_trader import execute as run_range_trader
-from strategies.trend_follow import execute as run_trend_follow
-from utils import log_event
+from database import get_user_data
+from arbitrage_execution import execute_two_legs
+from binance_fastpath import start_fastpath
+from circuit_breaker import open_circuits
+from market_data import prefetch
+from order_book import refresh_book
+from arbitrage_scanner import get_opportunities
+from fx_rates import get_zar_usdt_rate, StaleRateError
+from risk_engine import tick as risk_tick
+from pnl_engine import tick as pnl_tick
+from strategies import get_strategy, data_requirements
+from event_log import log_event
+from metrics import strategy_call, register_gauge, CYCLE_SECONDS
+from tracing import start_trace, span
+from user_profile import PROFILE_FIELDS, get_profile, profile_for, update_profiles
+from user_queries import active_autobot_users
 
 # Strategy intervals
 ARBITRAGE_INTERVAL = 20
 ARBITRAGE_MIN_PROFIT = 0.5  # percent
+ARBITRAGE_AMOUNT_ZAR = 200
+
+# Strategies run per exchange, dispatched through the strategy registry
+BINANCE_STRATEGIES = ("momentum_trading", "trend_follow", "dip_buyer")
+LUNO_STRATEGIES = ("mean_reverse", "range_trader")
+LOOP_REQUIREMENTS = data_requirements(get_strategy(name) for name in BINANCE_STRATEGIES + LUNO_STRATEGIES)
+
+def load_profile(user_id):
+    """Profile cached by the last users/ scan; read the user directly if it is newer than that."""
+    user = get_profile(user_id)
+    if user is None:
+        data = get_user_data(user_id)
+        if not data:
+            return None
+        user = profile_for(user_id, data)
+    return user
 
 async def run_arbitrage(user_id):
-    user = get_user(user_id)
+    user = load_profile(user_id)
     if not user:
         return
 
+    if open_circuits(("binance", "luno")):
+        return  # Don't trade either leg while one exchange is failing
+
     try:
-        binance_price = get_binance_price("BTCUSDT")
-        luno_price = get_luno_price("XBTZAR")
-        zar_usdt = user.get("zar_usdt_rate", 18.5)
+        zar_usdt = get_zar_usdt_rate()
+        luno_book = refresh_book("luno", "XBTZAR")
+        binance_book = refresh_book("binance", "BTCUSDT")
+        if luno_book is None or binance_book is None:
+            return
+
+        # Price both legs at the fill the trade size would actually get
+        luno_price, btc_amount = luno_book.fill_for_quote("buy", ARBITRAGE_AMOUNT_ZAR)
+        binance_price = binance_book.average_fill_price("sell", btc_amount) if luno_price else None
+        if binance_price is None:
+            return
 
         luno_usd_price = luno_price / zar_usdt
         price_diff = binance_price - luno_usd_price
         percent_diff = (price_diff / luno_usd_price) * 100
 
+        # Multi-pair and triangular cycles come from the shared per-tick scan
+        best = await asyncio.to_thread(get_opportunities, 1)
+        if best and best[0]["edge_pct"] >= ARBITRAGE_MIN_PROFIT:
+            log_event(user_id, "arbitrage_cycle", " -> ".join(best[0]["path"]),
+                      edge_pct=best[0]["edge_pct"], kind=best[0]["kind"])
+
         if percent_diff >= ARBITRAGE_MIN_PROFIT:
             log_event(user_id, "arbitrage_opportunity",
                       f"Buy on Luno ({luno_usd_price:.2f}) sell on Binance ({binance_price:.2f}) | Profit: {percent_diff:.2f}%")
-            luno_result = trade_on_luno(user, "buy", amount=200)
-            binance_result = trade_on_binance(user, "sell", amount=None)
-            log_event(user_id, "arbitrage_trade", f"Executed Arbitrage: {luno_result} | {binance_result}")
-
+            # Both legs at once; a lone filled leg is unwound by the executor
+            result = await asyncio.to_thread(execute_two_legs, user, "luno", "binance", btc_amount, luno_price)
+            log_event(user_id, "arbitrage_trade",
+                      f"Arbitrage {result['outcome']}: Luno buy {result['buy']['order_id']} | "
+                      f"Binance sell {result['sell']['order_id']}",
+                      status=result["outcome"], skew_ms=result["skew_ms"])
+
+    except StaleRateError as e:
+        log_event(user_id, "arbitrage_skipped", str(e), status="stale_fx")
     except Exception as e:
         log_event(user_id, "arbitrage_error", f"Arbitrage failed: {e}", status="error", error=e)
 
 async def run_user_strategies(user_id):
     while True:
-        user = get_user(user_id)
-        if not user or not user.get("active") or not get_autobot_status(user_id):
+        # Refreshed by strategy_loop's scan every cycle, so no per-user read here; a user
+        # who leaves the scan (autobot off, inactive) has this task cancelled
+        user = load_profile(user_id)
+        if not user or not user.active or not user.autobot_status:
             await asyncio.sleep(10)
             continue
 
-        exchange = user.get("exchange")
+        exchange = user.exchange
+        cycle_start = time.perf_counter()
 
-        try:
-            await run_arbitrage(user_id)
-
-            if exchange == "binance":
-                await run_binance_strategies(user_id)
-            elif exchange == "luno":
-                await run_luno_strategies(user_id)
-            elif exchange == "both":
-                await asyncio.gather(
-                    run_binance_strategies(user_id),
-                    run_luno_strategies(user_id)
-                )
+        with start_trace("strategy_loop.user_cycle", user_id=user_id, exchange=str(exchange)):
+            try:
+                with span("arbitrage"):
+                    await run_arbitrage(user_id)
 
-        except Exception as e:
-            log_event(user_id, "strategy_error", f"Strategy error: {e}", status="error", error=e)
+                if exchange == "binance":
+                    await run_binance_strategies(user_id)
+                elif exchange == "luno":
+                    await run_luno_strategies(user_id)
+                elif exchange == "both":
+                    await asyncio.gather(
+                        run_binance_strategies(user_id),
+                        run_luno_strategies(user_id)
+                    )
+
+            except Exception as e:
+                log_event(user_id, "strategy_error", f"Strategy error: {e}", status="error", error=e)
 
+        CYCLE_SECONDS.observe(time.perf_counter() - cycle_start, "strategy_loop")
         await asyncio.sleep(ARBITRAGE_INTERVAL)
 
+async def run_strategies(user_id, names):
+    user = load_profile(user_id)
+    if user is None:
+        return
+    for name in names:
+        # Strategies are blocking (HTTP + Firebase), keep them off the event loop
+        spec = get_strategy(name)
+        blocked = open_circuits({req["source"] for req in spec.data_requirements})
+        if blocked:
+            log_event(user_id, "strategy_skipped", f"{spec.name}: {blocked[0].exchange}.{blocked[0].endpoint} circuit open",
+                      status="circuit_open")
+            continue
+        with strategy_call(spec.name):
+            await asyncio.to_thread(spec.execute, user)
+
 async def run_binance_strategies(user_id):
     await asyncio.sleep(5)
-    await run_momentum(user_id)
-    await run_trend_follow(user_id)
-    await run_dip_buyer(user_id)
+    await run_strategies(user_id, BINANCE_STRATEGIES)
 
 async def run_luno_strategies(user_id):
     await asyncio.sleep(5)
-    await run_mean_reversion(user_id)
-    await run_range_trader(user_id)
+    await run_strategies(user_id, LUNO_STRATEGIES)
+
+_user_tasks = {}
+register_gauge("strategy_loop_user_tasks", "Per-user strategy tasks currently running",
+               lambda: sum(1 for task in _user_tasks.values() if not task.done()))
 
 async def strategy_loop():
-    user_tasks = {}
+    user_tasks = _user_tasks
+    # Warm the Binance order session and clock offset before the first trade
+    await asyncio.to_thread(start_fastpath)
 
     while True:
-        users_data = get_all_users() or {}
-
-        for user_id, user_data in users_data.items():
-            autobot_status = get_autobot_status(user_id)
-            active = user_data.get("active", False)
-
-            if active and autobot_status:
-                if user_id not in user_tasks or user_tasks[user_id].done():
-                    task = asyncio.create_task(run_user_strategies(user_id))
-                    user_tasks[user_id] = task
-                    log_event(user_id, "autobot_start", "Autobot started for user.")
-            else:
-                task = user_tasks.get(user_id)
-                if task and not task.done():
-                    task.cancel()
-                    log_event(user_id, "autobot_stop", "Autobot stopped for user.")
+        # Only users with the autobot on are transferred (indexed query, see user_queries.py)
+        try:
+            users_data = await asyncio.to_thread(active_autobot_users, PROFILE_FIELDS)
+        except Exception as e:
+            print(f"Active user scan failed: {e}")
+            await asyncio.sleep(10)
+            continue
+        update_profiles(users_data)
+        # One shared fetch per loop; per-user strategies read from the cache
+        await asyncio.to_thread(prefetch, LOOP_REQUIREMENTS)
+        await asyncio.to_thread(get_opportunities)
+        await asyncio.to_thread(risk_tick)
+        await asyncio.to_thread(pnl_tick)
+
+        for user_id in users_data:
+            if user_id not in user_tasks or user_tasks[user_id].done():
+                task = asyncio.create_task(run_user_strategies(user_id))
+                user_tasks[user_id] = task
+                log_event(user_id, "autobot_start", "Autobot started for user.")
+
+        for user_id, task in user_tasks.items():
+            if user_id not in users_data and not task.done():
+                task.cancel()
+                log_event(user_id, "autobot_stop", "Autobot stopped for user.")
 
         await asyncio.sleep(10)
 
@@ -1,13 +1,4 @@
 from celery_app import celery_app
-from database import (
-    get_all_users,
-    get_autobot_status,
-    get_autobot_config,
-    get_balance,
-    add_profit,
-    save_trade,
-    update_leaderboard
-)
 import requests
 import random  # Simulated profit, replace with real trading logic
 
@@ -26,9 +17,20 @@ def send_telegram_message(chat_id, text):
 
 @celery_app.task(name="tasks.run_auto_bot_task")
 def run_auto_bot_task(payload=None):
+    # Imported here so worker boot doesn't initialise Firebase until the first task runs
+    from user_queries import user_ids
+    from database import (
+        get_autobot_status,
+        get_autobot_config,
+        get_balance,
+        add_profit,
+        save_trade,
+        update_leaderboard
+    )
+
     print("Running auto bot task...")
 
-    users = get_all_users()
+    users = user_ids()  # Keys only; status is read per user below
     if not users:
         return {"status": "no users found"}
 
@@ -66,3 +68,9 @@ def run_auto_bot_task(payload=None):
             print(f"Error processing user {user_id}: {str(e)}")
 
     return {"status": "completed"}
+
+@celery_app.task(name="tasks.archive_trades_task")
+def archive_trades_task():
+    # Moves trades past the retention window to cold storage (see trade_archive.py)
+    from trade_archive import archive_all
+    return archive_all()
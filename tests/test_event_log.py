@@ -0,0 +1,66 @@
+import pytest
+
+import event_log
+from event_log import EventLogSink
+
+
+class FailingDatabase:
+    """db stand-in whose update() lets `during` run, then fails."""
+
+    def __init__(self, during):
+        self.during = during
+
+    def reference(self, path):
+        return self
+
+    def update(self, value):
+        self.during()
+        raise ConnectionError("database unavailable")
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    sink = EventLogSink(batch_size=3, flush_ms=60000, max_buffer=4)
+    monkeypatch.setattr(sink, "start", lambda: None)  # flush by hand only
+    return sink
+
+
+def messages(sink):
+    return [entry["message"] for _, entry in sink._buffer]
+
+
+def test_failed_flush_requeues_batch_in_order(sink, monkeypatch):
+    for message in "abc":
+        sink.enqueue("u1", {"message": message})
+    monkeypatch.setattr(event_log, "db", FailingDatabase(lambda: None))
+
+    assert sink.flush() == 0
+    assert messages(sink) == ["a", "b", "c"]
+    assert sink.stats["dropped"] == 0
+    assert sink.stats["failed_flushes"] == 1
+
+
+def test_requeue_overflow_drops_oldest(sink, monkeypatch):
+    for message in "abc":
+        sink.enqueue("u1", {"message": message})
+    # Two newer events arrive while the batch is in flight: only one of the
+    # three failed entries fits back, and it must be the newest
+    monkeypatch.setattr(event_log, "db", FailingDatabase(
+        lambda: [sink.enqueue("u1", {"message": m}) for m in "de"]))
+
+    sink.flush()
+
+    assert messages(sink) == ["b", "c", "d", "e"]
+    assert sink.stats["dropped"] == 1
+
+
+def test_requeue_into_full_buffer_drops_whole_batch(sink, monkeypatch):
+    for message in "abc":
+        sink.enqueue("u1", {"message": message})
+    monkeypatch.setattr(event_log, "db", FailingDatabase(
+        lambda: [sink.enqueue("u1", {"message": m}) for m in "defg"]))
+
+    sink.flush()
+
+    assert messages(sink) == ["d", "e", "f", "g"]
+    assert sink.stats["dropped"] == 3
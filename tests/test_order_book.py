@@ -0,0 +1,42 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from order_book import OrderBook, OutOfSyncError, replay, replay_file
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def levels(side):
+    return list(zip(side.prices, side.qtys))
+
+
+def test_replay_binance_depth_stream():
+    book = replay_file(FIXTURES / "binance_btcusdt_depth.jsonl", "binance", "BTCUSDT")
+
+    # The diff ending at the snapshot's id is skipped; later ones apply in order
+    assert book.last_update_id == 104
+    assert levels(book.bids) == [(60000.0, 0.5), (60005.0, 0.2)]
+    assert levels(book.asks) == [(60008.0, 0.3), (60010.0, 0.1), (60020.0, 1.0)]
+    assert book.best_bid() == 60005.0 and book.best_ask() == 60008.0
+    assert book.average_fill_price("buy", 0.4) == pytest.approx((0.3 * 60008 + 0.1 * 60010) / 0.4)
+    assert book.average_fill_price("sell", 1.0) is None  # only 0.7 BTC of bids
+
+
+def test_replay_luno_order_stream():
+    book = replay_file(FIXTURES / "luno_xbtzar_stream.jsonl", "luno", "XBTZAR")
+
+    # A1 partly filled, B2 created, A2 deleted
+    assert book.last_update_id == 503
+    assert levels(book.asks) == [(1120000.0, pytest.approx(0.2))]
+    assert levels(book.bids) == [(1119000.0, 0.4), (1119500.0, 0.2)]
+
+
+def test_replay_gap_raises():
+    with open(FIXTURES / "binance_btcusdt_depth.jsonl") as f:
+        messages = [json.loads(line) for line in f]
+    del messages[2]  # lose 101-103
+
+    with pytest.raises(OutOfSyncError):
+        replay(OrderBook("binance", "BTCUSDT"), messages)
@@ -0,0 +1,226 @@
+"""
+Lightweight per-user cycle tracing.
+
+    with start_trace("user_cycle", user_id=uid):
+        with span("firebase.read"):
+            ...
+
+A sampled fraction of cycles (TRACE_SAMPLE_RATE) records nested spans; the
+rest pay one random() call and a contextvar lookup per span. Finished traces
+are exported as JSON lines to TRACE_FILE, or as OTLP/HTTP JSON to
+TRACE_OTLP_ENDPOINT when TRACE_EXPORT=otlp, and the slowest TRACE_EXEMPLARS
+cycles are kept in memory for /admin/traces/slowest.
+"""
+import contextvars
+import heapq
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.1))
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "file").lower()  # file | otlp | none
+TRACE_FILE = os.getenv("TRACE_FILE", "logs/traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_EXEMPLARS = int(os.getenv("TRACE_EXEMPLARS", 20))
+SERVICE_NAME = os.getenv("FLY_APP_NAME", "crypto-bot-3")
+
+_current = contextvars.ContextVar("trace_span", default=None)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, trace, name, parent_id, attributes):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = attributes
+        self.status = "ok"
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round((self.end_ns - self.start_ns) / 1e6, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans", "lock")
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.spans = []
+        self.lock = threading.Lock()
+
+
+# === Recording ===
+@contextmanager
+def _record(trace, name, parent_id, attributes):
+    span_obj = Span(trace, name, parent_id, attributes)
+    token = _current.set(span_obj)
+    try:
+        yield span_obj
+    except BaseException as e:
+        span_obj.status = "error"
+        span_obj.attributes["error"] = str(e)[:200]
+        raise
+    finally:
+        span_obj.end_ns = time.time_ns()
+        _current.reset(token)
+        with trace.lock:
+            trace.spans.append(span_obj)
+
+
+@contextmanager
+def start_trace(name: str, sample_rate: float = None, **attributes):
+    """Root span for one cycle; sampled with probability TRACE_SAMPLE_RATE."""
+    rate = TRACE_SAMPLE_RATE if sample_rate is None else sample_rate
+    if rate <= 0 or random.random() >= rate:
+        # Unsampled: make sure nested span() calls stay no-ops
+        token = _current.set(None)
+        try:
+            yield None
+        finally:
+            _current.reset(token)
+        return
+
+    trace = Trace()
+    root = None
+    try:
+        with _record(trace, name, None, attributes) as root:
+            yield root
+    finally:
+        if root is not None and root.end_ns is not None:
+            _finish(trace, root)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Child span of the current trace; a no-op outside a sampled trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    with _record(parent.trace, name, parent.span_id, attributes) as child:
+        yield child
+
+
+# === Exemplars ===
+_exemplar_lock = threading.Lock()
+_exemplars = []  # min-heap of (duration_ms, trace_id, trace dict)
+
+
+def _finish(trace, root):
+    duration_ms = (root.end_ns - root.start_ns) / 1e6
+    with trace.lock:
+        spans = sorted(trace.spans, key=lambda s: s.start_ns)
+    record = {
+        "trace_id": trace.trace_id,
+        "name": root.name,
+        "duration_ms": round(duration_ms, 3),
+        "attributes": root.attributes,
+        "spans": [s.to_dict() for s in spans],
+    }
+
+    with _exemplar_lock:
+        item = (duration_ms, trace.trace_id, record)
+        if len(_exemplars) < TRACE_EXEMPLARS:
+            heapq.heappush(_exemplars, item)
+        elif duration_ms > _exemplars[0][0]:
+            heapq.heapreplace(_exemplars, item)
+
+    if TRACE_EXPORT != "none":
+        try:
+            _export_queue.put_nowait((record, spans))
+        except queue.Full:
+            pass
+        _ensure_exporter()
+
+
+def slowest_traces(limit: int = 10) -> list:
+    with _exemplar_lock:
+        items = sorted(_exemplars, reverse=True)[:limit]
+    return [record for _, _, record in items]
+
+
+# === Export ===
+_export_queue = queue.Queue(maxsize=1000)
+_exporter = None
+
+
+def _ensure_exporter():
+    global _exporter
+    if _exporter is None or not _exporter.is_alive():
+        _exporter = threading.Thread(target=_export_loop, name="trace-exporter", daemon=True)
+        _exporter.start()
+
+
+def _export_loop():
+    while True:
+        record, spans = _export_queue.get()
+        try:
+            if TRACE_EXPORT == "otlp":
+                _export_otlp(record, spans)
+            else:
+                _export_file(record)
+        except Exception as e:
+            logger.warning(f"Trace export failed: {e}")
+
+
+def _export_file(record):
+    directory = os.path.dirname(TRACE_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(TRACE_FILE, "a") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _export_otlp(record, spans):
+    import requests
+
+    otlp_spans = []
+    for s in spans:
+        otlp_spans.append({
+            "traceId": record["trace_id"],
+            "spanId": s.span_id,
+            "parentSpanId": s.parent_id or "",
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2 if s.status == "error" else 1},
+        })
+    payload = {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "crypto-bot-3.tracing"}, "spans": otlp_spans}],
+    }]}
+    requests.post(TRACE_OTLP_ENDPOINT, json=payload, timeout=5).raise_for_status()
@@ -0,0 +1,207 @@
+"""
+Moves old trades out of users/{id}/trades into compressed cold storage.
+
+Trades older than TRADE_RETENTION_DAYS are appended to gzip JSON-lines files
+partitioned by user and UTC day, then deleted from Firebase in the same
+multi-path update that rolls them into users/{id}/trade_archive:
+
+    {TRADE_ARCHIVE_DIR}/{user_id}/{YYYY-MM}/{YYYY-MM-DD}.jsonl.gz
+
+Keys are object-store shaped, so the directory can be a mounted volume or a
+synced bucket. The user node then holds only the retention window plus a
+fixed-size summary (count, profit, first/last timestamp), so its size stops
+growing with trading history.
+
+Only trades at or before the cutoff are read, via order_by_child queries on
+trades/timestamp (indexed in database.rules.json). Writers store either epoch
+seconds or ISO-8601 strings (/trade), and the database sorts every string
+after every number, so there are two scans: numbers up to the cutoff, then
+strings up to the cutoff in ISO form (ISO strings sort chronologically).
+
+A trade is written to disk before it is deleted from Firebase. If a run dies
+between the two, the next run archives it again, and readers drop the
+duplicate by trade id.
+
+    archive_all()                        # Celery beat: tasks.archive_trades_task
+    iter_trades(user_id, since=...)      # archived then live trades, oldest first
+"""
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from firebase_admin import db
+
+from event_log import PUSH_CHARS
+from metrics import Counter, firebase_call
+
+logger = logging.getLogger(__name__)
+
+TRADE_RETENTION_DAYS = float(os.getenv("TRADE_RETENTION_DAYS", 30))
+TRADE_ARCHIVE_DIR = os.getenv("TRADE_ARCHIVE_DIR", "archive/trades")
+TRADE_ARCHIVE_BATCH = int(os.getenv("TRADE_ARCHIVE_BATCH", 500))
+
+TRADES_ARCHIVED = Counter("trades_archived_total", "Trades moved from Firebase to cold storage")
+
+
+def _iso_time(value):
+    """Epoch seconds of an ISO-8601 timestamp (naive means UTC), or None."""
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _trade_time(trade_id, trade) -> float:
+    """Trade time in seconds: its timestamp (number or ISO string), else the time in its push id."""
+    ts = trade.get("timestamp") if isinstance(trade, dict) else None
+    if isinstance(ts, (int, float)) and not isinstance(ts, bool):
+        return ts
+    if isinstance(ts, str) and (parsed := _iso_time(ts)) is not None:
+        return parsed
+    if len(trade_id) == 20 and all(c in PUSH_CHARS for c in trade_id[:8]):
+        ms = 0
+        for c in trade_id[:8]:
+            ms = ms * 64 + PUSH_CHARS.index(c)
+        return ms / 1000
+    return time.time()
+
+
+def _profit(trade) -> float:
+    value = trade.get("profit", trade.get("profit_or_loss", 0)) if isinstance(trade, dict) else 0
+    return value if isinstance(value, (int, float)) else 0
+
+
+def _day(ts) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d")
+
+
+def _user_dir(user_id) -> str:
+    # Firebase keys never contain these; refusing them keeps paths inside the archive
+    if not user_id or any(c in user_id for c in "./\\"):
+        raise ValueError(f"Invalid user id {user_id!r}")
+    return os.path.join(TRADE_ARCHIVE_DIR, user_id)
+
+
+def _path(user_id, day) -> str:
+    return os.path.join(_user_dir(user_id), day[:7], f"{day}.jsonl.gz")
+
+
+# === Archiving ===
+def _write(user_id, records):
+    """Append records to their day files, one gzip member per file per batch."""
+    by_day = {}
+    for record in records:
+        by_day.setdefault(_day(record["ts"]), []).append(record)
+    for day, rows in by_day.items():
+        path = _path(user_id, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            f.writelines(json.dumps(row, separators=(",", ":")) + "\n" for row in rows)
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def archive_user(user_id, cutoff=None) -> int:
+    """Archive one user's trades older than the retention window; returns how many moved."""
+    cutoff = cutoff if cutoff is not None else time.time() - TRADE_RETENTION_DAYS * 86400
+    # Numeric timestamps (and missing ones, which sort first), then ISO strings
+    iso_cutoff = datetime.fromtimestamp(cutoff, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%f")
+    return _archive_range(user_id, cutoff, None, cutoff) + _archive_range(user_id, cutoff, "", iso_cutoff)
+
+
+def _archive_range(user_id, cutoff, start, end) -> int:
+    moved = 0
+    while True:
+        query = db.reference(f"users/{user_id}/trades").order_by_child("timestamp")
+        if start is not None:
+            query = query.start_at(start)
+        with firebase_call("read", "users"):
+            old = query.end_at(end).limit_to_first(TRADE_ARCHIVE_BATCH).get() or {}
+            summary = db.reference(f"users/{user_id}/trade_archive").get() or {}
+        if not old:
+            return moved
+
+        # Trades without a timestamp sort first in the numeric scan; keep the recent ones by
+        # push-id time. Strings that aren't ISO timestamps are left where they are.
+        records = [{"id": trade_id, "ts": ts, "trade": trade} for trade_id, trade in old.items()
+                   if (ts := _trade_time(trade_id, trade)) <= cutoff]
+        if not records:
+            return moved
+        _write(user_id, records)
+
+        times = [r["ts"] for r in records]
+        updates = {f"trades/{r['id']}": None for r in records}
+        updates["trade_archive"] = {
+            "count": summary.get("count", 0) + len(records),
+            "profit": round(summary.get("profit", 0) + sum(_profit(r["trade"]) for r in records), 2),
+            "first_ts": min(times + [summary.get("first_ts", min(times))]),
+            "last_ts": max(times + [summary.get("last_ts", 0)]),
+            "archived_at": int(time.time()),
+        }
+        with firebase_call("write", "users"):
+            db.reference(f"users/{user_id}").update(updates)
+        TRADES_ARCHIVED.inc(amount=len(records))
+        moved += len(records)
+        if len(old) < TRADE_ARCHIVE_BATCH:
+            return moved
+
+
+def archive_all(cutoff=None) -> dict:
+    """Archive every user; returns {"users": scanned, "archived": trades moved, "failed": users}."""
+    from user_queries import user_ids
+
+    report = {"users": 0, "archived": 0, "failed": 0}
+    for user_id in user_ids():
+        report["users"] += 1
+        try:
+            report["archived"] += archive_user(user_id, cutoff)
+        except Exception as e:
+            report["failed"] += 1
+            logger.error(f"Trade archive failed for {user_id}: {e}")
+    logger.info(f"Trade archive: {report}")
+    return report
+
+
+# === Reading Back ===
+def iter_archived(user_id, since=None, until=None):
+    """Yield archived trades oldest first, streaming one day file at a time."""
+    root = _user_dir(user_id)
+    if not os.path.isdir(root):
+        return
+    first_day = _day(since) if since is not None else None
+    last_day = _day(until) if until is not None else None
+    for month in sorted(os.listdir(root)):
+        for name in sorted(os.listdir(os.path.join(root, month))):
+            day = name.split(".", 1)[0]
+            if (first_day and day < first_day) or (last_day and day > last_day):
+                continue
+            with gzip.open(os.path.join(root, month, name), "rt", encoding="utf-8") as f:
+                rows = [json.loads(line) for line in f]
+            # A re-archived trade lands in the same day file, so duplicates are dropped per file
+            seen = set()
+            for row in sorted(rows, key=lambda r: r["ts"]):
+                if row["id"] in seen:
+                    continue
+                seen.add(row["id"])
+                if (since is None or row["ts"] >= since) and (until is None or row["ts"] <= until):
+                    yield {"id": row["id"], **row["trade"]}
+
+
+def iter_trades(user_id, since=None, until=None):
+    """Full history: archived trades, then the ones still in Firebase."""
+    with firebase_call("read", "users"):
+        live = db.reference(f"users/{user_id}/trades").get() or {}
+    for trade in iter_archived(user_id, since, until):
+        live.pop(trade["id"], None)  # Archived but not yet deleted when a run was interrupted
+        yield trade
+    rows = sorted((_trade_time(trade_id, trade), trade_id, trade) for trade_id, trade in live.items()
+                  if isinstance(trade, dict))
+    for ts, trade_id, trade in rows:
+        if (since is None or ts >= since) and (until is None or ts <= until):
+            yield {"id": trade_id, **trade}
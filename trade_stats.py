@@ -0,0 +1,100 @@
+"""
+Per-user trading statistics, updated incrementally as trades are recorded.
+
+Each user has one small node, users/{id}/stats, that already holds every
+figure /stats shows, so serving it never scans trade history:
+
+    trades, wins, losses, pnl          closing trades count as a win or loss by realized PnL
+    peak_pnl, max_drawdown             largest fall of cumulative realized PnL from its peak (USD)
+    hold_seconds, holds                total and count of completed holds, for the average
+    open_since/{asset}                 when the current position was opened
+    by_strategy/{name}                 trades, wins, losses and pnl per strategy
+
+Updates go through a Realtime Database transaction, so concurrent fills for
+the same user (e.g. both arbitrage legs) never lose an increment. apply() is
+the pure per-trade step the transaction runs.
+
+    record_trade(user_id, "dip_buyer", "sell", asset="BTC", pnl=12.5, closed=True)
+    summary(get_stats(user_id))        # derived figures for display
+"""
+import logging
+import time
+
+from firebase_admin import db
+
+from metrics import Counter, firebase_call
+
+logger = logging.getLogger(__name__)
+
+STATS_UPDATES = Counter("trade_stats_updates_total", "Trades folded into per-user stats", ("status",))
+
+
+def _bucket(node, pnl):
+    node["trades"] = node.get("trades", 0) + 1
+    if pnl is not None:
+        node["pnl"] = round(node.get("pnl", 0.0) + pnl, 8)
+        if pnl > 0:
+            node["wins"] = node.get("wins", 0) + 1
+        elif pnl < 0:
+            node["losses"] = node.get("losses", 0) + 1
+
+
+def apply(stats, strategy, side, asset=None, pnl=None, closed=False, ts=None) -> dict:
+    """Fold one trade into `stats`; pnl is the realized PnL of a closing trade (None when opening)."""
+    stats = dict(stats or {})
+    ts = ts if ts is not None else time.time()
+    _bucket(stats, pnl)
+    strategies = dict(stats.get("by_strategy") or {})
+    strategy_stats = strategies[strategy or "manual"] = dict(strategies.get(strategy or "manual") or {})
+    _bucket(strategy_stats, pnl)
+    stats["by_strategy"] = strategies
+
+    if pnl is not None:
+        peak = max(stats.get("peak_pnl", 0.0), stats["pnl"])
+        stats["peak_pnl"] = peak
+        stats["max_drawdown"] = round(max(stats.get("max_drawdown", 0.0), peak - stats["pnl"]), 8)
+
+    if asset:
+        open_since = dict(stats.get("open_since") or {})
+        if side == "buy":
+            open_since.setdefault(asset, ts)
+        elif side == "sell" and asset in open_since:
+            if closed:
+                stats["hold_seconds"] = stats.get("hold_seconds", 0) + max(0, ts - open_since.pop(asset))
+                stats["holds"] = stats.get("holds", 0) + 1
+        stats["open_since"] = open_since
+    stats["updated_at"] = int(ts)
+    return stats
+
+
+def record_trade(user_id, strategy, side, asset=None, pnl=None, closed=False, ts=None):
+    """Fold a trade into users/{user_id}/stats atomically. Never raises."""
+    try:
+        with firebase_call("transaction", "users"):
+            db.reference(f"users/{user_id}/stats").transaction(
+                lambda current: apply(current, strategy, side, asset, pnl, closed, ts))
+        STATS_UPDATES.inc("ok")
+    except Exception as e:
+        STATS_UPDATES.inc("error")
+        logger.error(f"Stats update failed for {user_id}: {e}")
+
+
+def get_stats(user_id) -> dict:
+    with firebase_call("read", "users"):
+        return db.reference(f"users/{user_id}/stats").get() or {}
+
+
+def summary(stats) -> dict:
+    """Display figures derived from a stats node."""
+    wins, losses = stats.get("wins", 0), stats.get("losses", 0)
+    holds = stats.get("holds", 0)
+    return {
+        "trades": stats.get("trades", 0),
+        "wins": wins,
+        "losses": losses,
+        "win_rate": wins / (wins + losses) * 100 if wins + losses else 0.0,
+        "pnl": stats.get("pnl", 0.0),
+        "max_drawdown": stats.get("max_drawdown", 0.0),
+        "avg_hold_seconds": stats.get("hold_seconds", 0) / holds if holds else 0.0,
+        "by_strategy": stats.get("by_strategy") or {},
+    }
@@ -1,16 +1,29 @@
 import logging
+import time
+import uuid
 import requests
-import pandas as pd
-from binance.client import Client as BinanceClient
+from circuit_breaker import CircuitOpenError, exchange_guard, http_get, retry_read
+from exchange_info import exchange_symbol, normalize_order, OrderValidationError, split_pair
+from binance_fastpath import FINAL_STATUSES as BINANCE_FINAL_STATUSES, get_signer
+from risk_engine import RiskLimitError, base_quantity, check_order
+import pnl_engine
+import risk_engine
+import trade_stats
 
 logger = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
 
+# pandas and python-binance are imported on first use so that importing this
+# module (and everything that imports it) stays cheap at startup.
+def _binance_client(api_key=None, api_secret=None):
+    from binance.client import Client as BinanceClient
+    return BinanceClient(api_key=api_key, api_secret=api_secret)
+
 # --- Binance Price Fetcher ---
 def get_binance_price(symbol="BTCUSDT", api_key=None, api_secret=None):
     try:
-        client = BinanceClient(api_key=api_key, api_secret=api_secret)
-        ticker = client.get_symbol_ticker(symbol=symbol)
+        client = _binance_client(api_key=api_key, api_secret=api_secret)
+        ticker = retry_read("binance", "ticker", lambda: client.get_symbol_ticker(symbol=symbol), hedge=True)
         price = float(ticker['price'])
         logger.info(f"Binance price for {symbol}: {price}")
         return price
@@ -20,6 +33,7 @@ def get_binance_price(symbol="BTCUSDT", api_key=None, api_secret=None):
 
 # --- RSI Indicator with Pandas ---
 def get_rsi(prices, period=14):
+    import pandas as pd
     if isinstance(prices, list):
         prices = pd.Series(prices)
     if len(prices) < period + 1:
@@ -35,9 +49,11 @@ def get_rsi(prices, period=14):
 
 # --- Binance Historical Price Fetcher + Indicators ---
 def get_price_history(symbol="BTCUSDT", interval="1h", limit=100, api_key=None, api_secret=None, indicators=False):
+    import pandas as pd
     try:
-        client = BinanceClient(api_key=api_key, api_secret=api_secret)
-        klines = client.get_klines(symbol=symbol, interval=interval, limit=limit)
+        client = _binance_client(api_key=api_key, api_secret=api_secret)
+        klines = retry_read("binance", "klines", lambda: client.get_klines(symbol=symbol, interval=interval, limit=limit),
+                            hedge=True)
         df = pd.DataFrame(klines, columns=[
             'timestamp', 'open', 'high', 'low', 'close', 'volume',
             'close_time', 'quote_asset_volume', 'number_of_trades',
@@ -58,8 +74,7 @@ def get_price_history(symbol="BTCUSDT", interval="1h", limit=100, api_key=None,
 # --- Luno Price Fetcher ---
 def get_luno_price(pair="XBTZAR"):
     try:
-        response = requests.get(f"https://api.luno.com/api/1/ticker?pair={pair}")
-        response.raise_for_status()
+        response = http_get("luno", "ticker", f"https://api.luno.com/api/1/ticker?pair={pair}", hedge=True)
         data = response.json()
         price = float(data.get("last_trade"))
         logger.info(f"Luno price for {pair}: {price}")
@@ -71,8 +86,8 @@ def get_luno_price(pair="XBTZAR"):
 # --- User Balance Fetcher for Binance ---
 def get_user_balance(user, asset="USDT"):
     try:
-        client = BinanceClient(api_key=user["binance_api_key"], api_secret=user["binance_api_secret"])
-        balance = client.get_asset_balance(asset=asset)
+        client = _binance_client(api_key=user["binance_api_key"], api_secret=user["binance_api_secret"])
+        balance = retry_read("binance", "balance", lambda: client.get_asset_balance(asset=asset))
         free_balance = float(balance['free']) if balance else 0.0
         logger.info(f"[{user['user_id']}] Binance {asset} balance: {free_balance}")
         return free_balance
@@ -83,8 +98,9 @@ def get_user_balance(user, asset="USDT"):
 # --- Price Change Calculator ---
 def get_price_change(user, symbol, timeframe="1h"):
     try:
-        client = BinanceClient(api_key=user["binance_api_key"], api_secret=user["binance_api_secret"])
-        klines = client.get_klines(symbol=symbol, interval=timeframe, limit=2)
+        client = _binance_client(api_key=user["binance_api_key"], api_secret=user["binance_api_secret"])
+        klines = retry_read("binance", "klines", lambda: client.get_klines(symbol=symbol, interval=timeframe, limit=2),
+                            hedge=True)
         if len(klines) < 2:
             return 0
         open_price = float(klines[0][1])
@@ -99,28 +115,46 @@ def get_price_change(user, symbol, timeframe="1h"):
 # --- Trade on Binance ---
 def trade_on_binance(user, action="buy", symbol="BTCUSDT", amount=None):
     try:
-        client = BinanceClient(api_key=user["binance_api_key"], api_secret=user["binance_api_secret"])
+        # Orders are rounded to the symbol's filters locally (see exchange_info) and
+        # sent through the signed fast path (see binance_fastpath)
+        signer = get_signer(user["binance_api_key"], user["binance_api_secret"])
+        base_asset = split_pair(symbol)[0]
         if action == "buy":
             balance = get_user_balance(user, asset='USDT')
             if balance < 10:
                 return f"[{user['user_id']}] Insufficient USDT balance"
-            quote_qty = amount or 10
-            order = client.order_market_buy(symbol=symbol, quoteOrderQty=quote_qty)
+            order_args = normalize_order("binance", symbol, quote_qty=amount or 10)
+            check_order(user, base_asset, base_quantity(base_asset, order_args["quote_qty"]))
+            order = signer.market_order(order_args["symbol"], "BUY", quote_qty=order_args["quote_qty"])
+            _record_fill(user, base_asset, float(order.get("executedQty", 0)), order.get("cummulativeQuoteQty", 0))
         elif action == "sell":
-            base_asset = symbol[:-4] if symbol.endswith("USDT") else symbol.split("USDT")[0]
             base_balance = get_user_balance(user, asset=base_asset)
             if base_balance < 0.0001:
                 return f"[{user['user_id']}] Insufficient {base_asset} balance"
-            sell_qty = amount or base_balance
-            order = client.order_market_sell(symbol=symbol, quantity=sell_qty)
+            order_args = normalize_order("binance", symbol, quantity=amount or base_balance)
+            order = signer.market_order(order_args["symbol"], "SELL", quantity=order_args["quantity"])
+            _record_fill(user, base_asset, -float(order.get("executedQty", 0)), order.get("cummulativeQuoteQty", 0))
         else:
             return f"[{user['user_id']}] Invalid action: {action}"
         logger.info(f"[{user['user_id']}] Binance {action.upper()} order placed: {order['orderId']}")
         return f"[{user['user_id']}] Binance {action.upper()} order placed: {order['orderId']}"
+    except (OrderValidationError, RiskLimitError) as e:
+        logger.warning(f"Binance order rejected locally for user {user['user_id']}: {e}")
+        return f"[{user['user_id']}] Order not placed: {e}"
     except Exception as e:
         logger.error(f"Binance trade error for user {user['user_id']}: {e}")
         return str(e)
 
+# --- Fill Accounting ---
+def _record_fill(user, asset, qty, quote_qty, quote="USDT"):
+    # Signed base quantity (+buy/-sell) into fleet exposure, per-user PnL and trading stats
+    if not qty:
+        return
+    risk_engine.record_fill(user, asset, qty)
+    realized, held = pnl_engine.record_fill(user, asset, qty, quote_qty, quote)
+    trade_stats.record_trade(user["user_id"], user.get("strategy"), "buy" if qty > 0 else "sell", asset,
+                             pnl=realized, closed=held is not None and held <= 0)
+
 # --- Trade on Luno ---
 def trade_on_luno(user, action="buy", amount=None):
     try:
@@ -128,19 +162,200 @@ def trade_on_luno(user, action="buy", amount=None):
             return f"[{user['user_id']}] Invalid Luno action: {action}"
         url = f'https://api.luno.com/api/1/{action}'
         auth = (user["luno_api_key"], user["luno_api_secret"])
-        counter_volume = str(amount or 200)  # default 200 ZAR or similar
+        order_args = normalize_order("luno", "XBTZAR", quote_qty=amount or 200)  # default 200 ZAR or similar
         data = {
-            "pair": "XBTZAR",
+            "pair": order_args["symbol"],
             "type": action.upper(),
-            "counter_volume": counter_volume
+            "counter_volume": order_args["quote_qty"]
         }
+        # This endpoint does not report the fill, so exposure uses the size at the current mark
+        base_qty = base_quantity("BTC", order_args["quote_qty"], quote="ZAR")
+        if action == "buy":
+            check_order(user, "BTC", base_qty)
         # Consider using json=data if Luno requires JSON payload
-        response = requests.post(url, auth=auth, data=data)
-        response.raise_for_status()
+        with exchange_guard("luno", "order"):
+            response = requests.post(url, auth=auth, data=data, timeout=10)
+            response.raise_for_status()
+        if base_qty:
+            _record_fill(user, "BTC", base_qty if action == "buy" else -base_qty, order_args["quote_qty"], "ZAR")
         result = response.json()
         order_id = result.get('order_id', 'No order ID')
         logger.info(f"[{user['user_id']}] Luno {action.upper()} order placed: {order_id}")
         return f"[{user['user_id']}] Luno {action.upper()} order placed: {order_id}"
+    except (OrderValidationError, RiskLimitError) as e:
+        logger.warning(f"Luno order rejected locally for user {user['user_id']}: {e}")
+        return f"[{user['user_id']}] Order not placed: {e}"
     except Exception as e:
         logger.error(f"Luno trade error for user {user['user_id']}: {e}")
         return str(e)
+
+# --- Structured Market Orders ---
+# Used by arbitrage_execution, which needs fill quantities and ack timestamps
+# rather than the status strings returned by trade_on_binance/trade_on_luno.
+LUNO_FILL_POLLS = 5
+LUNO_ORDER_URL = "https://api.luno.com/api/1/orders/{}"
+LUNO_CLIENT_ORDER_URL = "https://api.luno.com/api/exchange/3/order?client_order_id={}"
+
+def _order_result(exchange, side, sent_at):
+    # unknown: the order may have reached the exchange but its outcome couldn't be
+    # read (lost response, 5xx, unreadable fill); reconcile_*_order() settles it
+    # with a status read by client_order_id
+    return {"exchange": exchange, "side": side, "ok": False, "unknown": False, "order_id": None,
+            "client_order_id": uuid.uuid4().hex, "filled_base": 0.0, "filled_quote": 0.0,
+            "sent_at": sent_at, "acked_at": None, "error": None}
+
+def _rejected(exc) -> bool:
+    """True when a send error proves the exchange did not take the order."""
+    if isinstance(exc, (CircuitOpenError, requests.exceptions.ConnectTimeout)):
+        return True  # never left this process / never connected
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status", None)
+    # 4xx is a rejected request; 5xx and everything else leave the outcome unknown
+    return isinstance(status, int) and 400 <= status < 500
+
+def _send_failed(result, exc, user, what):
+    result["acked_at"] = result["acked_at"] or time.perf_counter()
+    result["error"] = str(exc)
+    result["unknown"] = not _rejected(exc)
+    if result["unknown"]:
+        logger.error(f"{what} outcome unknown for user {user['user_id']}, "
+                     f"client order {result['client_order_id']}: {exc}")
+    else:
+        logger.error(f"{what} rejected for user {user['user_id']}: {exc}")
+
+def place_binance_market_order(user, side, base_qty, symbol="BTCUSDT", ref_price=None):
+    """`ref_price` (expected fill, USDT) checks the minimum notional; the cached ticker is used without it."""
+    result = _order_result("binance", side, time.perf_counter())
+    try:
+        order_args = normalize_order("binance", symbol, quantity=base_qty, ref_price=ref_price)
+        qty = float(order_args["quantity"])
+        check_order(user, split_pair(symbol)[0], qty if side == "buy" else -qty)
+    except (OrderValidationError, RiskLimitError) as e:
+        # Rejected locally: nothing was sent, so there is no ack to time
+        result["error"] = str(e)
+        logger.warning(f"Binance {side} order rejected locally for user {user['user_id']}: {e}")
+        return result
+    signer = get_signer(user["binance_api_key"], user["binance_api_secret"])
+    try:
+        order = signer.market_order(order_args["symbol"], side, quantity=order_args["quantity"],
+                                    client_order_id=result["client_order_id"])
+        result["acked_at"] = time.perf_counter()
+    except Exception as e:
+        _send_failed(result, e, user, f"Binance {side} order")
+        return result
+    _settle_binance_fill(user, result, order, symbol)
+    return result
+
+def _settle_binance_fill(user, result, order, symbol):
+    """Mark a Binance leg filled, failed or unknown from its order record; fills are recorded once final."""
+    result["order_id"] = order.get("orderId")
+    result["filled_base"] = float(order.get("executedQty", 0))
+    result["filled_quote"] = float(order.get("cummulativeQuoteQty", 0))
+    if order.get("status") not in BINANCE_FINAL_STATUSES:
+        result["ok"], result["unknown"] = False, True
+        return
+    result["ok"], result["unknown"] = result["filled_base"] > 0, False
+    if result["ok"]:
+        result["error"] = None
+        _record_fill(user, split_pair(symbol)[0],
+                     result["filled_base"] if result["side"] == "buy" else -result["filled_base"],
+                     result["filled_quote"], split_pair(symbol)[1])
+
+def reconcile_binance_order(user, result, symbol="BTCUSDT"):
+    """Final status read for an unknown Binance leg; it stays unknown if the read fails too."""
+    if not result["unknown"] or not result.get("client_order_id"):
+        return result
+    signer = get_signer(user["binance_api_key"], user["binance_api_secret"])
+    try:
+        order = signer.query_order(exchange_symbol(symbol, "binance"), result["client_order_id"])
+    except Exception as e:
+        # includes "order does not exist", which right after a lost response can't rule out a late fill
+        logger.error(f"Binance order {result['client_order_id']} reconcile failed for user {user['user_id']}: {e}")
+        return result
+    _settle_binance_fill(user, result, order, symbol)
+    return result
+
+def place_luno_market_order(user, side, base_qty=None, counter_qty=None, pair="XBTZAR", ref_price=None):
+    """Luno market BUYs are sized in the counter currency, SELLs in the base currency."""
+    result = _order_result("luno", side, time.perf_counter())
+    auth = (user["luno_api_key"], user["luno_api_secret"])
+    base, quote = split_pair(pair)
+    try:
+        if side == "buy":
+            order_args = normalize_order("luno", pair, quote_qty=counter_qty)
+            data = {"pair": order_args["symbol"], "type": "BUY", "counter_volume": order_args["quote_qty"]}
+            check_order(user, base, base_quantity(base, order_args["quote_qty"], quote=quote))
+        else:
+            order_args = normalize_order("luno", pair, quantity=base_qty, ref_price=ref_price)
+            data = {"pair": order_args["symbol"], "type": "SELL", "base_volume": order_args["quantity"]}
+            check_order(user, base, -float(order_args["quantity"]))
+    except (OrderValidationError, RiskLimitError) as e:
+        # Rejected locally: nothing was sent, so there is no ack to time
+        result["error"] = str(e)
+        logger.warning(f"Luno {side} order rejected locally for user {user['user_id']}: {e}")
+        return result
+    data["client_order_id"] = result["client_order_id"]
+    try:
+        with exchange_guard("luno", "order"):
+            response = requests.post("https://api.luno.com/api/1/marketorder", auth=auth, data=data, timeout=10)
+            response.raise_for_status()
+            result["order_id"] = response.json().get("order_id")
+        result["acked_at"] = time.perf_counter()
+    except Exception as e:
+        _send_failed(result, e, user, f"Luno {side} order")
+        return result
+
+    # Acked: from here on the order may have filled, so a failed status read
+    # leaves the leg unknown rather than failed
+    try:
+        # Market orders settle almost immediately; poll briefly for the fill
+        for _ in range(LUNO_FILL_POLLS):
+            state = _read_luno_fill(result, auth)
+            if state == "COMPLETE":
+                break
+            time.sleep(0.2)
+    except Exception as e:
+        state = None
+        result["error"] = f"fill status unavailable: {e}"
+        logger.error(f"Luno {side} order {result['order_id']} status read failed for user {user['user_id']}: {e}")
+    _settle_luno_fill(user, result, state, pair)
+    return result
+
+def _read_luno_fill(result, auth):
+    # By order id once acked; by client order id when the ack itself was lost
+    if result["order_id"]:
+        url = LUNO_ORDER_URL.format(result["order_id"])
+    else:
+        url = LUNO_CLIENT_ORDER_URL.format(result["client_order_id"])
+    order = http_get("luno", "order_status", url, auth=auth).json()
+    result["order_id"] = order.get("order_id") or result["order_id"]
+    result["filled_base"] = float(order.get("base", 0))
+    result["filled_quote"] = float(order.get("counter", 0))
+    return order.get("state") or order.get("status")
+
+def _settle_luno_fill(user, result, state, pair):
+    """Mark an acked Luno leg filled, failed or unknown; fills are recorded once known."""
+    if state != "COMPLETE":
+        # Still pending or unreadable: the fill so far is not final, don't record it
+        result["ok"], result["unknown"] = False, True
+        return
+    result["ok"], result["unknown"] = result["filled_base"] > 0, False
+    if result["ok"]:
+        result["error"] = None
+        _record_fill(user, split_pair(pair)[0],
+                     result["filled_base"] if result["side"] == "buy" else -result["filled_base"],
+                     result["filled_quote"], split_pair(pair)[1])
+
+def reconcile_luno_order(user, result, pair="XBTZAR"):
+    """Final status read for an unknown Luno leg; it stays unknown if the read fails too."""
+    if not result["unknown"] or not (result["order_id"] or result.get("client_order_id")):
+        return result
+    auth = (user["luno_api_key"], user["luno_api_secret"])
+    try:
+        state = _read_luno_fill(result, auth)
+    except Exception as e:
+        logger.error(f"Luno order {result['order_id'] or result['client_order_id']} reconcile failed "
+                     f"for user {user['user_id']}: {e}")
+        return result
+    _settle_luno_fill(user, result, state, pair)
+    return result
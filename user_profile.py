@@ -0,0 +1,185 @@
+"""
+Compact, shared user records for the trading runners.
+
+A UserProfile is a __slots__ object built from a user's raw Firebase JSON,
+with strategy parameters parsed once into typed fields. Profiles are cached
+per user and only rebuilt when one of the fields they read changes, so a
+cycle over unchanged users reuses the same objects instead of building a
+fresh 15-20 key dict per user. The same instance is handed to strategies and
+notifications, which read it through the dict-style get()/[] they already
+use:
+
+    profiles = update_profiles(users_data)      # after each users/ scan
+    profile = get_profile(user_id)
+    profile.risk_tolerance, profile.get("dip_threshold")
+
+The unchanged-user check is one tuple comparison of the raw values against
+the fields, but it still costs more CPU than the dict copy it replaces:
+1.4-3x per cycle depending on fleet size and machine (9.5-17 ms against
+~6 ms at 5k users, 19-24 ms against 13-17 ms at 10k). In exchange a cycle
+allocates ~40 KiB instead of ~2.3 MiB at 5k users, and less memory is
+retained per user. Measure both with python -m benchmarks.bench_user_profile.
+"""
+import threading
+from operator import attrgetter
+from types import MappingProxyType
+
+# Typed parameters and their defaults (the strategies' PARAMETERS defaults)
+NUMERIC_FIELDS = {
+    "risk_tolerance": 0.02,
+    "profit_target": 50.0,  # ZAR, as strategies/arbitrage.py reads it (auto_bot's old 0.05 meant any edge)
+    "dip_threshold": -3.0,
+    "rsi_period": 14,
+    "rsi_oversold": 30.0,
+    "rsi_overbought": 70.0,
+    "range_lower_bound": 29500.0,
+    "range_upper_bound": 30500.0,
+    "arbitrage_size": 0.001,
+    "daily_profit": 0.0,
+    "strategy_score": 1.0,
+}
+TEXT_FIELDS = {
+    "strategy": "default",
+    "platform": "luno",
+    "binance_api_key": "",
+    "binance_api_secret": "",
+    "luno_api_key": "",
+    "luno_api_secret": "",
+    "last_trade_result": None,
+    "leaderboard_rank": None,
+    "exchange": None,
+}
+MAPPING_FIELDS = ("notification_preferences", "notifications", "strategy_config", "autobot")
+_EMPTY = MappingProxyType({})  # Shared by every profile missing a mapping field
+_DEFAULTS = tuple({**NUMERIC_FIELDS, **TEXT_FIELDS, **dict.fromkeys(MAPPING_FIELDS, _EMPTY), "active": False}.items())
+_NAMES = tuple(name for name, _ in _DEFAULTS)
+_DEFAULT_VALUES = tuple(default for _, default in _DEFAULTS)
+PROFILE_FIELDS = _NAMES  # raw user fields a profile reads; the runners need no others
+_fields_of = attrgetter(*_NAMES)
+
+
+def _number(value, default):
+    if value is None or isinstance(value, bool):
+        return default
+    if type(value) is type(default):
+        return value
+    try:
+        return type(default)(value)
+    except (TypeError, ValueError):
+        return default
+
+
+class UserProfile:
+    __slots__ = ("user_id", "active", "autobot_status", "_bool_sensitive") + tuple(NUMERIC_FIELDS) \
+        + tuple(TEXT_FIELDS) + MAPPING_FIELDS
+
+    def __init__(self, user_id, data: dict):
+        self.user_id = user_id
+        for name, value in _parse(data):
+            setattr(self, name, value)
+        self.autobot_status = bool(self.autobot.get("status", False))
+        # A raw true/false compares equal to 1/0 but parses to the default, so only a
+        # numeric field holding a non-default 0 or 1 can be misread by the fast path
+        self._bool_sensitive = any(getattr(self, name) in (0, 1) and getattr(self, name) != default
+                                   for name, default in NUMERIC_FIELDS.items())
+
+    def matches(self, data: dict) -> bool:
+        """True if building a profile from `data` would give this one."""
+        # Fast path: raw values (defaults for missing ones) equal the fields, compared in
+        # one C-level tuple comparison; anything else is checked field by field
+        if not self._bool_sensitive and tuple(map(data.get, _NAMES, _DEFAULT_VALUES)) == _fields_of(self):
+            return True
+        return self._matches_parsed(data)
+
+    def _matches_parsed(self, data: dict) -> bool:
+        get = data.get
+        for name, default in _DEFAULTS:
+            value, current = get(name), getattr(self, name)
+            if value is None:
+                if current != default:
+                    return False
+            elif name in NUMERIC_FIELDS:
+                if current != _number(value, default):
+                    return False
+            elif default is _EMPTY:
+                if current != (value if isinstance(value, dict) else _EMPTY):
+                    return False
+            elif value != current and (name != "active" or current != bool(value)):
+                return False
+        return True
+
+    # Dict-style access for code written against the raw user dicts
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key) from None
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in _PUBLIC else default
+
+    def __contains__(self, key):
+        return key in _PUBLIC
+
+    def has_exchange_keys(self) -> bool:
+        return bool(self.binance_api_key and self.binance_api_secret and self.luno_api_key and self.luno_api_secret)
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in _PUBLIC}
+
+    def __repr__(self):
+        return f"UserProfile({self.user_id!r}, strategy={self.strategy!r})"
+
+
+_PUBLIC = frozenset(name for name in UserProfile.__slots__ if not name.startswith("_"))
+
+
+def _parse(data: dict):
+    """(field, typed value) pairs for a user's raw JSON."""
+    for name, default in NUMERIC_FIELDS.items():
+        yield name, _number(data.get(name), default)
+    for name, default in TEXT_FIELDS.items():
+        yield name, data.get(name, default)
+    for name in MAPPING_FIELDS:
+        value = data.get(name)
+        yield name, value if isinstance(value, dict) else _EMPTY
+    yield "active", bool(data.get("active", False))
+
+
+# === Cache ===
+_profiles = {}
+_lock = threading.Lock()
+
+
+def profile_for(user_id, data: dict) -> UserProfile:
+    """Cached profile for user_id, rebuilt only when a field it reads has changed."""
+    profile = _profiles.get(user_id)
+    if profile is None or not profile.matches(data):
+        profile = _rebuild(user_id, data)
+    return profile
+
+
+def _rebuild(user_id, data: dict) -> UserProfile:
+    profile = UserProfile(user_id, data)
+    with _lock:
+        _profiles[user_id] = profile
+    return profile
+
+
+def update_profiles(users_data: dict) -> list:
+    """Refresh the cache from a users/ scan; users no longer present are dropped."""
+    profiles, cached = [], _profiles.get
+    for user_id, data in (users_data or {}).items():
+        if not isinstance(data, dict):
+            continue
+        profile = cached(user_id)
+        profiles.append(profile if profile is not None and profile.matches(data) else _rebuild(user_id, data))
+    if len(_profiles) > len(profiles):
+        with _lock:
+            for user_id in set(_profiles) - set(users_data or {}):
+                del _profiles[user_id]
+    return profiles
+
+
+def get_profile(user_id):
+    return _profiles.get(user_id)
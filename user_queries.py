@@ -0,0 +1,121 @@
+"""
+Narrow reads over users/ for scans that need a few fields, not whole users.
+
+A plain db.reference("users").get() downloads every user's full subtree,
+trades and pnl included. These helpers transfer only what a scan uses:
+
+    user_ids()                               # shallow: keys only
+    project(("strategy", "autobot/status"))  # {uid: {field: value}}, one read per user per field
+    where("autobot/status", True)            # server-side filter, matching users only
+    top("total_profit", 10)                  # last n by a child, e.g. the leaderboard
+
+where() and top() are order_by_child queries. The Realtime Database rejects
+them unless the child is listed under ".indexOn" for users/ in
+database.rules.json (deploy with `firebase deploy --only database`). Query
+results are whole user subtrees; pass `fields` to keep only those fields,
+but the transfer covers the matching users' full subtrees.
+
+Every read adds its JSON payload size to firebase_read_bytes_total{query};
+bytes_per_query() gives the average per call. Set
+FIREBASE_DATABASE_EMULATOR_HOST to run against the local emulator (see
+benchmarks/bench_user_scans.py).
+"""
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from firebase_admin import db
+
+from metrics import Counter, firebase_call
+
+logger = logging.getLogger(__name__)
+
+USERS = "users"
+FIREBASE_SCAN_WORKERS = int(os.getenv("FIREBASE_SCAN_WORKERS", 16))
+
+READ_BYTES = Counter("firebase_read_bytes_total", "JSON bytes returned by users/ reads", ("query",))
+READS = Counter("firebase_user_queries_total", "users/ reads", ("query",))
+
+
+def _size(value) -> int:
+    """Bytes of the JSON body the database returns for `value`."""
+    return len(json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode())
+
+
+def _read(query, ref, **kwargs):
+    with firebase_call("read", USERS):
+        value = ref.get(**kwargs)
+    READ_BYTES.inc(query, amount=_size(value))
+    READS.inc(query)
+    return value
+
+
+def _pick(data, fields) -> dict:
+    picked = {}
+    for field in fields:
+        value = data
+        for part in field.split("/"):
+            value = value.get(part) if isinstance(value, dict) else None
+        if value is not None:
+            picked[field] = value
+    return picked
+
+
+# === Queries ===
+def user_ids() -> list:
+    """Every user id, without any user data."""
+    return list(_read("shallow", db.reference(USERS), shallow=True) or {})
+
+
+def project(fields, uids=None) -> dict:
+    """{uid: {field: value}} for nested field paths, reading only those paths (missing ones are left out)."""
+    uids = user_ids() if uids is None else list(uids)
+    paths = [(uid, field) for uid in uids for field in fields]
+    if not paths:
+        return {uid: {} for uid in uids}
+
+    def read(path):
+        uid, field = path
+        return _read("project", db.reference(f"{USERS}/{uid}/{field}"))
+
+    with ThreadPoolExecutor(max_workers=min(FIREBASE_SCAN_WORKERS, len(paths))) as pool:
+        values = pool.map(read, paths)
+    projected = {uid: {} for uid in uids}
+    for (uid, field), value in zip(paths, values):
+        if value is not None:
+            projected[uid][field] = value
+    return projected
+
+
+def where(child, value, fields=None) -> dict:
+    """{uid: user} for users whose `child` equals `value` (child must be indexed)."""
+    matches = _read(f"where:{child}", db.reference(USERS).order_by_child(child).equal_to(value)) or {}
+    if fields is None:
+        return dict(matches)
+    return {uid: _pick(data, fields) for uid, data in matches.items()}
+
+
+def top(child, n, fields=None) -> list:
+    """[(uid, user)] for the n users with the highest `child`, highest first (child must be indexed)."""
+    matches = _read(f"top:{child}", db.reference(USERS).order_by_child(child).limit_to_last(n)) or {}
+    ranked = list(matches.items())[::-1]
+    if fields is None:
+        return ranked
+    return [(uid, _pick(data, fields)) for uid, data in ranked]
+
+
+# === Scans ===
+def active_autobot_users(fields=None) -> dict:
+    """{uid: user} for users with the autobot switched on and an active account, trimmed to `fields`."""
+    return {uid: data if fields is None else _pick(data, fields)
+            for uid, data in where("autobot/status", True).items() if data.get("active")}
+
+
+def users_with_strategy(strategy, fields=None) -> dict:
+    return where("strategy", strategy, fields)
+
+
+def bytes_per_query() -> dict:
+    """{query: (reads, average bytes per read)} since the process started."""
+    return {labels[0]: (count, READ_BYTES.value(*labels) / count) for labels, count in READS.values().items()}
@@ -0,0 +1,174 @@
+"""
+Walk-forward evaluation of the backtestable strategies.
+
+    python -m walk_forward --candles data/btcusdt_1m.npy [--strategies range_trader,dip_buyer] \
+        [--train-days 60] [--test-days 14] [--samples 2000] [--workers 8] [--out reports/]
+
+History is split into rolling windows: parameters are optimized on
+train_days of candles, then traded unchanged on the following test_days
+(starting flat), and the window moves forward by test_days. Only test
+windows count, so the chained test equity is an out-of-sample curve.
+
+Windows run in parallel, one (strategy, window) task at a time per worker.
+Each worker resamples the memory-mapped candles once per strategy and builds
+indicators over the full history, and every window trains and tests on
+slices of them (Indicators.window). Adjacent windows therefore share
+indicator state and an EWM starts each window warm, as it would live.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from backtest import BACKTEST_CAPITAL, INTERVAL_MS, indicators_for, load_candles, run_backtest, signal_interval
+from optimizer import OPTIMIZER_WORKERS, grid, random_sample, rank, space_size
+from strategies import all_strategies, get_strategy
+
+logger = logging.getLogger(__name__)
+
+WF_TRAIN_DAYS = float(os.getenv("WF_TRAIN_DAYS", 60))
+WF_TEST_DAYS = float(os.getenv("WF_TEST_DAYS", 14))
+WF_SAMPLES = int(os.getenv("WF_SAMPLES", 2000))
+
+
+def windows(bars, train_bars, test_bars) -> list:
+    """[(train_start, test_start, test_stop)] rolling forward by test_bars."""
+    out, start = [], 0
+    while start + train_bars < bars:
+        out.append((start, start + train_bars, min(start + train_bars + test_bars, bars)))
+        start += test_bars
+    return out
+
+
+# === Workers ===
+_worker = {}
+
+
+def _init_worker(candles_path):
+    _worker["candles"] = load_candles(candles_path)
+    _worker["indicators"] = {}
+
+
+def _indicators(spec):
+    ind = _worker["indicators"].get(spec.name)
+    if ind is None:
+        ind = _worker["indicators"][spec.name] = indicators_for(spec, _worker["candles"])
+    return ind
+
+
+def _run_window(task) -> dict:
+    name, index, (train_start, test_start, test_stop), candidates = task
+    spec = get_strategy(name)
+    ind = _indicators(spec)
+    train = ind.window(train_start, test_start)
+    scored = [{"params": params, **run_backtest(spec, params, ind=train)} for params in candidates]
+    best = rank(scored, 1)[0]
+    test = run_backtest(spec, best["params"], ind=ind.window(test_start, test_stop), equity_curve=True)
+    return {
+        "strategy": name,
+        "window": index,
+        "train_from": int(ind.times[train_start]),
+        "test_from": int(ind.times[test_start]),
+        "test_to": int(ind.times[test_stop - 1]),
+        "params": best["params"],
+        "train": {k: best[k] for k in ("total_return", "max_drawdown", "trades")},
+        "test": {k: test[k] for k in ("total_return", "max_drawdown", "trades")},
+        "times": ind.times[test_start:test_stop],
+        "equity": test["equity"],
+    }
+
+
+def _chain(results) -> dict:
+    """Join the test windows into one out-of-sample equity curve, compounding between windows."""
+    times, curves, capital = [], [], BACKTEST_CAPITAL
+    for r in results:
+        curve = r.pop("equity") * (capital / BACKTEST_CAPITAL)
+        capital = float(curve[-1])
+        times.append(r.pop("times"))
+        curves.append(curve)
+    equity = np.concatenate(curves) if curves else np.array([BACKTEST_CAPITAL])
+    peaks = np.maximum.accumulate(equity)
+    return {
+        "windows": results,
+        "times": np.concatenate(times) if times else np.array([]),
+        "equity": equity,
+        "total_return": float(equity[-1] / BACKTEST_CAPITAL - 1),
+        "max_drawdown": float(((peaks - equity) / peaks).max()),
+        "trades": sum(r["test"]["trades"] for r in results),
+    }
+
+
+def walk_forward(candles_path, strategies=None, train_days=WF_TRAIN_DAYS, test_days=WF_TEST_DAYS,
+                 samples=WF_SAMPLES, workers=OPTIMIZER_WORKERS, seed=None) -> dict:
+    """Out-of-sample results per strategy name: windows, chained equity curve and totals."""
+    specs = [get_strategy(s) for s in strategies] if strategies else all_strategies()
+    specs = [s for s in specs if s is not None and s.signals is not None]
+    candles = load_candles(candles_path)
+
+    tasks = []
+    for spec in specs:
+        step = INTERVAL_MS[signal_interval(spec)]
+        bars = len(indicators_for(spec, candles))
+        space = spec.parameter_space
+        candidates = grid(space) if samples >= space_size(space) else random_sample(space, samples, seed)
+        candidates = [{**spec.parameters, **params} for params in candidates]
+        spans = windows(bars, int(train_days * 86_400_000 // step), int(test_days * 86_400_000 // step))
+        tasks += [(spec.name, i, span, candidates) for i, span in enumerate(spans)]
+    if not tasks:
+        return {}
+
+    started = time.perf_counter()
+    workers = max(1, min(workers, len(tasks)))
+    if workers == 1:
+        _init_worker(candles_path)
+        results = [_run_window(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(candles_path,)) as pool:
+            results = list(pool.map(_run_window, tasks))
+    logger.info(f"Walk-forward: {len(tasks)} windows for {len(specs)} strategies on {workers} workers "
+                f"in {time.perf_counter() - started:.1f}s")
+
+    by_strategy = {}
+    for r in results:
+        by_strategy.setdefault(r["strategy"], []).append(r)
+    return {name: _chain(sorted(rs, key=lambda r: r["window"])) for name, rs in by_strategy.items()}
+
+
+def write_report(report, out_dir):
+    """<strategy>_equity.csv (open_time_ms, equity) and <strategy>_windows.json per strategy."""
+    os.makedirs(out_dir, exist_ok=True)
+    for name, result in report.items():
+        with open(os.path.join(out_dir, f"{name}_equity.csv"), "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["open_time_ms", "equity"])
+            writer.writerows(zip(result["times"].astype(np.int64).tolist(), np.round(result["equity"], 2).tolist()))
+        with open(os.path.join(out_dir, f"{name}_windows.json"), "w") as f:
+            json.dump(result["windows"], f, indent=2)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--candles", required=True)
+    parser.add_argument("--strategies", help="comma-separated; default every backtestable strategy")
+    parser.add_argument("--train-days", type=float, default=WF_TRAIN_DAYS)
+    parser.add_argument("--test-days", type=float, default=WF_TEST_DAYS)
+    parser.add_argument("--samples", type=int, default=WF_SAMPLES, help="parameter sets tried per train window")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--workers", type=int, default=OPTIMIZER_WORKERS)
+    parser.add_argument("--out", help="directory for equity curves and per-window results")
+    args = parser.parse_args()
+
+    names = args.strategies.split(",") if args.strategies else None
+    report = walk_forward(args.candles, names, args.train_days, args.test_days, args.samples, args.workers, args.seed)
+    print(f"{'strategy':<18}{'windows':>8}{'oos return':>12}{'drawdown':>10}{'trades':>8}")
+    for name, result in sorted(report.items()):
+        print(f"{name:<18}{len(result['windows']):>8}{result['total_return']:>12.2%}"
+              f"{result['max_drawdown']:>10.2%}{result['trades']:>8}")
+    if args.out:
+        write_report(report, args.out)